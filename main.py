@@ -20,6 +20,7 @@ from modules.analytics.analytics import generate_analytics_report
 from modules.googledistance.walmart_distance import main as walmart_distance_main
 from modules.scraping.fetch import main as fetch_main
 from modules.webui.dashboard import launch_dashboard
+from modules.datastore.master_store import get_store
 
 # Initialize Rich console
 console = Console()
@@ -80,22 +81,21 @@ def display_processing_status(market):
         process_listings(market=market)
 
 def generate_all_stock_numbers():
-    """Generate stock numbers for all listings in the master CSV that don't have one."""
+    """Generate stock numbers for all listings in the master dataset that don't have one."""
     try:
-        # Check if master CSV exists
-        master_path = os.path.join("database", "master.csv")
-        if not os.path.exists(master_path):
-            console.print("[red]Error: Master CSV file not found.[/red]")
+        # Read the master dataset, keyed by store row id so only stock numbers are written back
+        store = get_store()
+        df = store.read_frame(with_row_ids=True)
+        if df is None:
+            console.print("[red]Error: Master dataset not found.[/red]")
             return False
         
-        # Read the master CSV
-        df = pd.read_csv(master_path)
-        console.print(f"[green]Found {len(df)} listings in the master CSV.[/green]")
+        console.print(f"[green]Found {len(df)} listings in the master dataset.[/green]")
         
         # Check if StockNumber column exists
         if 'StockNumber' not in df.columns:
             df['StockNumber'] = None
-            console.print("[blue]Added StockNumber column to master CSV.[/blue]")
+            console.print("[blue]Added StockNumber column to master dataset.[/blue]")
         
         # Count listings without stock numbers
         missing_stock_number_count = df['StockNumber'].isna().sum()
@@ -107,6 +107,7 @@ def generate_all_stock_numbers():
         
         # Process each row without a stock number
         rows_updated = 0
+        updated_rows = df.index[df['StockNumber'].isna()]
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
@@ -140,19 +141,13 @@ def generate_all_stock_numbers():
                     rows_updated += 1
                     progress.update(task, advance=1)
         
-        # Make sure StockNumber is the first column
-        cols = df.columns.tolist()
-        cols.remove('StockNumber')
-        cols = ['StockNumber'] + cols
-        df = df[cols]
-        
         # Ensure all stock numbers are unique
         if not validate_stock_numbers(df):
             console.print("[red]Error: Duplicate stock numbers detected. Processing stopped.[/red]")
             return False
             
-        # Save the updated CSV
-        df.to_csv(master_path, index=False)
+        # Write back only the newly assigned stock numbers
+        store.upsert_columns(df.loc[updated_rows, ['StockNumber']])
         console.print(f"[green]Successfully updated {rows_updated} listings with stock numbers![/green]")
         
         return True
@@ -3,22 +3,100 @@ Analytics module for generating reports and insights from property data.
 """
 
 import os
+import argparse
 import pandas as pd
 import numpy as np
 from rich.console import Console
 from rich.progress import Progress, TextColumn, BarColumn, TaskProgressColumn
+from rich.table import Table
+from modules.datastore.master_store import get_store
+from modules.analytics.metric_registry import MetricState, compute_metrics, default_registry
+from modules.analytics.metrics import COMPOSITE_COMPONENTS
+from modules.analytics.market_stats import (
+    MarketStats, StatsStore, compute_stats, market_composite_score, same_stats
+)
+from modules.analytics.viz_payloads import get_visualization_payload
 
 # Initialize rich console for output
 console = Console()
 
+# Metric columns produced by the analytics report
+METRIC_COLUMNS = [
+    'Price Per Acre',
+    'Home Affordability Gap',
+    'Demand for Attainable Rent',
+    'Housing Gap',
+    'Weighted Demand and Convenience',
+    'Composite Score',
+    'Market Composite Score'
+]
+
 def ensure_directory_exists(directory):
     """Ensure that a directory exists, creating it if necessary."""
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def generate_analytics_report():
+def clean_metric_inputs(df):
+    """
+    Convert the metric input columns of `df` to numbers in place.
+    
+    Home value and income columns may hold strings with $ and commas.
+    
+    Returns:
+        list: The columns that were cleaned
+    """
+    cleaned_columns = []
+    for col in ['2024 Median Home Value(10m)', '2024 Med HH Inc(10m)']:
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype(str).str.replace('$', '').str.replace(',', '')
+    
+    for metric in default_registry().metrics.values():
+        for col in metric.inputs:
+            if col in df.columns and col not in METRIC_COLUMNS and col not in cleaned_columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+                cleaned_columns.append(col)
+    return cleaned_columns
+
+def load_or_build_stats(df, stats_store, rebuild=False):
     """
-    Generate analytics metrics and add them directly to the master.csv file.
+    Return the market statistics to score against.
+    
+    The stored table is reused so Market Composite Scores stay put as
+    listings are added; it is rebuilt from `df` and saved only when `rebuild`
+    is set, when none is stored, or when it lacks a Composite Score component.
+    
+    Args:
+        df (DataFrame): Master data with the metric columns
+        stats_store (StatsStore): Where the statistics are kept
+        rebuild (bool): Rebuild the table from `df` even if one is stored
+        
+    Returns:
+        MarketStats: The statistics in use
+    """
+    stored = None if rebuild else stats_store.load()
+    if stored is not None and all(col in stored for col in COMPOSITE_COMPONENTS if col in df.columns):
+        console.print(f"Scoring against the market statistics from {stored.computed_at} "
+                      f"(rebuild them with --rebuild-stats)")
+        return stored
+    
+    stats_frame = compute_stats(df)
+    if not same_stats(stats_frame, stats_store.load_frame()):
+        stats_store.save(stats_frame)
+    console.print(f"Rebuilt the market statistics from {len(df)} listings")
+    return MarketStats(stats_frame)
+
+def generate_analytics_report(full=False, rebuild_stats=False):
+    """
+    Generate analytics metrics and add them directly to the master dataset.
+    
+    Metrics are recomputed only for listings whose inputs changed since the
+    last run (see modules.analytics.metric_registry); pass full=True to
+    recompute every listing.
+    
+    The Market Composite Score is computed against the stored market
+    statistics, so it does not drift as listings are added. Pass
+    rebuild_stats=True (or full=True) to rebuild the statistics from the
+    current data first, which re-scores every market.
     
     The metrics include:
     - Price Per Acre (For Sale Price / Land Area)
@@ -27,6 +105,14 @@ def generate_analytics_report():
     - Housing Gap (TotHUs_20 / TotPop_20)
     - Weighted Demand and Convenience ((0.4*TotPop_10 + 0.3*TotPop_15 + 0.2*TotPop_20 + 0.1*TotPop_25) / ln(1 + Nearest_Walmart_Travel_Time_Minutes))
     - Composite Score (Normalized and weighted combination of the above metrics)
+    - Market Composite Score (The same combination, with each metric ranked within the listing's Market)
+    
+    Per-market and overall statistics of the metrics are stored in the
+    metric_stats table (see modules.analytics.market_stats).
+    
+    Args:
+        full (bool): Recompute every listing and rebuild the statistics
+        rebuild_stats (bool): Rebuild the statistics from the current data
     """
     console.print("[bold blue]Calculating Analytics Metrics...[/bold blue]")
     
@@ -34,238 +120,62 @@ def generate_analytics_report():
         # Ensure the database directory exists
         ensure_directory_exists("database")
         
-        # Read the master.csv file
-        master_path = "database/master.csv"
-        if not os.path.exists(master_path):
-            console.print("[red]Error: Master CSV file not found at database/master.csv[/red]")
+        # Read the master dataset, keyed by store row id for the write-back
+        store = get_store()
+        df = store.read_frame(with_row_ids=True)
+        if df is None:
+            console.print("[red]Error: Master dataset not found in the database directory[/red]")
             return False
         
-        df = pd.read_csv(master_path)
         original_row_count = len(df)
         
-        # Calculate metrics
+        # Clean the metric inputs to numeric values; they are written back with the metrics
+        cleaned_columns = clean_metric_inputs(df)
+        
+        # Recompute only the metrics and rows whose inputs changed since the last run
+        registry = default_registry()
         with Progress(
             TextColumn("[bold blue]{task.description}[/bold blue]"),
             BarColumn(),
             TaskProgressColumn(),
             console=console
         ) as progress:
-            task = progress.add_task("Calculating metrics...", total=6)
-            
-            # Step 1: Calculate Price Per Acre
-            console.print("Calculating Price Per Acre...")
-            # Ensure columns exist
-            if 'For Sale Price' not in df.columns or 'Land Area (AC)' not in df.columns:
-                console.print("[yellow]Warning: 'For Sale Price' or 'Land Area (AC)' columns not found. Skipping Price Per Acre calculation.[/yellow]")
-            else:
-                # Convert For Sale Price to numeric, handling any non-numeric values
-                df['For Sale Price'] = pd.to_numeric(df['For Sale Price'], errors='coerce')
-                df['Land Area (AC)'] = pd.to_numeric(df['Land Area (AC)'], errors='coerce')
-                
-                # Calculate Price Per Acre, avoiding division by zero
-                df['Price Per Acre'] = df.apply(
-                    lambda row: row['For Sale Price'] / row['Land Area (AC)'] 
-                    if pd.notna(row['For Sale Price']) and pd.notna(row['Land Area (AC)']) and row['Land Area (AC)'] > 0 
-                    else np.nan, 
-                    axis=1
-                )
-                
-                # Format for readability
-                df['Price Per Acre'] = df['Price Per Acre'].round(2)
-            
-            progress.update(task, advance=1)
-            
-            # Step 2: Calculate Home Affordability Gap
-            console.print("Calculating Home Affordability Gap...")
-            
-            # Check if required columns exist
-            if '2024 Median Home Value(10m)' not in df.columns or '2024 Med HH Inc(10m)' not in df.columns:
-                console.print("[yellow]Warning: Home value or income columns not found. Skipping Home Affordability Gap calculation.[/yellow]")
-            else:
-                # First, ensure we're working with clean numeric data
-                # Handle different formats (with $ and commas or plain numbers)
-                try:
-                    # Try to clean strings first
-                    if df['2024 Median Home Value(10m)'].dtype == 'object':
-                        df['2024 Median Home Value(10m)'] = df['2024 Median Home Value(10m)'].astype(str).str.replace('$', '').str.replace(',', '')
-                    if df['2024 Med HH Inc(10m)'].dtype == 'object':
-                        df['2024 Med HH Inc(10m)'] = df['2024 Med HH Inc(10m)'].astype(str).str.replace('$', '').str.replace(',', '')
-                
-                    # Convert to numeric
-                    df['2024 Median Home Value(10m)'] = pd.to_numeric(df['2024 Median Home Value(10m)'], errors='coerce')
-                    df['2024 Med HH Inc(10m)'] = pd.to_numeric(df['2024 Med HH Inc(10m)'], errors='coerce')
-                    
-                    # Calculate Home Affordability Gap
-                    df['Home Affordability Gap'] = df['2024 Median Home Value(10m)'] - (df['2024 Med HH Inc(10m)'] * 3)
-                    
-                    # Round to 2 decimal places for readability
-                    df['Home Affordability Gap'] = df['Home Affordability Gap'].round(2)
-                except Exception as e:
-                    console.print(f"[yellow]Warning: Error in Home Affordability Gap calculation: {str(e)}[/yellow]")
+            task = progress.add_task("Calculating metrics...", total=len(registry.metrics))
             
-            progress.update(task, advance=1)
-            
-            # Step 3: Calculate Demand for Attainable Rent
-            console.print("Calculating Demand for Attainable Rent...")
-            
-            # Check if required columns exist
-            if 'TotPop_15' not in df.columns or 'MedianGrossRent_15' not in df.columns or 'MedianHHInc_15' not in df.columns:
-                console.print("[yellow]Warning: Population, rent, or income columns not found. Skipping Demand for Attainable Rent calculation.[/yellow]")
-            else:
-                # First, ensure we're working with clean numeric data
-                df['TotPop_15'] = pd.to_numeric(df['TotPop_15'], errors='coerce')
-                df['MedianGrossRent_15'] = pd.to_numeric(df['MedianGrossRent_15'], errors='coerce')
-                df['MedianHHInc_15'] = pd.to_numeric(df['MedianHHInc_15'], errors='coerce')
-                
-                # Calculate Demand for Attainable Rent
-                # Formula: TotPop_15 * (MedianGrossRent_15 / (MedianHHInc_15 / 12))
-                df['Demand for Attainable Rent'] = df.apply(
-                    lambda row: row['TotPop_15'] * (row['MedianGrossRent_15'] / (row['MedianHHInc_15'] / 12))
-                    if pd.notna(row['TotPop_15']) and pd.notna(row['MedianGrossRent_15']) and 
-                       pd.notna(row['MedianHHInc_15']) and row['MedianHHInc_15'] > 0
-                    else np.nan,
-                    axis=1
-                )
-                
-                # Round to 2 decimal places for readability
-                df['Demand for Attainable Rent'] = df['Demand for Attainable Rent'].round(2)
-            
-            progress.update(task, advance=1)
-            
-            # Step 4: Calculate Housing Gap
-            console.print("Calculating Housing Gap...")
-            
-            # Check if required columns exist
-            if 'TotHUs_20' not in df.columns or 'TotPop_20' not in df.columns:
-                console.print("[yellow]Warning: Housing units or population columns not found. Skipping Housing Gap calculation.[/yellow]")
-            else:
-                # First, ensure we're working with clean numeric data
-                df['TotHUs_20'] = pd.to_numeric(df['TotHUs_20'], errors='coerce')
-                df['TotPop_20'] = pd.to_numeric(df['TotPop_20'], errors='coerce')
-                
-                # Calculate Housing Gap
-                # Formula: TotHUs_20 / TotPop_20
-                df['Housing Gap'] = df.apply(
-                    lambda row: row['TotHUs_20'] / row['TotPop_20']
-                    if pd.notna(row['TotHUs_20']) and pd.notna(row['TotPop_20']) and row['TotPop_20'] > 0
-                    else np.nan,
-                    axis=1
-                )
-                
-                # Round to 4 decimal places for readability (this will likely be a small number)
-                df['Housing Gap'] = df['Housing Gap'].round(4)
-            
-            progress.update(task, advance=1)
-            
-            # Step 5: Calculate Weighted Demand and Convenience
-            console.print("Calculating Weighted Demand and Convenience...")
-            
-            # Check if required columns exist
-            required_cols = ['TotPop_10', 'TotPop_15', 'TotPop_20', 'TotPop_25', 'Nearest_Walmart_Travel_Time_Minutes']
-            missing_cols = [col for col in required_cols if col not in df.columns]
-            
-            if missing_cols:
-                console.print(f"[yellow]Warning: Missing columns for Weighted Demand calculation: {', '.join(missing_cols)}. Skipping calculation.[/yellow]")
-            else:
-                # Ensure all columns are numeric
-                for col in required_cols:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-                
-                # Calculate Weighted Demand and Convenience
-                # Formula: ((0.4*TotPop_10 + 0.3*TotPop_15 + 0.2*TotPop_20 + 0.1*TotPop_25) / ln(1 + Nearest_Walmart_Travel_Time_Minutes))
-                df['Weighted Demand and Convenience'] = df.apply(
-                    lambda row: (
-                        (0.4 * row['TotPop_10'] + 
-                         0.3 * row['TotPop_15'] + 
-                         0.2 * row['TotPop_20'] + 
-                         0.1 * row['TotPop_25']) / 
-                        np.log(1 + row['Nearest_Walmart_Travel_Time_Minutes'])
-                    )
-                    if (pd.notna(row['TotPop_10']) and 
-                        pd.notna(row['TotPop_15']) and 
-                        pd.notna(row['TotPop_20']) and 
-                        pd.notna(row['TotPop_25']) and 
-                        pd.notna(row['Nearest_Walmart_Travel_Time_Minutes']) and 
-                        row['Nearest_Walmart_Travel_Time_Minutes'] >= 0)
-                    else np.nan,
-                    axis=1
-                )
-                
-                # Round to 2 decimal places for readability
-                df['Weighted Demand and Convenience'] = df['Weighted Demand and Convenience'].round(2)
-            
-            progress.update(task, advance=1)
-            
-            # Step 6: Calculate Composite Score
-            console.print("Calculating Composite Score...")
-            
-            # Check if all required columns exist
-            required_metrics = [
-                'Demand for Attainable Rent', 
-                'Housing Gap', 
-                'Home Affordability Gap', 
-                'Weighted Demand and Convenience'
-            ]
-            
-            missing_metrics = [metric for metric in required_metrics if metric not in df.columns]
-            
-            if missing_metrics:
-                console.print(f"[yellow]Warning: Missing metrics for Composite Score: {', '.join(missing_metrics)}. Skipping calculation.[/yellow]")
-            else:
-                # Function to normalize a column to 0-1 scale
-                def normalize_column(column):
-                    min_val = column.min()
-                    max_val = column.max()
-                    if max_val == min_val:
-                        return pd.Series(0.5, index=column.index)  # If all values are the same, return 0.5
-                    return (column - min_val) / (max_val - min_val)
-                
-                # For Home Affordability Gap, we need to consider that negative values are better
-                # (negative gap means homes are more affordable)
-                if 'Home Affordability Gap' in df.columns:
-                    # Invert the values so that lower (more negative) values become higher scores
-                    df['Normalized Home Affordability Gap'] = 1 - normalize_column(df['Home Affordability Gap'])
+            def report(metric, rows, skipped):
+                if skipped:
+                    console.print(f"[yellow]Warning: Skipping {metric.name} ({skipped}).[/yellow]")
                 else:
-                    df['Normalized Home Affordability Gap'] = np.nan
-                
-                # Normalize the other metrics
-                df['Normalized Demand for Attainable Rent'] = normalize_column(df['Demand for Attainable Rent'])
-                df['Normalized Housing Gap'] = normalize_column(df['Housing Gap'])
-                df['Normalized Weighted Demand and Convenience'] = normalize_column(df['Weighted Demand and Convenience'])
-                
-                # Calculate composite score with equal weights (0.25 each)
-                df['Composite Score'] = (
-                    0.25 * df['Normalized Demand for Attainable Rent'] + 
-                    0.25 * df['Normalized Housing Gap'] + 
-                    0.25 * df['Normalized Home Affordability Gap'] + 
-                    0.25 * df['Normalized Weighted Demand and Convenience']
-                )
-                
-                # Round to 2 decimal places
-                df['Composite Score'] = df['Composite Score'].round(2)
-                
-                # Remove the temporary normalization columns
-                df = df.drop(columns=[
-                    'Normalized Demand for Attainable Rent',
-                    'Normalized Housing Gap',
-                    'Normalized Home Affordability Gap',
-                    'Normalized Weighted Demand and Convenience'
-                ])
+                    console.print(f"Calculating {metric.name}: {rows} of {len(df)} rows changed")
+                progress.update(task, advance=1)
             
-            progress.update(task, advance=1)
+            changed = compute_metrics(df, registry, MetricState(store.db_path), full=full, on_metric=report)
         
-        # Ensure StockNumber is the first column
-        if 'StockNumber' in df.columns:
-            cols = df.columns.tolist()
-            if cols[0] != 'StockNumber':
-                cols.remove('StockNumber')
-                cols = ['StockNumber'] + cols
-                df = df[cols]
+        # Statistics per market and overall; scores and visualizations normalize against them
+        stats = load_or_build_stats(df, StatsStore(store.db_path), rebuild=full or rebuild_stats)
         
-        # Save the updated DataFrame back to master.csv
-        df.to_csv(master_path, index=False)
+        # Score each listing against its own market (percentiles of the stored statistics)
+        if all(col in df.columns for col in COMPOSITE_COMPONENTS):
+            market_score = market_composite_score(df, stats)
+            previous = pd.to_numeric(df.get('Market Composite Score', pd.Series(np.nan, index=df.index)), errors='coerce')
+            unchanged = (market_score == previous) | (market_score.isna() & previous.isna())
+            df['Market Composite Score'] = market_score
+            changed['Market Composite Score'] = df.index[~unchanged.to_numpy()]
+            console.print(f"Calculating Market Composite Score: {len(changed['Market Composite Score'])} of {len(df)} rows changed")
         
-        console.print(f"[green]Analytics metrics successfully added to master.csv[/green]")
+        # Write the recomputed metric columns (and the cleaned inputs) of the changed rows back to the store
+        changed_rows = df.index[df.index.isin(set().union(*changed.values()))] if changed else df.index[:0]
+        if len(changed_rows):
+            output_columns = list(dict.fromkeys(
+                [col for col in METRIC_COLUMNS if col in df.columns] + cleaned_columns
+            ))
+            store.upsert_columns(df.loc[changed_rows, output_columns])
+        
+        # Refresh the CSV snapshot of the master dataset
+        if len(changed_rows) or not os.path.exists(store.csv_path):
+            store.export_csv()
+        
+        console.print(f"[green]Analytics metrics successfully added to the master dataset[/green]")
         
         # Print some summary statistics
         console.print("\n[bold]Analytics Summary:[/bold]")
@@ -356,10 +266,42 @@ def generate_analytics_report():
             top_count = (df['Composite Score'] >= top_quartile).sum()
             console.print(f"Properties in top 25% (score >= {top_quartile:.2f}): {top_count}")
         
+        # Composite Score distribution per market, from the statistics table
+        if 'Composite Score' in stats and stats.markets():
+            table = Table(title="Composite Score by Market")
+            table.add_column("Market", style="cyan")
+            table.add_column("Listings", justify="right")
+            table.add_column("Median", justify="right")
+            table.add_column("Top 5%", justify="right")
+            for market in stats.markets():
+                row = stats.frame.loc[(market, 'Composite Score')]
+                if row['count']:
+                    table.add_row(market, str(int(row['count'])), f"{row['q50']:.2f}", f"{row['q95']:.2f}")
+            console.print(table)
+        
+        # Render the opportunity dashboard figures once for this version of the data
+        try:
+            version, payload = get_visualization_payload(store)
+            if payload is not None:
+                console.print(f"[green]Opportunity visualizations ready for data version {version}[/green]")
+        except Exception as e:
+            console.print(f"[yellow]Warning: Could not prebuild opportunity visualizations: {str(e)}[/yellow]")
+        
         return True
     
     except Exception as e:
         console.print(f"[red]Error calculating analytics metrics: {str(e)}[/red]")
         import traceback
         console.print(traceback.format_exc())
-        return False 
\ No newline at end of file
+        return False 
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Calculate analytics metrics for the master dataset.")
+    parser.add_argument("--full", action="store_true", help="Recompute every listing and rebuild the market statistics.")
+    parser.add_argument("--rebuild-stats", action="store_true", help="Rebuild the market statistics from the current data (re-scores every market).")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    generate_analytics_report(full=args.full, rebuild_stats=args.rebuild_stats)
@@ -0,0 +1,321 @@
+"""
+Distribution statistics for the metric columns, per market and across all listings.
+
+Min-max normalization over every listing lets one outlier in Florida shift the
+scores in Upstate NY. It also made the visualizations rescan the data for
+their bounds on every call. Instead, each analytics run builds a table of
+count, min, max, mean, std and quantiles for every metric column, once per
+`Market` and once over all listings. The table is stored in `metric_stats`
+in the master database. Normalization then becomes a lookup against it:
+
+- "minmax": scale by the min/max of the listing's market
+- "percentile": the listing's position among its market's quantiles
+
+Markets with fewer than MIN_MARKET_ROWS values for a column, and listings
+without a market, use the statistics over all listings. Infinite values (a
+zero travel time gives an infinite Weighted Demand and Convenience) are left
+out of the statistics and normalize to 0 or 1.
+
+The analytics report scores against the stored table and only rebuilds it
+when asked to (or when there is none), so scores do not drift as listings
+are added.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from modules.datastore.master_store import MASTER_DB_PATH, MasterStore
+from modules.analytics.metrics import COMPOSITE_COMPONENTS
+
+# Column holding the market of each listing
+MARKET_COLUMN = 'Market'
+
+# Market label of the statistics over all listings
+GLOBAL_MARKET = '(all)'
+
+# Quantile levels kept per market and column (every 5%)
+QUANTILE_LEVELS = tuple(i / 20 for i in range(21))
+
+# Names of the quantile columns in the statistics table (q00 ... q100)
+QUANTILE_NAMES = tuple(f"q{round(level * 100):02d}" for level in QUANTILE_LEVELS)
+
+# Fewest values a market needs before its own statistics are used
+MIN_MARKET_ROWS = 10
+
+# Columns described by the statistics table (metrics and the visualization inputs)
+STATS_COLUMNS = [
+    'Price Per Acre',
+    'Home Affordability Gap',
+    'Demand for Attainable Rent',
+    'Housing Gap',
+    'Weighted Demand and Convenience',
+    'Composite Score',
+    'Land Area (AC)',
+    'TotPop_5',
+    'TotPop_10',
+    'TotPop_15',
+    'MedianHHInc_5',
+    'MedianHHInc_10',
+    'MedianHHInc_15',
+    'MedianGrossRent_15',
+    'MedianHValue_15',
+    'RenterOcc_15',
+]
+
+# Side table of the master database holding the statistics
+STATS_TABLE = 'metric_stats'
+
+
+def _describe(values):
+    """Describe every column of a numeric frame as one row per column, ignoring infinite values."""
+    values = values.replace([np.inf, -np.inf], np.nan)
+    quantiles = values.quantile(list(QUANTILE_LEVELS))
+    described = pd.DataFrame({
+        'count': values.count(),
+        'min': values.min(),
+        'max': values.max(),
+        'mean': values.mean(),
+        'std': values.std(),
+    })
+    for level, name in zip(QUANTILE_LEVELS, QUANTILE_NAMES):
+        described[name] = quantiles.loc[level]
+    described.index.name = 'column'
+    return described
+
+
+def compute_stats(df, columns=STATS_COLUMNS, market_column=MARKET_COLUMN):
+    """
+    Build the statistics table for `df`.
+
+    Args:
+        df (DataFrame): Master data
+        columns (list): Columns to describe (those missing from `df` are skipped)
+        market_column (str): Column to group by
+
+    Returns:
+        DataFrame: One row per (market, column) with count, min, max, mean,
+        std and the QUANTILE_NAMES columns; the GLOBAL_MARKET rows cover all listings
+    """
+    columns = [col for col in columns if col in df.columns]
+    values = df[columns].apply(pd.to_numeric, errors='coerce').astype(float)
+
+    parts = {GLOBAL_MARKET: _describe(values)}
+    if market_column in df.columns:
+        for market, group in values.groupby(df[market_column].to_numpy(), sort=True):
+            parts[str(market)] = _describe(group)
+
+    stats = pd.concat(parts, names=['market']).reset_index()
+    stats['count'] = stats['count'].astype(int)
+    return stats
+
+
+class MarketStats:
+    """Lookups against a statistics table built by `compute_stats`."""
+
+    def __init__(self, frame, computed_at=None):
+        """
+        Args:
+            frame (DataFrame): Statistics table from `compute_stats` or the database
+            computed_at (str): When the table was computed
+        """
+        self.frame = frame.set_index(['market', 'column']).sort_index()
+        self.computed_at = computed_at
+        self._fingerprint = None
+
+    def __contains__(self, column):
+        return (GLOBAL_MARKET, column) in self.frame.index
+
+    def fingerprint(self):
+        """Return a hash of the statistics, for versioning what is built from them."""
+        if self._fingerprint is None:
+            hashed = pd.util.hash_pandas_object(self.frame, index=True).to_numpy()
+            self._fingerprint = hashlib.sha1(hashed.tobytes()).hexdigest()[:16]
+        return self._fingerprint
+
+    def markets(self):
+        """Markets with their own statistics (excluding GLOBAL_MARKET)."""
+        return [m for m in self.frame.index.get_level_values('market').unique() if m != GLOBAL_MARKET]
+
+    def row(self, column, market=GLOBAL_MARKET):
+        """
+        Statistics for a column in a market.
+
+        Falls back to the statistics over all listings when the market is
+        unknown or has fewer than MIN_MARKET_ROWS values.
+
+        Returns:
+            Series: count, min, max, mean, std and quantiles, or None if the column is not described
+        """
+        key = (str(market), column)
+        if market != GLOBAL_MARKET and key in self.frame.index and self.frame.at[key, 'count'] >= MIN_MARKET_ROWS:
+            return self.frame.loc[key]
+        if (GLOBAL_MARKET, column) in self.frame.index:
+            return self.frame.loc[(GLOBAL_MARKET, column)]
+        return None
+
+    def bounds(self, column, market=GLOBAL_MARKET):
+        """Return the (min, max) of a column in a market, or None if it is not described."""
+        row = self.row(column, market)
+        return None if row is None else (row['min'], row['max'])
+
+    def normalize(self, values, column, markets=None, method='minmax'):
+        """
+        Scale values to 0-1 against the stored statistics.
+
+        Values outside the stored range (listings added since the statistics
+        were computed, and infinite values) are clipped to 0 or 1. Percentiles
+        are interpolated between the stored quantiles; a value equal to a
+        quantile that repeats (many identical values) gets the middle of the
+        levels it spans.
+
+        Args:
+            values (Series): Values of `column`
+            column (str): Described column the values belong to
+            markets (Series): Market of each value; None uses the statistics over all listings
+            method (str): "minmax" or "percentile"
+
+        Returns:
+            Series: Normalized values (NaN where the value is missing)
+        """
+        if method not in ('minmax', 'percentile'):
+            raise ValueError(f"Unknown normalization method: {method}")
+        if column not in self:
+            raise KeyError(f"No statistics for column: {column}")
+
+        values = pd.to_numeric(values, errors='coerce').astype(float)
+        raw = values.to_numpy()
+        result = np.full(len(values), np.nan)
+        if markets is None:
+            groups = [(GLOBAL_MARKET, np.ones(len(values), dtype=bool))]
+        else:
+            keys = markets.astype(object).where(markets.notna(), GLOBAL_MARKET).astype(str).to_numpy()
+            groups = [(market, keys == market) for market in pd.unique(keys)]
+
+        for market, mask in groups:
+            row = self.row(column, market)
+            group_values = raw[mask]
+            if method == 'percentile':
+                levels = row[list(QUANTILE_NAMES)].to_numpy(dtype=float)
+                if np.isnan(levels).any():
+                    continue
+                # np.interp needs increasing points: merge repeated quantiles at their mean level
+                knots, inverse = np.unique(levels, return_inverse=True)
+                knot_levels = np.bincount(inverse, weights=QUANTILE_LEVELS) / np.bincount(inverse)
+                scaled = np.where(np.isnan(group_values), np.nan, np.interp(group_values, knots, knot_levels))
+            elif row['max'] == row['min']:
+                scaled = np.where(np.isnan(group_values), np.nan, 0.5)
+            else:
+                scaled = np.clip((group_values - row['min']) / (row['max'] - row['min']), 0, 1)
+            result[mask] = scaled
+        return pd.Series(result, index=values.index)
+
+    def to_records(self, column=None):
+        """Return the table (optionally one column) as a list of dicts for JSON."""
+        frame = self.frame.reset_index()
+        if column is not None:
+            frame = frame[frame['column'] == column]
+        frame = frame.astype(object).where(frame.notna(), None)
+        return frame.to_dict(orient='records')
+
+
+def market_composite_score(df, stats, method='percentile', market_column=MARKET_COLUMN):
+    """
+    Composite Score with each component normalized within the listing's market.
+
+    Uses the same equal weights as the Composite Score and inverts Home
+    Affordability Gap. Scores are rounded to 2 places.
+    """
+    markets = df[market_column] if market_column in df.columns else None
+    score = None
+    for column, lower_is_better in COMPOSITE_COMPONENTS.items():
+        normalized = stats.normalize(df[column], column, markets, method)
+        if lower_is_better:
+            normalized = 1 - normalized
+        term = 0.25 * normalized
+        score = term if score is None else score + term
+    return score.round(2)
+
+
+class StatsStore:
+    """The statistics table in the `metric_stats` side table of the master database."""
+
+    def __init__(self, db_path=MASTER_DB_PATH):
+        self.db_path = db_path
+
+    def save(self, stats):
+        """Replace the stored statistics with `stats` (from `compute_stats`)."""
+        frame = stats.copy()
+        frame['computed_at'] = datetime.now().isoformat(timespec='seconds')
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                frame.to_sql(STATS_TABLE, conn, if_exists='replace', index=False)
+        finally:
+            conn.close()
+
+    def load_frame(self):
+        """Return the stored statistics table, or None if there is none."""
+        try:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, timeout=30)
+        except sqlite3.OperationalError:
+            return None
+        try:
+            return pd.read_sql_query(f'SELECT * FROM "{STATS_TABLE}"', conn)
+        except (sqlite3.OperationalError, pd.errors.DatabaseError):
+            return None
+        finally:
+            conn.close()
+
+    def load(self):
+        """Return the stored statistics as MarketStats, or None if there are none."""
+        frame = self.load_frame()
+        if frame is None or frame.empty:
+            return None
+        computed_at = frame['computed_at'].iloc[0] if 'computed_at' in frame.columns else None
+        return MarketStats(frame.drop(columns=['computed_at'], errors='ignore'), computed_at)
+
+
+def same_stats(a, b):
+    """Compare two statistics tables, treating NaN as equal to NaN."""
+    if a is None or b is None:
+        return False
+    a = a.drop(columns=['computed_at'], errors='ignore').reset_index(drop=True)
+    b = b.drop(columns=['computed_at'], errors='ignore').reset_index(drop=True)
+    if list(a.columns) != list(b.columns) or len(a) != len(b):
+        return False
+    for col in a.columns:
+        if col in ('market', 'column'):
+            if not (a[col].astype(str) == b[col].astype(str)).all():
+                return False
+        elif not np.allclose(a[col].to_numpy(dtype=float), b[col].to_numpy(dtype=float), rtol=0, atol=0, equal_nan=True):
+            return False
+    return True
+
+
+# Statistics of the current master data, as (store signature, MarketStats)
+_cached_stats = (None, None)
+_cache_lock = threading.Lock()
+
+
+def get_market_stats(store=None):
+    """
+    Return the stored statistics, re-reading them only when the master database changes.
+
+    Returns:
+        MarketStats: The statistics, or None if no analytics run has stored any
+    """
+    global _cached_stats
+    store = store or MasterStore()
+    try:
+        signature = (store.db_path, store.signature())
+    except OSError:
+        return None
+    with _cache_lock:
+        if _cached_stats[0] != signature:
+            _cached_stats = (signature, StatsStore(store.db_path).load())
+        return _cached_stats[1]
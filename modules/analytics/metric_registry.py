@@ -0,0 +1,264 @@
+"""
+Declarative registry of the analytics metrics.
+
+Each metric declares its input columns and a vectorized formula. The registry
+orders metrics by their dependencies (a metric may use another metric's
+output) and recomputes incrementally: a hash of every row's inputs is kept in
+the `metric_row_hashes` side table of the master database, and only rows
+whose hash changed are recomputed. Metrics that normalize across all rows
+(the Composite Score) also store the min/max of their inputs in
+`metric_bounds`; all rows are recomputed when a bound shifts, otherwise only
+the changed rows are.
+"""
+
+import json
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from modules.datastore.master_store import MASTER_DB_PATH
+from modules.analytics.metrics import (
+    price_per_acre, home_affordability_gap, demand_for_attainable_rent, housing_gap,
+    weighted_demand_convenience, composite_score, column_bounds, POPULATION_WEIGHTS, COMPOSITE_COMPONENTS
+)
+
+
+class Metric:
+    """
+    A metric column computed from other columns.
+
+    Args:
+        name (str): Output column
+        inputs (list): Columns the formula reads (input columns or other metrics)
+        formula (callable): formula(frame) -> Series for row-local metrics, or
+            formula(frame, bounds) for normalized metrics
+        normalized (bool): Whether the formula scales by the min/max of its inputs over all rows
+        version (int): Bump when the formula changes so stored hashes are invalidated
+    """
+
+    def __init__(self, name, inputs, formula, normalized=False, version=1):
+        self.name = name
+        self.inputs = list(inputs)
+        self.formula = formula
+        self.normalized = normalized
+        self.version = version
+
+    def __repr__(self):
+        return f"Metric({self.name!r})"
+
+
+class MetricRegistry:
+    """Metrics keyed by output column, evaluated in dependency order."""
+
+    def __init__(self, metrics=()):
+        self.metrics = {}
+        for metric in metrics:
+            self.register(metric)
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def order(self):
+        """
+        Return the metrics in dependency order (inputs before the metrics that use them).
+
+        Raises:
+            ValueError: If the metric dependencies form a cycle
+        """
+        ordered = []
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Metric dependency cycle: {' -> '.join(path + [name])}")
+            state[name] = "visiting"
+            for dependency in self.metrics[name].inputs:
+                if dependency in self.metrics:
+                    visit(dependency, path + [name])
+            state[name] = "done"
+            ordered.append(self.metrics[name])
+
+        for name in self.metrics:
+            visit(name, [])
+        return ordered
+
+
+def row_hashes(frame, inputs, version=1):
+    """
+    Hash each row's input values.
+
+    Inputs are compared as floats so a column read back as int64 after a
+    write hashes the same as the float64 column it was computed from.
+
+    Returns:
+        ndarray: int64 hash per row
+    """
+    values = frame[inputs].apply(pd.to_numeric, errors='coerce').astype(float)
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    return (hashes + np.uint64(version)).view(np.int64)
+
+
+def _same_bounds(a, b):
+    """Compare bounds treating NaN as equal to NaN."""
+    if a is None or b is None or a.keys() != b.keys():
+        return False
+    return all(
+        all(x == y or (pd.isna(x) and pd.isna(y)) for x, y in zip(a[key], b[key]))
+        for key in a
+    )
+
+
+class MetricState:
+    """Per-row input hashes and normalization bounds, stored in side tables of the master database."""
+
+    def __init__(self, db_path=MASTER_DB_PATH):
+        self.db_path = db_path
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS metric_row_hashes ("
+                "metric TEXT NOT NULL, row_id INTEGER NOT NULL, input_hash INTEGER NOT NULL, "
+                "PRIMARY KEY (metric, row_id))"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS metric_bounds (metric TEXT PRIMARY KEY, bounds TEXT NOT NULL)")
+        return conn
+
+    def load(self):
+        """
+        Returns:
+            tuple: ({metric: Series of hashes indexed by row_id}, {metric: bounds dict})
+        """
+        conn = self._connect()
+        try:
+            rows = pd.read_sql_query("SELECT metric, row_id, input_hash FROM metric_row_hashes", conn)
+            bounds = {
+                metric: {key: tuple(value) for key, value in json.loads(text).items()}
+                for metric, text in conn.execute("SELECT metric, bounds FROM metric_bounds")
+            }
+        finally:
+            conn.close()
+        hashes = {metric: group.set_index('row_id')['input_hash'] for metric, group in rows.groupby('metric')}
+        return hashes, bounds
+
+    def save(self, hashes, bounds, reset=False):
+        """
+        Store updated hashes and bounds in one transaction.
+
+        Nothing is written when there is nothing to store, so a run that
+        changed nothing leaves the master database (and its mtime) untouched.
+
+        Args:
+            hashes (dict): metric -> Series of hashes indexed by row_id (only the changed rows)
+            bounds (dict): metric -> bounds dict (only the bounds that changed)
+            reset (bool): Drop all stored state first
+        """
+        hashes = {metric: series for metric, series in hashes.items() if len(series)}
+        if not hashes and not bounds and not reset:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                if reset:
+                    conn.execute("DELETE FROM metric_row_hashes")
+                    conn.execute("DELETE FROM metric_bounds")
+                for metric, series in hashes.items():
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO metric_row_hashes VALUES (?, ?, ?)",
+                        [(metric, int(row_id), int(value)) for row_id, value in series.items()],
+                    )
+                for metric, value in bounds.items():
+                    conn.execute(
+                        "INSERT OR REPLACE INTO metric_bounds VALUES (?, ?)",
+                        (metric, json.dumps({key: [float(x) for x in pair] for key, pair in value.items()})),
+                    )
+        finally:
+            conn.close()
+
+
+def compute_metrics(df, registry, state=None, full=False, on_metric=None):
+    """
+    Bring the metric columns of `df` up to date, recomputing only what changed.
+
+    Args:
+        df (DataFrame): Master data indexed by row_id, with numeric inputs (updated in place)
+        registry (MetricRegistry): Metrics to compute
+        state (MetricState): Stored hashes and bounds (None recomputes everything and stores nothing)
+        full (bool): Ignore stored state and recompute every row
+        on_metric (callable): Called as on_metric(metric, rows recomputed, skipped reason or None)
+
+    Returns:
+        dict: metric name -> Index of the row ids that were recomputed
+    """
+    stored_hashes, stored_bounds = state.load() if state is not None and not full else ({}, {})
+    new_hashes = {}
+    new_bounds = {}
+    changed = {}
+
+    for metric in registry.order():
+        missing = [col for col in metric.inputs if col not in df.columns]
+        if missing:
+            changed[metric.name] = df.index[:0]
+            if on_metric:
+                on_metric(metric, 0, f"missing columns: {', '.join(missing)}")
+            continue
+
+        hashes = pd.Series(row_hashes(df, metric.inputs, metric.version), index=df.index)
+        if metric.name not in df.columns or full:
+            dirty = pd.Series(True, index=df.index)
+        else:
+            stored = stored_hashes.get(metric.name, pd.Series(dtype=np.int64))
+            # Fill with 0 rather than NaN so the hashes stay int64 (and exact)
+            previous = stored.reindex(df.index, fill_value=0)
+            dirty = ~df.index.isin(stored.index) | (previous != hashes)
+
+        bounds = None
+        if metric.normalized:
+            bounds = {col: column_bounds(df[col]) for col in metric.inputs}
+            if not _same_bounds(bounds, stored_bounds.get(metric.name)):
+                dirty[:] = True
+                new_bounds[metric.name] = bounds
+
+        rows = df.index[dirty.to_numpy()]
+        if len(rows):
+            subset = df.loc[rows]
+            values = metric.formula(subset, bounds) if metric.normalized else metric.formula(subset)
+            if len(rows) == len(df):
+                df[metric.name] = values
+            else:
+                df.loc[rows, metric.name] = values
+            new_hashes[metric.name] = hashes.loc[rows]
+        changed[metric.name] = rows
+        if on_metric:
+            on_metric(metric, len(rows), None)
+
+    if state is not None:
+        state.save(new_hashes, new_bounds, reset=full)
+    return changed
+
+
+def default_registry():
+    """The metrics of the analytics report."""
+    travel_column = 'Nearest_Walmart_Travel_Time_Minutes'
+    return MetricRegistry([
+        Metric('Price Per Acre', ['For Sale Price', 'Land Area (AC)'],
+               lambda f: price_per_acre(f['For Sale Price'], f['Land Area (AC)'])),
+        Metric('Home Affordability Gap', ['2024 Median Home Value(10m)', '2024 Med HH Inc(10m)'],
+               lambda f: home_affordability_gap(f['2024 Median Home Value(10m)'], f['2024 Med HH Inc(10m)'])),
+        Metric('Demand for Attainable Rent', ['TotPop_15', 'MedianGrossRent_15', 'MedianHHInc_15'],
+               lambda f: demand_for_attainable_rent(f['TotPop_15'], f['MedianGrossRent_15'], f['MedianHHInc_15'])),
+        Metric('Housing Gap', ['TotHUs_20', 'TotPop_20'],
+               lambda f: housing_gap(f['TotHUs_20'], f['TotPop_20'])),
+        Metric('Weighted Demand and Convenience', list(POPULATION_WEIGHTS) + [travel_column],
+               lambda f: weighted_demand_convenience(f, travel_column)),
+        Metric('Composite Score', list(COMPOSITE_COMPONENTS), composite_score, normalized=True),
+    ])
@@ -0,0 +1,126 @@
+"""
+Vectorized formulas for the analytics metrics.
+
+Each metric is a masked column expression: rows with missing inputs or a zero
+divisor get NaN. The results match the row-wise `df.apply(..., axis=1)`
+versions they replace exactly, including the rounding (see
+tests/test_metrics.py).
+"""
+
+import numpy as np
+import pandas as pd
+
+# Population columns and weights for Weighted Demand and Convenience (10 to 25 mile radii)
+POPULATION_WEIGHTS = {
+    'TotPop_10': 0.4,
+    'TotPop_15': 0.3,
+    'TotPop_20': 0.2,
+    'TotPop_25': 0.1,
+}
+
+# Normalized metrics combined into the Composite Score, and whether a lower value is better
+COMPOSITE_COMPONENTS = {
+    'Demand for Attainable Rent': False,
+    'Housing Gap': False,
+    'Home Affordability Gap': True,
+    'Weighted Demand and Convenience': False,
+}
+
+
+def _numeric(values):
+    return pd.to_numeric(values, errors='coerce')
+
+
+def _masked(values, mask, decimals):
+    """Keep `values` where `mask` holds (NaN elsewhere) and round."""
+    return pd.Series(np.where(mask, values, np.nan), index=mask.index).round(decimals)
+
+
+def price_per_acre(price, acres):
+    """For Sale Price / Land Area (AC), where the area is positive."""
+    price, acres = _numeric(price), _numeric(acres)
+    mask = price.notna() & acres.notna() & (acres > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _masked(price / acres, mask, 2)
+
+
+def home_affordability_gap(home_value, household_income):
+    """Median Home Value - (Median Household Income * 3)."""
+    return (_numeric(home_value) - (_numeric(household_income) * 3)).round(2)
+
+
+def demand_for_attainable_rent(population, gross_rent, household_income):
+    """TotPop_15 * (MedianGrossRent_15 / (MedianHHInc_15 / 12)), where the income is positive."""
+    population, gross_rent, household_income = _numeric(population), _numeric(gross_rent), _numeric(household_income)
+    mask = population.notna() & gross_rent.notna() & household_income.notna() & (household_income > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _masked(population * (gross_rent / (household_income / 12)), mask, 2)
+
+
+def housing_gap(housing_units, population):
+    """TotHUs_20 / TotPop_20, where the population is positive."""
+    housing_units, population = _numeric(housing_units), _numeric(population)
+    mask = housing_units.notna() & population.notna() & (population > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _masked(housing_units / population, mask, 4)
+
+
+def weighted_demand_convenience(df, travel_column='Nearest_Walmart_Travel_Time_Minutes'):
+    """
+    (0.4*TotPop_10 + 0.3*TotPop_15 + 0.2*TotPop_20 + 0.1*TotPop_25) / ln(1 + travel minutes).
+
+    Rows with a negative or missing travel time get NaN. A travel time of zero
+    divides by ln(1) = 0 and gives inf, as the row-wise formula did.
+    """
+    populations = {col: _numeric(df[col]) for col in POPULATION_WEIGHTS}
+    travel = _numeric(df[travel_column])
+
+    mask = travel.notna() & (travel >= 0)
+    weighted = None
+    for col, weight in POPULATION_WEIGHTS.items():
+        mask &= populations[col].notna()
+        term = weight * populations[col]
+        weighted = term if weighted is None else weighted + term
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _masked(weighted / np.log(1 + travel), mask, 2)
+
+
+def column_bounds(column):
+    """Return the (min, max) used to normalize a column."""
+    return column.min(), column.max()
+
+
+def normalize_column(column, bounds=None):
+    """
+    Scale a column to 0-1 (0.5 everywhere if all values are the same).
+
+    Args:
+        column (Series): Values to scale
+        bounds (tuple): (min, max) to scale by; defaults to the column's own
+            (pass the full column's bounds when scaling a subset of rows)
+    """
+    min_val, max_val = bounds if bounds is not None else column_bounds(column)
+    if max_val == min_val:
+        return pd.Series(0.5, index=column.index)
+    return (column - min_val) / (max_val - min_val)
+
+
+def composite_score(df, bounds=None):
+    """
+    Equal-weight (0.25) sum of the min-max normalized component metrics.
+
+    Home Affordability Gap is inverted so more affordable (lower) gaps score higher.
+
+    Args:
+        df (DataFrame): Rows with the component metric columns
+        bounds (dict): Component column -> (min, max); defaults to the bounds of `df`
+    """
+    score = None
+    for column, lower_is_better in COMPOSITE_COMPONENTS.items():
+        normalized = normalize_column(df[column], bounds[column] if bounds else None)
+        if lower_is_better:
+            normalized = 1 - normalized
+        term = 0.25 * normalized
+        score = term if score is None else score + term
+    return score.round(2)
@@ -11,38 +11,54 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from sklearn.preprocessing import MinMaxScaler
 from rich.console import Console
+from modules.datastore.master_cache import get_master_data
+from modules.analytics.market_stats import get_market_stats
 
 # Initialize rich console for output
 console = Console()
 
+# Metrics averaged into each development type's competitive advantage score
+DEVELOPMENT_TYPE_METRICS = {
+    'Residential': ['MedianHHInc_15', 'TotPop_15', 'Housing Gap'],
+    'Multi-Family': ['Demand for Attainable Rent', 'MedianGrossRent_15', 'RenterOcc_15'],
+    'Commercial': ['TotPop_10', 'MedianHHInc_10', 'Weighted Demand and Convenience'],
+    'Mixed-Use': ['Composite Score', 'TotPop_5', 'MedianHHInc_5']
+}
+
+# Properties shown in the competitive advantage matrix by default, and at most
+DEFAULT_MATRIX_PROPERTIES = 15
+MAX_MATRIX_PROPERTIES = 1000
+
 def load_master_data():
-    """Load the master CSV file."""
-    try:
-        master_path = os.path.join("database", "master.csv")
-        if not os.path.exists(master_path):
-            console.print(f"[red]Error: Master CSV file not found at {master_path}[/red]")
-            return None
-        
-        console.print(f"[green]Loading data from {master_path}...[/green]")
-        df = pd.read_csv(master_path)
-        
-        # Ensure Price Per Acre is calculated
-        if 'For Sale Price' in df.columns and 'Land Area (AC)' in df.columns:
-            df['Price Per Acre'] = df['For Sale Price'] / df['Land Area (AC)']
-        
-        return df
-    except Exception as e:
-        console.print(f"[red]Error loading data: {str(e)}[/red]")
+    """Load the master dataset from the shared cache."""
+    df = get_master_data()
+    if df is None:
         return None
+    
+    # Ensure Price Per Acre is calculated
+    if 'For Sale Price' in df.columns and 'Land Area (AC)' in df.columns:
+        df['Price Per Acre'] = df['For Sale Price'] / df['Land Area (AC)']
+    
+    return df
 
-def normalize_column(df, column, min_val=None, max_val=None):
-    """Normalize a column to the range [0, 1]."""
+def normalize_column(df, column, min_val=None, max_val=None, stats=None):
+    """
+    Normalize a column to the range [0, 1].
+    
+    When `stats` (the MarketStats stored by the analytics run) describes the
+    column, its bounds are looked up there instead of rescanning the data.
+    """
     if column not in df.columns:
         return df
     
     # Handle missing values
     df[column] = pd.to_numeric(df[column], errors='coerce')
     
+    # Use the stored statistics when no bounds are given
+    if min_val is None and max_val is None and stats is not None and column in stats:
+        df[f"Normalized_{column}"] = stats.normalize(df[column], column)
+        return df
+    
     # If min/max not provided, calculate from data
     if min_val is None:
         min_val = df[column].min()
@@ -57,7 +73,7 @@ def normalize_column(df, column, min_val=None, max_val=None):
     
     return df
 
-def create_opportunity_quadrant(df):
+def create_opportunity_quadrant(df, stats=None):
     """
     Create the Opportunity Quadrant visualization.
     
@@ -75,15 +91,15 @@ def create_opportunity_quadrant(df):
     # Calculate population growth if not already in the dataframe
     if 'Population Growth' not in viz_df.columns and 'TotPop_15' in viz_df.columns:
         # Using TotPop_15 as a proxy for population growth potential
-        viz_df = normalize_column(viz_df, 'TotPop_15')
+        viz_df = normalize_column(viz_df, 'TotPop_15', stats=stats)
         viz_df['Population Growth'] = viz_df['Normalized_TotPop_15']
     
     # Normalize Price Per Acre
-    viz_df = normalize_column(viz_df, 'Price Per Acre')
+    viz_df = normalize_column(viz_df, 'Price Per Acre', stats=stats)
     
     # Normalize Composite Score if it exists
     if 'Composite Score' in viz_df.columns:
-        viz_df = normalize_column(viz_df, 'Composite Score')
+        viz_df = normalize_column(viz_df, 'Composite Score', stats=stats)
     else:
         # If no composite score, create a simple one based on available metrics
         available_metrics = [col for col in ['Home Affordability Gap', 'Demand for Attainable Rent', 
@@ -93,7 +109,7 @@ def create_opportunity_quadrant(df):
         if available_metrics:
             # Normalize and combine available metrics
             for metric in available_metrics:
-                viz_df = normalize_column(viz_df, metric)
+                viz_df = normalize_column(viz_df, metric, stats=stats)
             
             normalized_cols = [f"Normalized_{metric}" for metric in available_metrics]
             viz_df['Composite Score'] = viz_df[normalized_cols].mean(axis=1)
@@ -171,13 +187,14 @@ def create_opportunity_quadrant(df):
     
     return fig
 
-def create_radar_chart(df, property_id):
+def create_radar_chart(df, property_id, stats=None):
     """
     Create a radar chart for a specific property showing its opportunity factors.
     
     Parameters:
     - df: DataFrame containing property data
     - property_id: StockNumber or index of the property to visualize
+    - stats: Stored metric statistics used for the normalization bounds (optional)
     """
     if df is None or len(df) == 0:
         return None
@@ -207,7 +224,7 @@ def create_radar_chart(df, property_id):
     
     for display_name, metric_name in potential_metrics.items():
         if metric_name in property_df.columns:
-            df_temp = normalize_column(df, metric_name)
+            df_temp = normalize_column(df, metric_name, stats=stats)
             norm_value = df_temp.loc[property_df.index, f'Normalized_{metric_name}'].values[0]
             metrics.append(display_name)
             avail_metrics[display_name] = norm_value
@@ -247,7 +264,7 @@ def create_radar_chart(df, property_id):
     
     return None
 
-def create_growth_gap_chart(df):
+def create_growth_gap_chart(df, stats=None):
     """
     Create a Growth vs. Gap visualization.
     
@@ -274,12 +291,12 @@ def create_growth_gap_chart(df):
         return None
     
     # Normalize all relevant columns
-    viz_df = normalize_column(viz_df, 'TotPop_15')
-    viz_df = normalize_column(viz_df, 'Housing Gap')
+    viz_df = normalize_column(viz_df, 'TotPop_15', stats=stats)
+    viz_df = normalize_column(viz_df, 'Housing Gap', stats=stats)
     
     # Check if we have income data, otherwise use a default
     if 'MedianHHInc_15' in viz_df.columns:
-        viz_df = normalize_column(viz_df, 'MedianHHInc_15')
+        viz_df = normalize_column(viz_df, 'MedianHHInc_15', stats=stats)
         color_column = 'MedianHHInc_15'
         color_label = 'Median Household Income'
     else:
@@ -411,60 +428,52 @@ def create_price_to_potential_map(df):
     
     return fig
 
-def create_competitive_advantage_matrix(df):
+def create_competitive_advantage_matrix(df, top_n=DEFAULT_MATRIX_PROPERTIES):
     """
     Create a heatmap showing properties' competitive advantages for different development types.
+    
+    Each metric is normalized once across the properties shown, and a
+    development type's score is the mean of its normalized metrics.
+    
+    Parameters:
+    - df: DataFrame containing property data
+    - top_n: Number of properties shown, best Composite Score first (at most MAX_MATRIX_PROPERTIES)
     """
     if df is None or len(df) == 0:
         return None
     
-    # Define development types and their relevant metrics
-    dev_types = {
-        'Residential': ['MedianHHInc_15', 'TotPop_15', 'Housing Gap'],
-        'Multi-Family': ['Demand for Attainable Rent', 'MedianGrossRent_15', 'RenterOcc_15'],
-        'Commercial': ['TotPop_10', 'MedianHHInc_10', 'Weighted Demand and Convenience'],
-        'Mixed-Use': ['Composite Score', 'TotPop_5', 'MedianHHInc_5']
-    }
-    
-    # Filter properties that have StockNumber (or use index if not available)
-    if 'StockNumber' in df.columns:
-        properties = df['StockNumber'].values
-    else:
-        properties = [f"Property {i}" for i in range(len(df))]
+    top_n = max(1, min(int(top_n), MAX_MATRIX_PROPERTIES))
     
-    # Limit to top 15 properties by composite score for readability
+    # Limit to the top properties by composite score for readability
     if 'Composite Score' in df.columns:
-        top_indices = df['Composite Score'].nlargest(15).index
+        top_indices = pd.to_numeric(df['Composite Score'], errors='coerce').nlargest(top_n).index
         viz_df = df.loc[top_indices]
         properties = viz_df['StockNumber'].values if 'StockNumber' in viz_df.columns else [f"Property {i}" for i in top_indices]
     else:
-        viz_df = df.head(15)
-        properties = viz_df['StockNumber'].values if 'StockNumber' in viz_df.columns else [f"Property {i}" for i in range(15)]
+        viz_df = df.head(top_n)
+        properties = viz_df['StockNumber'].values if 'StockNumber' in viz_df.columns else [f"Property {i}" for i in range(len(viz_df))]
     
-    # Calculate score for each property-development type combination
-    scores = np.zeros((len(properties), len(dev_types)))
-    
-    for i, property_id in enumerate(properties):
-        prop_row = viz_df.iloc[i]
-        
-        for j, (dev_type, metrics) in enumerate(dev_types.items()):
-            # Calculate average normalized score for available metrics
-            metric_scores = []
-            
-            for metric in metrics:
-                if metric in viz_df.columns:
-                    viz_df = normalize_column(viz_df, metric)
-                    metric_scores.append(viz_df.iloc[i][f"Normalized_{metric}"])
-            
-            if metric_scores:
-                scores[i, j] = np.mean(metric_scores)
-            else:
-                scores[i, j] = 0.5  # Default score if no metrics available
+    # Normalize each metric column once across the properties shown
+    metrics = list(dict.fromkeys(
+        metric for dev_metrics in DEVELOPMENT_TYPE_METRICS.values() for metric in dev_metrics if metric in viz_df.columns
+    ))
+    normalized = pd.DataFrame(index=viz_df.index)
+    for metric in metrics:
+        values = pd.to_numeric(viz_df[metric], errors='coerce')
+        min_val, max_val = values.min(), values.max()
+        normalized[metric] = 0.5 if min_val == max_val else (values - min_val) / (max_val - min_val)
+    
+    # Score each development type as the mean of its available normalized metrics
+    scores = np.full((len(viz_df), len(DEVELOPMENT_TYPE_METRICS)), 0.5)
+    for j, dev_metrics in enumerate(DEVELOPMENT_TYPE_METRICS.values()):
+        available = [metric for metric in dev_metrics if metric in normalized.columns]
+        if available:
+            scores[:, j] = normalized[available].mean(axis=1, skipna=False).to_numpy()
     
     # Create heatmap
     fig = go.Figure(data=go.Heatmap(
         z=scores,
-        x=list(dev_types.keys()),
+        x=list(DEVELOPMENT_TYPE_METRICS),
         y=properties,
         colorscale='Viridis',
         zmin=0, 
@@ -475,7 +484,7 @@ def create_competitive_advantage_matrix(df):
         title='Competitive Advantage Matrix by Development Type',
         xaxis_title='Development Type',
         yaxis_title='Property',
-        height=700
+        height=max(700, 20 * len(properties) + 200)
     )
     
     return fig
@@ -492,13 +501,16 @@ def create_all_visualizations():
     
     console.print(f"[green]Successfully loaded data with {len(df)} rows[/green]")
     
+    # Normalization bounds stored by the last analytics run
+    stats = get_market_stats()
+    
     # Create visualizations
     visualizations = {}
     
     # Try to create each visualization independently
     visualization_functions = {
-        'opportunity_quadrant': create_opportunity_quadrant,
-        'growth_gap_chart': create_growth_gap_chart,
+        'opportunity_quadrant': lambda data: create_opportunity_quadrant(data, stats),
+        'growth_gap_chart': lambda data: create_growth_gap_chart(data, stats),
         'price_to_potential_map': create_price_to_potential_map,
         'competitive_advantage_matrix': create_competitive_advantage_matrix
     }
@@ -522,7 +534,7 @@ def create_all_visualizations():
     try:
         if len(df) > 0:
             console.print("[blue]Creating example radar chart...[/blue]")
-            visualizations['radar_chart'] = create_radar_chart(df, 0)
+            visualizations['radar_chart'] = create_radar_chart(df, 0, stats)
             if visualizations['radar_chart']:
                 console.print("[green]Successfully created example radar chart[/green]")
             else:
@@ -0,0 +1,299 @@
+"""
+Scenario engine for Composite Score weight sweeps.
+
+The Composite Score weights its four normalized metrics equally. To answer
+"what if convenience were weighted 0.4?" without editing code, the normalized
+metric matrix (N listings x 4, float32) is built once. Any number of weight
+vectors are then scored with one matrix multiply per block of scenarios.
+Each scenario returns its top-K listings, plus statistics on how stable the
+rankings are across scenarios.
+
+Run from the command line, for example:
+
+    python -m modules.analytics.scenarios --weights 0.2,0.2,0.2,0.4 --grid 0.1 --top 10
+"""
+
+import argparse
+import json
+import math
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from modules.analytics.metrics import COMPOSITE_COMPONENTS, normalize_column
+from modules.datastore.master_store import read_frame
+
+# Initialize rich console for output
+console = Console()
+
+# Composite Score weights used by the analytics report, in COMPOSITE_COMPONENTS order
+DEFAULT_WEIGHTS = (0.25, 0.25, 0.25, 0.25)
+
+# Scenarios scored per matrix multiply (bounds the N x scenarios score matrix)
+SCENARIO_BLOCK = 512
+
+# Most scenarios accepted in one request
+MAX_SCENARIOS = 20000
+
+# Most listings kept per scenario
+MAX_TOP_K = 1000
+
+
+def parse_weights(text):
+    """Parse "0.2,0.2,0.2,0.4" into a weight vector."""
+    weights = [float(value) for value in text.split(",")]
+    if len(weights) != len(COMPOSITE_COMPONENTS):
+        raise ValueError(f"Expected {len(COMPOSITE_COMPONENTS)} weights, got {len(weights)}")
+    return weights
+
+
+def grid_size(units):
+    """Number of weight vectors on the simplex when 1 is split into `units` steps."""
+    return math.comb(units + len(COMPOSITE_COMPONENTS) - 1, len(COMPOSITE_COMPONENTS) - 1)
+
+
+def weight_grid(step):
+    """
+    Every weight vector on the simplex with the given step (0.1 gives 286 vectors).
+
+    The grid size is checked against MAX_SCENARIOS before any vector is built.
+
+    Returns:
+        ndarray: (scenarios, 4) float32 weights summing to 1
+    """
+    if not 0 < step <= 1:
+        raise ValueError("step must be between 0 and 1")
+    units = int(round(1 / step))
+    if units < 1 or not np.isclose(units * step, 1):
+        raise ValueError("step must divide 1 evenly (e.g. 0.05, 0.1, 0.25)")
+    if grid_size(units) > MAX_SCENARIOS:
+        raise ValueError(f"A grid with step {step} has {grid_size(units)} scenarios; at most {MAX_SCENARIOS} per run")
+    vectors = [
+        (a, b, c, units - a - b - c)
+        for a in range(units + 1)
+        for b in range(units + 1 - a)
+        for c in range(units + 1 - a - b)
+    ]
+    return np.asarray(vectors, dtype=np.float32) / units
+
+
+def random_weights(count, seed=None):
+    """Draw weight vectors uniformly from the simplex (Dirichlet(1, 1, 1, 1))."""
+    if not 0 <= count <= MAX_SCENARIOS:
+        raise ValueError(f"Random scenarios must be between 0 and {MAX_SCENARIOS}")
+    rng = np.random.default_rng(seed)
+    return rng.dirichlet(np.ones(len(COMPOSITE_COMPONENTS)), size=count).astype(np.float32)
+
+
+class ScenarioEngine:
+    """
+    Scores Composite Score weight scenarios against a fixed set of listings.
+
+    Listings missing any component metric are left out, as they get no
+    Composite Score either.
+    """
+
+    def __init__(self, df, id_column='StockNumber'):
+        """
+        Args:
+            df (DataFrame): Master data with the component metric columns
+            id_column (str): Column identifying listings in the results
+        """
+        missing = [col for col in COMPOSITE_COMPONENTS if col not in df.columns]
+        if missing:
+            raise ValueError(f"Missing metric columns: {', '.join(missing)}")
+
+        columns = []
+        for column, lower_is_better in COMPOSITE_COMPONENTS.items():
+            normalized = normalize_column(df[column])
+            columns.append(1 - normalized if lower_is_better else normalized)
+        matrix = np.column_stack([col.to_numpy(dtype=np.float64) for col in columns])
+
+        complete = np.isfinite(matrix).all(axis=1)
+        self.matrix = np.ascontiguousarray(matrix[complete], dtype=np.float32)
+        ids = df[id_column] if id_column in df.columns else df.index.to_series()
+        self.ids = ids.to_numpy()[complete]
+        self.components = list(COMPOSITE_COMPONENTS)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    @staticmethod
+    def prepare_weights(weights, normalize=True):
+        """
+        Validate weights and scale each vector to sum to 1.
+
+        Returns:
+            ndarray: (scenarios, 4) float32
+        """
+        weights = np.atleast_2d(np.asarray(weights, dtype=np.float32))
+        if weights.shape[1] != len(COMPOSITE_COMPONENTS):
+            raise ValueError(f"Each weight vector needs {len(COMPOSITE_COMPONENTS)} values")
+        if len(weights) > MAX_SCENARIOS:
+            raise ValueError(f"At most {MAX_SCENARIOS} scenarios per run")
+        if (weights < 0).any():
+            raise ValueError("Weights must be non-negative")
+        if normalize:
+            totals = weights.sum(axis=1, keepdims=True)
+            if (totals == 0).any():
+                raise ValueError("Each weight vector needs a positive weight")
+            weights = weights / totals
+        return weights
+
+    def score(self, weights):
+        """Scores of every listing under every scenario: (listings, scenarios) float32."""
+        return self.matrix @ self.prepare_weights(weights).T
+
+    def top_k(self, weights, k=10):
+        """
+        Top-K listing positions per scenario, best first.
+
+        Returns:
+            tuple: (positions (scenarios, k) int array, scores (scenarios, k) float32)
+        """
+        if not 0 <= k <= MAX_TOP_K:
+            raise ValueError(f"k must be between 0 and {MAX_TOP_K}")
+        weights = self.prepare_weights(weights)
+        k = min(k, len(self))
+        positions = np.empty((len(weights), k), dtype=np.int64)
+        scores = np.empty((len(weights), k), dtype=np.float32)
+        if k == 0:
+            return positions, scores
+
+        for start in range(0, len(weights), SCENARIO_BLOCK):
+            block = (self.matrix @ weights[start:start + SCENARIO_BLOCK].T).T
+            # Partition to the best k, then sort just those
+            best = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(block, best, axis=1)
+            order = np.argsort(-best_scores, axis=1, kind='stable')
+            positions[start:start + len(block)] = np.take_along_axis(best, order, axis=1)
+            scores[start:start + len(block)] = np.take_along_axis(best_scores, order, axis=1)
+        return positions, scores
+
+    def run(self, weights, k=10, baseline=DEFAULT_WEIGHTS):
+        """
+        Score scenarios and summarize how stable the top-K is across them.
+
+        Args:
+            weights (array-like): (scenarios, 4) weight vectors
+            k (int): Listings kept per scenario
+            baseline (array-like): Weights the overlap statistics compare against
+
+        Returns:
+            dict: "components", "scenarios" (weights and top-K per scenario) and
+            "stability": per-listing top-K frequency and rank range, and the
+            overlap of each scenario's top-K with the baseline's
+        """
+        weights = self.prepare_weights(weights)
+        positions, scores = self.top_k(weights, k)
+        baseline_positions, _ = self.top_k(baseline, k)
+        baseline_set = set(baseline_positions[0].tolist())
+
+        kept = max(positions.shape[1], 1)
+        overlap = np.array([len(baseline_set.intersection(row.tolist())) / kept for row in positions])
+
+        # How often, and at which ranks, each listing makes a top-K
+        flat = positions.ravel()
+        ranks = np.tile(np.arange(1, positions.shape[1] + 1), len(positions))
+        counts = np.bincount(flat, minlength=len(self))
+        best_rank = np.full(len(self), np.iinfo(np.int64).max)
+        worst_rank = np.zeros(len(self), dtype=np.int64)
+        np.minimum.at(best_rank, flat, ranks)
+        np.maximum.at(worst_rank, flat, ranks)
+        listed = np.flatnonzero(counts)
+        listed = listed[np.argsort(-counts[listed], kind='stable')]
+
+        return {
+            "components": self.components,
+            "listings": len(self),
+            "scenarios": [
+                {
+                    "weights": [round(float(w), 4) for w in scenario_weights],
+                    "top": [
+                        {"id": _plain(self.ids[pos]), "score": round(float(score), 4)}
+                        for pos, score in zip(scenario_positions, scenario_scores)
+                    ],
+                    "baseline_overlap": round(float(scenario_overlap), 4),
+                }
+                for scenario_weights, scenario_positions, scenario_scores, scenario_overlap
+                in zip(weights, positions, scores, overlap)
+            ],
+            "stability": {
+                "baseline_weights": [round(float(w), 4) for w in self.prepare_weights(baseline)[0]],
+                "mean_baseline_overlap": round(float(overlap.mean()), 4) if len(overlap) else None,
+                "min_baseline_overlap": round(float(overlap.min()), 4) if len(overlap) else None,
+                "listings": [
+                    {
+                        "id": _plain(self.ids[pos]),
+                        "top_k_frequency": round(float(counts[pos]) / len(weights), 4),
+                        "best_rank": int(best_rank[pos]),
+                        "worst_rank": int(worst_rank[pos]),
+                    }
+                    for pos in listed
+                ],
+            },
+        }
+
+
+def _plain(value):
+    """Convert numpy scalars to plain Python values for JSON."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def print_results(result, limit=10):
+    """Print the most stable listings and a few scenarios."""
+    stability = result["stability"]
+    console.print(f"[bold blue]{len(result['scenarios'])} scenarios over {result['listings']} listings[/bold blue]")
+    console.print(f"Top-K overlap with baseline {stability['baseline_weights']}: "
+                  f"mean {stability['mean_baseline_overlap']}, min {stability['min_baseline_overlap']}")
+
+    table = Table(title="Most stable listings")
+    table.add_column("Listing", style="cyan")
+    table.add_column("Top-K frequency", justify="right")
+    table.add_column("Best rank", justify="right")
+    table.add_column("Worst rank", justify="right")
+    for listing in stability["listings"][:limit]:
+        table.add_row(str(listing["id"]), f"{listing['top_k_frequency']:.1%}",
+                      str(listing["best_rank"]), str(listing["worst_rank"]))
+    console.print(table)
+
+    for scenario in result["scenarios"][:limit]:
+        weights = ", ".join(f"{name}={w}" for name, w in zip(result["components"], scenario["weights"]))
+        top = ", ".join(str(item["id"]) for item in scenario["top"])
+        console.print(f"[cyan]{weights}[/cyan]\n  {top}")
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Score Composite Score weight scenarios.")
+    parser.add_argument("--weights", action="append", default=[], type=parse_weights,
+                        help=f"Comma-separated weights for {', '.join(COMPOSITE_COMPONENTS)} (repeatable).")
+    parser.add_argument("--grid", type=float, default=None, help="Add every weight vector with this step (e.g. 0.1).")
+    parser.add_argument("--random", type=int, default=0, help="Add this many random weight vectors.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for --random.")
+    parser.add_argument("--top", type=int, default=10, help="Listings kept per scenario.")
+    parser.add_argument("--json", default=None, help="Write the full results to this JSON file.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    scenarios = [np.asarray(args.weights, dtype=np.float32).reshape(-1, len(COMPOSITE_COMPONENTS))]
+    if args.grid:
+        scenarios.append(weight_grid(args.grid))
+    if args.random:
+        scenarios.append(random_weights(args.random, args.seed))
+    weights = np.concatenate(scenarios)
+    if not len(weights):
+        weights = np.asarray([DEFAULT_WEIGHTS], dtype=np.float32)
+
+    df = read_frame()
+    if df is None:
+        raise SystemExit("Master dataset not found")
+    result = ScenarioEngine(df).run(weights, k=args.top)
+    print_results(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        console.print(f"[green]Wrote {args.json}[/green]")
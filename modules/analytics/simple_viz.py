@@ -9,25 +9,14 @@ import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from rich.console import Console
+from modules.datastore.master_cache import get_master_data
 
 # Initialize rich console for output
 console = Console()
 
 def load_master_data():
-    """Load the master CSV file."""
-    try:
-        master_path = os.path.join("database", "master.csv")
-        if not os.path.exists(master_path):
-            console.print(f"[red]Error: Master CSV file not found at {master_path}[/red]")
-            return None
-        
-        console.print(f"[green]Loading data from {master_path}...[/green]")
-        df = pd.read_csv(master_path)
-        console.print(f"[green]Successfully loaded data with {len(df)} rows[/green]")
-        return df
-    except Exception as e:
-        console.print(f"[red]Error loading data: {str(e)}[/red]")
-        return None
+    """Load the master dataset from the shared cache."""
+    return get_master_data()
 
 def create_simple_radar_chart(property_data):
     """
@@ -0,0 +1,165 @@
+"""
+Prebuilt JSON payloads for the opportunity visualizations.
+
+The opportunity dashboard used to rebuild every Plotly figure on each page
+load, serialize it with `fig.to_json()`, parse it back and serialize it
+again for the response. Instead, each figure's JSON is rendered once per
+version of the master data and stored in a small SQLite file next to it. The
+version is a hash of the master store's listings version, which only changes
+when the listings are written, and of the stored market statistics the
+figures are normalized against. The dashboard serves the
+stored bytes unchanged, with the version as the ETag.
+
+Payloads are built at the end of an analytics run, or on the first request
+for a version that has none.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from rich.console import Console
+
+from modules.datastore.master_store import MasterStore
+from modules.analytics.market_stats import get_market_stats
+from modules.analytics.opportunity_viz import create_all_visualizations
+
+# Initialize rich console for output
+console = Console()
+
+# Default location of the stored payloads
+VIZ_PAYLOAD_PATH = os.path.join("database", "viz_payloads.db")
+
+# Bump when the figures change so payloads built by older code are not served
+PAYLOAD_FORMAT = 1
+
+
+def data_version(store=None):
+    """
+    Return the version hash of the master data the payloads are built from.
+
+    Covers the listings and the stored market statistics: analytics writes the
+    listings before it saves the statistics, and a payload built in between
+    must not be reused once the statistics are saved.
+
+    Returns:
+        str: Hex digest, or None if there is no master data
+    """
+    store = store or MasterStore()
+    version = store.listings_version()
+    if version is None:
+        return None
+    stats = get_market_stats(store)
+    stats_version = stats.fingerprint() if stats is not None else None
+    return hashlib.sha1(f"{PAYLOAD_FORMAT}:{version}:{stats_version}".encode()).hexdigest()[:20]
+
+
+def render_payloads(visualizations):
+    """
+    Serialize each figure to JSON once.
+
+    Returns:
+        dict: Visualization name -> UTF-8 JSON bytes (figures that are None are left out)
+    """
+    return {name: fig.to_json().encode('utf-8') for name, fig in visualizations.items() if fig is not None}
+
+
+def combine_payloads(payloads):
+    """Join per-figure JSON into a single JSON object without parsing it again."""
+    parts = [json.dumps(name).encode('utf-8') + b':' + payload for name, payload in payloads.items()]
+    return b'{' + b','.join(parts) + b'}'
+
+
+class VizPayloadStore:
+    """Rendered figure JSON keyed by data version, kept for the latest version only."""
+
+    def __init__(self, db_path=VIZ_PAYLOAD_PATH):
+        self.db_path = db_path
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS payloads ("
+                "version TEXT NOT NULL, name TEXT NOT NULL, position INTEGER NOT NULL, "
+                "payload BLOB NOT NULL, built_at TEXT NOT NULL, PRIMARY KEY (version, name))"
+            )
+        return conn
+
+    def get(self, version):
+        """
+        Return the stored figures for a data version.
+
+        Returns:
+            dict: Visualization name -> JSON bytes, or None if the version has no payloads
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT name, payload FROM payloads WHERE version = ? ORDER BY position", (version,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return {name: bytes(payload) for name, payload in rows} or None
+
+    def put(self, version, payloads):
+        """Store the figures for a data version, replacing those of every other version."""
+        built_at = datetime.now().isoformat(timespec='seconds')
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM payloads")
+                conn.executemany(
+                    "INSERT INTO payloads VALUES (?, ?, ?, ?, ?)",
+                    [(version, name, position, sqlite3.Binary(payload), built_at)
+                     for position, (name, payload) in enumerate(payloads.items())],
+                )
+        finally:
+            conn.close()
+
+
+# Latest combined payload in this process, as (version, bytes)
+_latest = (None, None)
+_build_lock = threading.Lock()
+
+
+def get_visualization_payload(store=None, payload_store=None, rebuild=False):
+    """
+    Return the combined JSON of all opportunity visualizations for the current data.
+
+    Looks in memory, then in the payload store, and builds the figures only if
+    neither has the current version. Concurrent callers wait for a single build.
+
+    Args:
+        store (MasterStore): Master data the figures are built from
+        payload_store (VizPayloadStore): Where rendered figures are kept
+        rebuild (bool): Render the figures even if stored payloads exist
+
+    Returns:
+        tuple: (version, JSON bytes); the bytes are None if nothing could be built
+    """
+    global _latest
+    store = store or MasterStore()
+    payload_store = payload_store or VizPayloadStore()
+    version = data_version(store)
+    if version is None:
+        return None, None
+
+    with _build_lock:
+        if not rebuild and _latest[0] == version:
+            return _latest
+
+        payloads = None if rebuild else payload_store.get(version)
+        if payloads is None:
+            console.print(f"[blue]Building opportunity visualization payloads for data version {version}...[/blue]")
+            payloads = render_payloads(create_all_visualizations())
+            if not payloads:
+                return version, None
+            payload_store.put(version, payloads)
+
+        _latest = (version, combine_payloads(payloads))
+        return _latest
@@ -0,0 +1,9 @@
+"""
+Data store module for ADLA
+Provides shared access to the master listings dataset
+"""
+
+from modules.datastore.master_store import MasterStore, get_store, read_frame
+from modules.datastore.master_cache import master_cache, get_master_data
+
+__all__ = ['MasterStore', 'get_store', 'read_frame', 'master_cache', 'get_master_data']
@@ -0,0 +1,106 @@
+"""
+Process-wide cache of the master listings dataset.
+
+The web UI and the visualization modules all read the master dataset. Loading
+it is the most expensive part of serving a request, so the frame is kept in
+memory and only reloaded when the store file's mtime or size changes.
+"""
+
+import threading
+from datetime import datetime
+
+from rich.console import Console
+
+from modules.datastore.master_store import MasterStore
+
+# Initialize rich console for output
+console = Console()
+
+
+class MasterDataCache:
+    """
+    Thread-safe in-memory cache of the master dataset.
+
+    The cached frame is shared between callers, so `get()` hands out a shallow
+    copy. Adding or replacing columns on it is safe; callers that want to
+    modify values in place must take their own `copy()` first.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or MasterStore()
+        self._lock = threading.Lock()
+        self._frame = None
+        self._signature = None
+        self._loaded_at = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _file_signature(self):
+        """Return (mtime_ns, size) for the store file, or None if there is no data."""
+        try:
+            return self.store.signature()
+        except OSError:
+            return None
+
+    def get(self):
+        """
+        Return the master dataset, reloading it only if the file has changed.
+
+        Returns:
+            DataFrame: Shallow copy of the cached data, or None if the file is missing
+        """
+        signature = self._file_signature()
+        if signature is None:
+            console.print(f"[red]Error: Master data not found at {self.store.db_path}[/red]")
+            return None
+
+        with self._lock:
+            if self._frame is not None and signature == self._signature:
+                self.hits += 1
+                return self._frame.copy(deep=False)
+
+            self.misses += 1
+            try:
+                console.print(f"[green]Loading data from {self.store.db_path}...[/green]")
+                frame = self.store.read_frame()
+            except Exception as e:
+                console.print(f"[red]Error loading data: {str(e)}[/red]")
+                return None
+
+            if self._frame is not None:
+                self.reloads += 1
+            self._frame = frame
+            self._signature = signature
+            self._loaded_at = datetime.now()
+            console.print(f"[green]Successfully loaded data: {len(frame)} rows[/green]")
+            return self._frame.copy(deep=False)
+
+    def invalidate(self):
+        """Drop the cached frame so the next `get()` re-reads the store."""
+        with self._lock:
+            self._frame = None
+            self._signature = None
+
+    def stats(self):
+        """Return hit/miss counters and details about the cached frame."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "rows": len(self._frame) if self._frame is not None else 0,
+                "columns": len(self._frame.columns) if self._frame is not None else 0,
+                "loaded_at": self._loaded_at.isoformat() if self._loaded_at else None,
+            }
+
+
+# Shared instance used by the dashboard and visualization modules
+master_cache = MasterDataCache()
+
+
+def get_master_data():
+    """Return the master dataset from the shared cache."""
+    return master_cache.get()
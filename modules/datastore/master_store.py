@@ -0,0 +1,568 @@
+"""
+SQLite-backed storage for the master listings dataset.
+
+The master dataset used to live only in database/master.csv, and every pipeline
+stage read the whole file and wrote it back after each change. The store keeps
+the same rows in database/master.db so stages can update just the columns and
+rows they touch. Rows are keyed by StockNumber, and an index on
+(Latitude, Longitude) supports the coordinate-keyed census updates. CSV export
+is still available for spreadsheets and backups.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+from rich.console import Console
+
+# Initialize rich console for output
+console = Console()
+
+# Default locations of the master dataset
+MASTER_DB_PATH = os.path.join("database", "master.db")
+MASTER_CSV_PATH = os.path.join("database", "master.csv")
+
+# Table and internal row identifier
+TABLE_NAME = "listings"
+ROW_ID = "row_id"
+
+# Key used by the census stages to match rows
+COORDINATE_KEY = ("Latitude", "Longitude")
+
+# Side table of store bookkeeping (e.g. the master.csv signature at the last import/export)
+META_TABLE = "store_meta"
+
+# Meta key of the token replaced by every write to the listings table
+LISTINGS_VERSION_KEY = "listings_version"
+
+# Let sqlite3 store numpy and pandas scalars directly
+sqlite3.register_adapter(np.int64, int)
+sqlite3.register_adapter(np.int32, int)
+sqlite3.register_adapter(np.float32, float)
+sqlite3.register_adapter(np.bool_, bool)
+sqlite3.register_adapter(pd.Timestamp, str)
+
+# Serializes the CSV migration between threads
+_init_lock = threading.Lock()
+
+# (db path, csv path) -> master.csv signature already checked in this process
+_known_csv_signatures = {}
+
+# db path -> (file signature, listings version) last read in this process
+_known_listings_versions = {}
+
+
+def quote_identifier(name):
+    """Quote a column name for use in SQL (column names contain spaces and brackets)."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _to_sql_rows(frame):
+    """Convert a DataFrame into a list of row tuples with NaN replaced by None."""
+    values = frame.astype(object).where(frame.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+class MasterStore:
+    """
+    Column-level access to the master listings table.
+
+    The table keeps an internal integer `row_id` so insertion order is stable
+    and rows without a stock number (before `generate_all_stock_numbers` runs)
+    can still be addressed. StockNumber is indexed and is the key the rest of
+    the application uses. Like the CSV it replaces, the table accepts duplicate
+    stock numbers; they are reported when a CSV is imported.
+
+    master.csv is only read automatically to create master.db. Afterwards it
+    is a snapshot refreshed by `export_csv`, and stages that write the store
+    do not update it, so it can lack columns written since. Edits to it are
+    never loaded automatically (that would discard those columns); a warning
+    points to the explicit `--import-csv` instead.
+    """
+
+    def __init__(self, db_path=MASTER_DB_PATH, csv_path=MASTER_CSV_PATH):
+        self.db_path = db_path
+        self.csv_path = csv_path
+
+    def _connect(self):
+        """Open a connection, migrating master.csv first if there is no database yet."""
+        with _init_lock:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            if os.path.exists(self.csv_path):
+                if not os.path.exists(self.db_path):
+                    console.print(f"[blue]Migrating {self.csv_path} into {self.db_path}...[/blue]")
+                    self._import_csv_file()
+                else:
+                    self._warn_if_csv_edited()
+            return sqlite3.connect(self.db_path, timeout=30)
+
+    def _remember_csv(self, signature):
+        _known_csv_signatures[(self.db_path, self.csv_path)] = signature
+
+    def _csv_signature(self):
+        """Return [mtime_ns, size] of master.csv, or None if it does not exist."""
+        try:
+            stat = os.stat(self.csv_path)
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    @staticmethod
+    def _get_meta(conn, key):
+        """Return a value recorded by `_set_meta`, or None."""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (META_TABLE,)
+        ).fetchone()
+        if not exists:
+            return None
+        row = conn.execute(f"SELECT value FROM {META_TABLE} WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def _set_meta(conn, key, value):
+        """Record a JSON value in the store's meta table."""
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {META_TABLE} (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute(f"INSERT OR REPLACE INTO {META_TABLE} VALUES (?, ?)", (key, json.dumps(value)))
+
+    @classmethod
+    def _bump_listings_version(cls, conn):
+        """Record a new listings version; call inside the transaction that writes the rows."""
+        cls._set_meta(conn, LISTINGS_VERSION_KEY, uuid.uuid4().hex)
+
+    def _warn_if_csv_edited(self):
+        """
+        Warn, once per version of the file, that master.csv was edited outside the store.
+
+        The edits are not loaded: master.csv is only refreshed by exports, so
+        replacing the table with it would drop every column written since the
+        last export. Stores that predate the recorded signature are not checked.
+        """
+        signature = self._csv_signature()
+        if signature is None or signature == _known_csv_signatures.get((self.db_path, self.csv_path)):
+            return
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            recorded = self._get_meta(conn, "csv_signature")
+        finally:
+            conn.close()
+        if recorded is not None and recorded != signature:
+            console.print(f"[yellow]Warning: {self.csv_path} was edited outside the store; the edits are not "
+                          f"loaded into {self.db_path}. To load them, run 'python -m modules.datastore.master_store "
+                          f"--import-csv', which replaces the store with the CSV, including columns written "
+                          f"since it was last exported.[/yellow]")
+        self._remember_csv(signature)
+
+    def _import_csv_file(self, path=None):
+        """
+        Replace the listings table with a CSV file in a single transaction.
+
+        If the import fails, a database file created for it is removed so the
+        next run retries the migration instead of reading an empty table.
+
+        Returns:
+            int: Number of imported rows
+        """
+        path = path or self.csv_path
+        frame = pd.read_csv(path)
+        report_duplicate_stock_numbers(frame, path)
+        is_master_csv = os.path.abspath(path) == os.path.abspath(self.csv_path)
+        created = not os.path.exists(self.db_path)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("BEGIN")
+            self._write_new_table(conn, frame)
+            self._bump_listings_version(conn)
+            if is_master_csv:
+                self._set_meta(conn, "csv_signature", self._csv_signature())
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            conn.close()
+            if created:
+                for stale_path in (self.db_path, f"{self.db_path}-journal"):
+                    if os.path.exists(stale_path):
+                        os.remove(stale_path)
+            raise
+        conn.close()
+        if is_master_csv:
+            self._remember_csv(self._csv_signature())
+        return len(frame)
+
+    def _has_table(self, conn):
+        row = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name=?", (TABLE_NAME,)
+        ).fetchone()
+        return row is not None
+
+    def _table_columns(self, conn):
+        """Return the data columns of the listings table in table order."""
+        if not self._has_table(conn):
+            return []
+        info = conn.execute(f"PRAGMA table_info({quote_identifier(TABLE_NAME)})").fetchall()
+        return [row[1] for row in info if row[1] != ROW_ID]
+
+    def _create_table(self, conn, columns):
+        """Create the listings table with StockNumber first and the key indexes."""
+        ordered = ["StockNumber"] + [col for col in columns if col not in ("StockNumber", ROW_ID)]
+        for col in COORDINATE_KEY:
+            if col not in ordered:
+                ordered.append(col)
+
+        column_sql = ", ".join(quote_identifier(col) for col in ordered)
+        conn.execute(
+            f"CREATE TABLE {quote_identifier(TABLE_NAME)} "
+            f"({quote_identifier(ROW_ID)} INTEGER PRIMARY KEY, {column_sql})"
+        )
+        conn.execute(
+            f"CREATE INDEX idx_{TABLE_NAME}_stock_number "
+            f"ON {quote_identifier(TABLE_NAME)} ({quote_identifier('StockNumber')})"
+        )
+        conn.execute(
+            f"CREATE INDEX idx_{TABLE_NAME}_coordinates ON {quote_identifier(TABLE_NAME)} "
+            f"({quote_identifier('Latitude')}, {quote_identifier('Longitude')})"
+        )
+
+    def _ensure_columns(self, conn, columns):
+        """Create the table or add any columns it does not have yet."""
+        if not self._has_table(conn):
+            self._create_table(conn, columns)
+            return
+
+        existing = set(self._table_columns(conn))
+        for col in columns:
+            if col != ROW_ID and col not in existing:
+                conn.execute(
+                    f"ALTER TABLE {quote_identifier(TABLE_NAME)} ADD COLUMN {quote_identifier(col)}"
+                )
+                existing.add(col)
+
+    def _insert(self, conn, frame):
+        columns = [col for col in frame.columns if col != ROW_ID]
+        if not columns or frame.empty:
+            return 0
+        column_sql = ", ".join(quote_identifier(col) for col in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        conn.executemany(
+            f"INSERT INTO {quote_identifier(TABLE_NAME)} ({column_sql}) VALUES ({placeholders})",
+            _to_sql_rows(frame[columns]),
+        )
+        return len(frame)
+
+    def _write_new_table(self, conn, frame):
+        conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(TABLE_NAME)}")
+        self._create_table(conn, list(frame.columns))
+        self._insert(conn, frame)
+
+    def exists(self):
+        """Return True if there is any master data (store or legacy CSV)."""
+        return os.path.exists(self.db_path) or os.path.exists(self.csv_path)
+
+    def signature(self):
+        """
+        Return a value that changes whenever the store is written.
+
+        Returns:
+            tuple: (mtime_ns, size) of the database file, or None if there is no master data
+        """
+        if not self.exists():
+            return None
+        if not os.path.exists(self.db_path):
+            # Trigger the CSV migration so the signature refers to the store
+            self._connect().close()
+        stat = os.stat(self.db_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def listings_version(self):
+        """
+        Return a value that changes only when the listings table is written.
+
+        Unlike `signature`, writes to side tables (metric state, market stats,
+        store bookkeeping) leave it unchanged. The meta table is only read when
+        the database file changed since the last call.
+
+        Returns:
+            str: Version token, or None if there is no master data
+        """
+        signature = self.signature()
+        if signature is None:
+            return None
+        known = _known_listings_versions.get(self.db_path)
+        if known is not None and known[0] == signature:
+            return known[1]
+
+        conn = self._connect()
+        try:
+            version = self._get_meta(conn, LISTINGS_VERSION_KEY)
+        finally:
+            conn.close()
+        if version is None:
+            # Written before versions were recorded; fall back to the file signature
+            version = f"{signature[0]}:{signature[1]}"
+        _known_listings_versions[self.db_path] = (signature, version)
+        return version
+
+    def columns(self):
+        """Return the list of data columns in the store."""
+        if not self.exists():
+            return []
+        conn = self._connect()
+        try:
+            return self._table_columns(conn)
+        finally:
+            conn.close()
+
+    def count(self):
+        """Return the number of rows in the store."""
+        if not self.exists():
+            return 0
+        conn = self._connect()
+        try:
+            if not self._has_table(conn):
+                return 0
+            return conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(TABLE_NAME)}").fetchone()[0]
+        finally:
+            conn.close()
+
+    def read_frame(self, columns=None, with_row_ids=False):
+        """
+        Read the master dataset.
+
+        Args:
+            columns (list): Columns to read; None reads every column. Columns that
+                do not exist in the store are skipped.
+            with_row_ids (bool): Index the result by the store's row id so it can be
+                passed back to `upsert_columns` without a key column.
+
+        Returns:
+            DataFrame: The requested data in insertion order, or None if there is no master data
+        """
+        if not self.exists():
+            return None
+
+        conn = self._connect()
+        try:
+            available = self._table_columns(conn)
+            if columns is None:
+                selected = available
+            else:
+                available_set = set(available)
+                selected = [col for col in columns if col in available_set]
+
+            if not self._has_table(conn):
+                frame = pd.DataFrame(columns=selected)
+                frame.index.name = ROW_ID
+            else:
+                select_sql = ", ".join(quote_identifier(col) for col in [ROW_ID] + selected)
+                frame = pd.read_sql_query(
+                    f"SELECT {select_sql} FROM {quote_identifier(TABLE_NAME)} "
+                    f"ORDER BY {quote_identifier(ROW_ID)}",
+                    conn,
+                    index_col=ROW_ID,
+                )
+        finally:
+            conn.close()
+
+        # Columns that are entirely NULL come back as object None; match read_csv
+        frame = frame.fillna(np.nan) if len(frame) else frame
+        if not with_row_ids:
+            frame = frame.reset_index(drop=True)
+        return frame
+
+    def append_rows(self, frame):
+        """
+        Append new listings to the store, adding any new columns.
+
+        Returns:
+            int: Number of rows inserted
+        """
+        frame = frame.drop(columns=[ROW_ID], errors="ignore")
+        conn = self._connect()
+        try:
+            with conn:
+                self._ensure_columns(conn, list(frame.columns))
+                inserted = self._insert(conn, frame)
+                if inserted:
+                    self._bump_listings_version(conn)
+                return inserted
+        finally:
+            conn.close()
+
+    def upsert_columns(self, frame, key=ROW_ID, insert_missing=False):
+        """
+        Write the columns of `frame` into the rows matching `key`.
+
+        Only the columns present in `frame` are touched; missing columns are added
+        to the table first. The whole update runs in one transaction.
+
+        Args:
+            frame (DataFrame): Rows to write. With key=ROW_ID the row ids are taken
+                from the `row_id` column if present, otherwise from the index.
+            key (str or tuple): ROW_ID, 'StockNumber', or COORDINATE_KEY
+            insert_missing (bool): Insert rows whose key is not in the store
+
+        Returns:
+            tuple: (rows updated, rows inserted)
+        """
+        if frame is None or frame.empty:
+            return (0, 0)
+
+        key_columns = [key] if isinstance(key, str) else list(key)
+        if key_columns == [ROW_ID] and ROW_ID not in frame.columns:
+            frame = frame.rename_axis(ROW_ID).reset_index()
+
+        missing_keys = [col for col in key_columns if col not in frame.columns]
+        if missing_keys:
+            raise KeyError(f"Key columns not found in frame: {missing_keys}")
+
+        value_columns = [col for col in frame.columns if col not in key_columns]
+        if not value_columns and not insert_missing:
+            return (0, 0)
+
+        set_sql = ", ".join(f"{quote_identifier(col)} = ?" for col in value_columns)
+        where_sql = " AND ".join(f"{quote_identifier(col)} = ?" for col in key_columns)
+        update_sql = f"UPDATE {quote_identifier(TABLE_NAME)} SET {set_sql} WHERE {where_sql}"
+
+        insert_columns = [col for col in frame.columns if col != ROW_ID]
+        insert_sql = (
+            f"INSERT INTO {quote_identifier(TABLE_NAME)} "
+            f"({', '.join(quote_identifier(col) for col in insert_columns)}) "
+            f"VALUES ({', '.join('?' for _ in insert_columns)})"
+        )
+
+        value_rows = _to_sql_rows(frame[value_columns]) if value_columns else [()] * len(frame)
+        key_rows = _to_sql_rows(frame[key_columns])
+        insert_rows = _to_sql_rows(frame[insert_columns]) if insert_missing else None
+
+        updated = 0
+        inserted = 0
+        conn = self._connect()
+        try:
+            with conn:
+                self._ensure_columns(conn, [col for col in frame.columns if col != ROW_ID])
+                for i, (values, keys) in enumerate(zip(value_rows, key_rows)):
+                    rowcount = 0
+                    if value_columns:
+                        rowcount = conn.execute(update_sql, values + keys).rowcount
+                    elif insert_missing:
+                        rowcount = conn.execute(
+                            f"SELECT COUNT(*) FROM {quote_identifier(TABLE_NAME)} WHERE {where_sql}", keys
+                        ).fetchone()[0]
+                    if rowcount:
+                        updated += rowcount
+                    elif insert_missing:
+                        conn.execute(insert_sql, insert_rows[i])
+                        inserted += 1
+                if updated or inserted:
+                    self._bump_listings_version(conn)
+        finally:
+            conn.close()
+
+        return (updated, inserted)
+
+    def replace_frame(self, frame):
+        """Replace the whole table with `frame` (used for imports and repairs)."""
+        conn = self._connect()
+        try:
+            with conn:
+                self._write_new_table(conn, frame.drop(columns=[ROW_ID], errors="ignore"))
+                self._bump_listings_version(conn)
+        finally:
+            conn.close()
+
+    def import_csv(self, path=None):
+        """Load a CSV file into the store, replacing its contents."""
+        path = path or self.csv_path
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with _init_lock:
+            count = self._import_csv_file(path)
+        console.print(f"[green]Imported {count} rows from {path}[/green]")
+        return count
+
+    def export_csv(self, path=None):
+        """
+        Export the store to CSV, replacing the target file atomically.
+
+        Returns:
+            str: Path of the written CSV, or None if there is no master data
+        """
+        path = path or self.csv_path
+        frame = self.read_frame()
+        if frame is None:
+            return None
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        frame.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+        # Remember the exported file so it is not mistaken for an outside edit
+        if os.path.abspath(path) == os.path.abspath(self.csv_path):
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                with conn:
+                    self._set_meta(conn, "csv_signature", self._csv_signature())
+            finally:
+                conn.close()
+            self._remember_csv(self._csv_signature())
+        return path
+
+
+def report_duplicate_stock_numbers(frame, source):
+    """
+    Warn about stock numbers that appear on more than one row.
+
+    Duplicates are kept (the CSV workflow allowed them), but updates keyed by
+    StockNumber will write to every matching row.
+
+    Returns:
+        list: The duplicated stock numbers
+    """
+    if "StockNumber" not in frame.columns:
+        return []
+    stock = frame["StockNumber"].dropna()
+    duplicates = sorted(stock[stock.duplicated()].astype(str).unique())
+    if duplicates:
+        shown = ", ".join(duplicates[:10]) + (" ..." if len(duplicates) > 10 else "")
+        console.print(f"[yellow]Warning: {len(duplicates)} duplicate StockNumber values in {source}: {shown}[/yellow]")
+    return duplicates
+
+
+def get_store():
+    """Return a store for the default master dataset location."""
+    return MasterStore()
+
+
+def read_frame(columns=None, with_row_ids=False):
+    """Read the master dataset from the default store."""
+    return get_store().read_frame(columns=columns, with_row_ids=with_row_ids)
+
+
+def main():
+    """Command-line entry point for importing and exporting the master dataset."""
+    parser = argparse.ArgumentParser(description="Manage the ADLA master dataset store.")
+    parser.add_argument("--export-csv", nargs="?", const=MASTER_CSV_PATH, default=None,
+                        help="Export the store to CSV (default: database/master.csv).")
+    parser.add_argument("--import-csv", nargs="?", const=MASTER_CSV_PATH, default=None,
+                        help="Replace the store with the contents of a CSV file.")
+    args = parser.parse_args()
+
+    store = get_store()
+    if args.import_csv:
+        store.import_csv(args.import_csv)
+    if args.export_csv:
+        path = store.export_csv(args.export_csv)
+        if path:
+            console.print(f"[green]Exported {store.count()} rows to {path}[/green]")
+        else:
+            console.print("[red]Error: No master data to export.[/red]")
+    if not args.import_csv and not args.export_csv:
+        console.print(f"[blue]{store.count()} rows, {len(store.columns())} columns in {store.db_path}[/blue]")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ from rich.table import Table
 import tkinter as tk
 from tkinter import filedialog
 import re
+from modules.datastore.master_store import get_store
 
 # Initialize Rich console
 console = Console()
@@ -125,10 +126,10 @@ def process_listings(market):
         "files_processed": []
     }
     
-    # Read the master file if it exists
-    master_path = os.path.join("database", "master.csv")
-    if os.path.exists(master_path):
-        master_df = pd.read_csv(master_path)
+    # Read the master dataset if it exists
+    store = get_store()
+    master_df = store.read_frame()
+    if master_df is not None:
         console.print("\n[blue]Found existing master database.[/blue]")
     else:
         master_df = pd.DataFrame()
@@ -291,8 +292,9 @@ def process_listings(market):
                 console.print("[red]Error: Duplicate stock numbers detected. Processing stopped.[/red]")
                 return False
                 
-            # Save the updated master file
-            updated_df.to_csv(master_path, index=False)
+            # Append only the new listings to the master store
+            store.append_rows(new_listings)
+            master_df = updated_df
             
             # Update overall summary
             overall_summary["total_processed"] += file_listings
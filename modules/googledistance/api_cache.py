@@ -0,0 +1,247 @@
+"""
+Persistent cache of Google Maps API responses.
+
+Re-running the Walmart step after partial failures, or after new listings come
+in near old ones, repeated the same Places and Distance Matrix lookups. The
+responses are stored in a small SQLite table keyed by the endpoint path plus
+the normalized request parameters. The API key is left out of the key and
+coordinates are rounded to a fixed precision, so the same lookup made with a
+different key or a few centimetres away is a hit. Distance Matrix results are
+stored per origin (see walmart_distance.get_travel_details_batch), so they
+hit however a later run groups its origins into requests.
+
+Entries expire after a TTL, and the least recently used entries are evicted
+once the table holds more than `max_entries` responses. Only final answers
+(OK / ZERO_RESULTS) are stored; quota and server errors are never cached.
+
+Hits do not write to the database: their last-used times are collected in
+memory and written in one transaction every TOUCH_FLUSH_ENTRIES hits or
+TOUCH_FLUSH_SECONDS seconds, and on close. Eviction only runs when a running
+count of the entries passes `max_entries` by EVICTION_SLACK.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+# Default location of the cache
+API_CACHE_PATH = os.path.join("database", "google_api_cache.db")
+
+# Decimal places kept for coordinates in cache keys (5 places is about 1 metre)
+DEFAULT_PRECISION = 5
+
+# Default lifetime of a cached response (Google allows caching for up to 30 days)
+DEFAULT_TTL_DAYS = 30
+
+# Default maximum number of cached responses
+DEFAULT_MAX_ENTRIES = 100000
+
+# Pending last-used updates are written after this many hits ...
+TOUCH_FLUSH_ENTRIES = 500
+
+# ... or when the oldest pending one is this many seconds old
+TOUCH_FLUSH_SECONDS = 30.0
+
+# Fraction of max_entries the table may grow past before eviction runs
+EVICTION_SLACK = 0.05
+
+# Parameters never included in cache keys
+EXCLUDED_PARAMS = ('key',)
+
+# Response statuses that are safe to cache
+CACHEABLE_STATUSES = ('OK', 'ZERO_RESULTS')
+
+# Decimal numbers inside parameter values (coordinates in "lat,lng|lat,lng")
+_NUMBER = re.compile(r"-?\d+\.\d+")
+
+
+def normalize_params(params, precision=DEFAULT_PRECISION):
+    """
+    Return the canonical cache-key form of request parameters.
+
+    The API key is dropped, parameters are sorted by name and decimal numbers
+    are rounded to `precision` places.
+    """
+    normalized = []
+    for name in sorted(params):
+        if name in EXCLUDED_PARAMS:
+            continue
+        value = _NUMBER.sub(lambda m: f"{round(float(m.group()), precision):.{precision}f}", str(params[name]))
+        normalized.append(f"{name}={value}")
+    return "&".join(normalized)
+
+
+class ApiResponseCache:
+    """
+    SQLite-backed LRU cache of JSON responses.
+
+    Every hit refreshes the entry's last-used time (written in batches), and
+    `put()` evicts the least recently used entries beyond `max_entries` once
+    the table has grown EVICTION_SLACK past it.
+    """
+
+    def __init__(self, db_path=API_CACHE_PATH, ttl=DEFAULT_TTL_DAYS * 86400, max_entries=DEFAULT_MAX_ENTRIES,
+                 precision=DEFAULT_PRECISION):
+        """
+        Args:
+            db_path (str): SQLite file holding the cache
+            ttl (float): Seconds after which a response is stale (None keeps responses forever)
+            max_entries (int): Maximum number of cached responses, exceeded by at most
+                EVICTION_SLACK between evictions (None for no limit)
+            precision (int): Decimal places kept for coordinates in keys
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.precision = precision
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evicted = 0
+        self.stored = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        # (endpoint, params) -> last-used time not yet written
+        self._touched = {}
+        self._touched_since = None
+        # Upper bound on the number of stored entries (inserts are counted
+        # whether or not they replace an entry; corrected on eviction)
+        self._entries = None
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "endpoint TEXT NOT NULL, params TEXT NOT NULL, response TEXT NOT NULL, "
+                    "created_at REAL NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (endpoint, params))"
+                )
+                self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return self._conn
+
+    def _flush_touches(self, conn):
+        """Write the pending last-used times in one transaction (caller holds the lock)."""
+        if not self._touched:
+            return
+        with conn:
+            conn.executemany(
+                "UPDATE responses SET last_used = MAX(last_used, ?) WHERE endpoint = ? AND params = ?",
+                [(used, endpoint, key) for (endpoint, key), used in self._touched.items()],
+            )
+        self._touched = {}
+        self._touched_since = None
+
+    def _evict(self, conn):
+        """Drop the least recently used entries beyond max_entries (caller holds the lock)."""
+        self._flush_touches(conn)
+        with conn:
+            cursor = conn.execute(
+                "DELETE FROM responses WHERE rowid IN ("
+                "SELECT rowid FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        self.evicted += max(cursor.rowcount, 0)
+        self._entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def key(self, url, params):
+        """Return the (endpoint, params) a request is stored under."""
+        return urlparse(url).path, normalize_params(params, self.precision)
+
+    def get(self, url, params):
+        """
+        Return the cached response for a request, or None on a miss.
+
+        Args:
+            url (str): Endpoint URL
+            params (dict): Request parameters
+
+        Returns:
+            dict: Decoded JSON response, or None
+        """
+        endpoint, key = self.key(url, params)
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT response, created_at FROM responses WHERE endpoint = ? AND params = ?", (endpoint, key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            response, created_at = row
+            now = time.time()
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._touched.pop((endpoint, key), None)
+                with conn:
+                    conn.execute("DELETE FROM responses WHERE endpoint = ? AND params = ?", (endpoint, key))
+                self.stale += 1
+                self.misses += 1
+                return None
+
+            self._touched[(endpoint, key)] = now
+            if self._touched_since is None:
+                self._touched_since = now
+            if len(self._touched) >= TOUCH_FLUSH_ENTRIES or now - self._touched_since >= TOUCH_FLUSH_SECONDS:
+                self._flush_touches(conn)
+            self.hits += 1
+            return json.loads(response)
+
+    def put(self, url, params, data):
+        """Store a response if its status is cacheable. Returns True if it was stored."""
+        if not isinstance(data, dict) or data.get('status') not in CACHEABLE_STATUSES:
+            return False
+        endpoint, key = self.key(url, params)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                    (endpoint, key, json.dumps(data), now, now),
+                )
+            self._touched.pop((endpoint, key), None)
+            self._entries += 1
+            self.stored += 1
+            if self.max_entries is not None and self._entries > self.max_entries * (1 + EVICTION_SLACK):
+                self._evict(conn)
+        return True
+
+    def flush(self):
+        """Write the pending last-used times now."""
+        with self._lock:
+            if self._conn is not None:
+                self._flush_touches(self._conn)
+
+    def stats(self):
+        """Return entry counts per endpoint and this session's hit/miss counters."""
+        with self._lock:
+            by_endpoint = dict(self._connection().execute(
+                "SELECT endpoint, COUNT(*) FROM responses GROUP BY endpoint"
+            ).fetchall())
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(by_endpoint.values()),
+                "places": sum(n for endpoint, n in by_endpoint.items() if "/place/" in endpoint),
+                "distance_matrix": sum(n for endpoint, n in by_endpoint.items() if "/distancematrix/" in endpoint),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "stored": self.stored,
+                "evicted": self.evicted,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+    def close(self):
+        """Write the pending last-used times and close the database."""
+        with self._lock:
+            if self._conn is not None:
+                self._flush_touches(self._conn)
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,96 @@
+"""
+Vectorized great-circle helpers for the Walmart proximity pipeline.
+
+Besides exact straight-line distances, this module estimates road distance and
+drive time from them (straight-line miles times a road factor, at an average
+speed). The factor and speed can be calibrated against Distance Matrix results
+already collected, and the estimate stands in for the API when it is
+unavailable or the request budget is spent.
+"""
+
+import numpy as np
+
+# Mean Earth radius in miles
+EARTH_RADIUS_MILES = 3958.7613
+
+# Metres per mile
+METERS_PER_MILE = 1609.34
+
+# Road miles per straight-line mile used before calibration
+DEFAULT_ROAD_FACTOR = 1.3
+
+# Average driving speed (mph) used before calibration
+DEFAULT_SPEED_MPH = 40.0
+
+# Fewest API results needed to calibrate the road model
+MIN_CALIBRATION_SAMPLES = 20
+
+# Calibrated road factors are clipped to this range
+ROAD_FACTOR_BOUNDS = (1.0, 3.0)
+
+# Calibrated speeds (mph) are clipped to this range
+SPEED_BOUNDS_MPH = (10.0, 70.0)
+
+
+def haversine_miles(lat1, lng1, lat2, lng2):
+    """
+    Great-circle distance in miles, broadcasting over NumPy arrays.
+
+    Args:
+        lat1, lng1: Latitude/longitude of the first point(s) in degrees
+        lat2, lng2: Latitude/longitude of the second point(s) in degrees
+
+    Returns:
+        ndarray or float: Distances in miles
+    """
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def calibrate_road_model(straight_miles, road_miles, travel_minutes, min_samples=MIN_CALIBRATION_SAMPLES):
+    """
+    Fit the road factor and average speed to known routes.
+
+    Medians are used so a few detours or ferry routes do not skew the model.
+
+    Args:
+        straight_miles (array-like): Straight-line distances of the routes
+        road_miles (array-like): Road distances reported by the API
+        travel_minutes (array-like): Travel times reported by the API
+        min_samples (int): Fewest usable routes needed; below that the defaults are returned
+
+    Returns:
+        tuple: (road_factor, speed_mph, samples used)
+    """
+    straight_miles = np.asarray(straight_miles, dtype=float)
+    road_miles = np.asarray(road_miles, dtype=float)
+    travel_minutes = np.asarray(travel_minutes, dtype=float)
+
+    # Very short routes are dominated by parking-lot distance, so skip them
+    usable = (straight_miles > 0.5) & (road_miles > 0) & (travel_minutes > 0)
+    samples = int(usable.sum())
+    if samples < min_samples:
+        return DEFAULT_ROAD_FACTOR, DEFAULT_SPEED_MPH, samples
+
+    road_factor = float(np.median(road_miles[usable] / straight_miles[usable]))
+    speed_mph = float(np.median(road_miles[usable] / (travel_minutes[usable] / 60)))
+    return (float(np.clip(road_factor, *ROAD_FACTOR_BOUNDS)),
+            float(np.clip(speed_mph, *SPEED_BOUNDS_MPH)),
+            samples)
+
+
+def estimate_travel(straight_miles, road_factor=DEFAULT_ROAD_FACTOR, speed_mph=DEFAULT_SPEED_MPH):
+    """
+    Estimate road distance and drive time from straight-line distance.
+
+    Args:
+        straight_miles (array-like): Straight-line distances in miles
+        road_factor (float): Road miles per straight-line mile
+        speed_mph (float): Average driving speed
+
+    Returns:
+        tuple: (road miles, travel minutes) as arrays
+    """
+    road_miles = np.asarray(straight_miles, dtype=float) * road_factor
+    return road_miles, road_miles / speed_mph * 60
@@ -0,0 +1,141 @@
+"""
+Local registry of known Walmart store locations.
+
+Every Places Nearby Search response lists several stores, and store locations
+rarely change, so the stores are kept in database/walmart_stores.csv. A
+BallTree with the haversine metric answers nearest-store queries for all
+listings in one call, so the Places API is only needed where no known store is
+close enough. The registry can also be seeded from a CSV export.
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from rich.console import Console
+from sklearn.neighbors import BallTree
+
+from modules.googledistance.geo import EARTH_RADIUS_MILES
+
+# Initialize Rich console
+console = Console()
+
+# Default registry location
+STORE_REGISTRY_PATH = os.path.join("database", "walmart_stores.csv")
+
+# Columns kept for each store
+STORE_COLUMNS = ['place_id', 'name', 'lat', 'lng', 'vicinity']
+
+
+class StoreRegistry:
+    """
+    Known stores keyed by Google place_id, with a haversine BallTree over their coordinates.
+
+    Methods are safe to call from several worker threads.
+    """
+
+    def __init__(self, path=STORE_REGISTRY_PATH):
+        self.path = path
+        self.stores = pd.DataFrame(columns=STORE_COLUMNS)
+        self._tree = None
+        self._dirty = False
+        self._lock = threading.RLock()
+        if os.path.exists(path):
+            self.stores = self._normalize(pd.read_csv(path))
+
+    def __len__(self):
+        return len(self.stores)
+
+    @staticmethod
+    def _normalize(frame):
+        """Keep the registry columns, drop rows without coordinates and duplicate place ids."""
+        missing = [col for col in STORE_COLUMNS if col not in frame.columns]
+        if missing:
+            raise ValueError(f"Store data is missing columns: {', '.join(missing)}")
+        frame = frame[STORE_COLUMNS].dropna(subset=['place_id', 'lat', 'lng'])
+        frame = frame.astype({'lat': float, 'lng': float})
+        return frame.drop_duplicates('place_id', keep='last').reset_index(drop=True)
+
+    def _merge(self, frame):
+        with self._lock:
+            before = len(self.stores)
+            merged = pd.concat([self.stores, frame], ignore_index=True) if before else frame
+            self.stores = self._normalize(merged)
+            self._tree = None
+            self._dirty = True
+            return len(self.stores) - before
+
+    def add_places_results(self, results):
+        """
+        Add the stores from a Places Nearby Search `results` list.
+
+        Returns:
+            int: Number of stores not seen before
+        """
+        rows = [{
+            'place_id': result['place_id'],
+            'name': result.get('name'),
+            'lat': result['geometry']['location']['lat'],
+            'lng': result['geometry']['location']['lng'],
+            'vicinity': result.get('vicinity', 'Unknown address'),
+        } for result in results]
+        return self._merge(pd.DataFrame(rows, columns=STORE_COLUMNS)) if rows else 0
+
+    def import_csv(self, path):
+        """
+        Merge stores from a CSV with place_id, name, lat, lng and vicinity columns.
+
+        Returns:
+            int: Number of stores not seen before
+        """
+        added = self._merge(self._normalize(pd.read_csv(path)))
+        console.print(f"[green]Imported {added} new stores from {path} ({len(self)} known)[/green]")
+        return added
+
+    def save(self):
+        """Write the registry if it changed (atomically, via a temporary file)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            self.stores.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def nearest(self, latitudes, longitudes):
+        """
+        Find the nearest known store for every coordinate in one query.
+
+        Args:
+            latitudes (array-like): Latitudes in degrees
+            longitudes (array-like): Longitudes in degrees
+
+        Returns:
+            tuple: (store positions, distances in miles); positions are -1 and
+            distances inf when the registry is empty
+        """
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        with self._lock:
+            if not len(self.stores):
+                return np.full(len(latitudes), -1), np.full(len(latitudes), np.inf)
+            if self._tree is None:
+                self._tree = BallTree(np.radians(self.stores[['lat', 'lng']].to_numpy()), metric='haversine')
+            tree = self._tree
+
+        distances, positions = tree.query(np.radians(np.column_stack([latitudes, longitudes])), k=1)
+        return positions[:, 0], distances[:, 0] * EARTH_RADIUS_MILES
+
+    def store(self, position):
+        """Return the store at `position` in the format of find_nearest_walmart."""
+        with self._lock:
+            row = self.stores.iloc[int(position)]
+        return {
+            'name': row['name'],
+            'place_id': row['place_id'],
+            'lat': row['lat'],
+            'lng': row['lng'],
+            'vicinity': row['vicinity'],
+        }
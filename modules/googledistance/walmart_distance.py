@@ -4,14 +4,27 @@ Finds the nearest Walmart to each property and calculates travel time
 """
 
 import os
+import atexit
 import pandas as pd
 import requests
 import time
 from datetime import datetime
 import json
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from rich.console import Console
 from rich.progress import Progress, TextColumn, BarColumn, TimeElapsedColumn
-import random
+from rich.table import Table
+import argparse
+from modules.datastore.master_store import get_store
+from modules.scraping.rate_limit import AdaptiveRateLimiter, backoff_delay
+from modules.googledistance.geo import haversine_miles, calibrate_road_model, estimate_travel, METERS_PER_MILE
+from modules.googledistance.store_registry import StoreRegistry, STORE_REGISTRY_PATH
+from modules.googledistance.api_cache import (
+    ApiResponseCache, API_CACHE_PATH, DEFAULT_TTL_DAYS, DEFAULT_MAX_ENTRIES, CACHEABLE_STATUSES
+)
 
 # Load environment variables from .env file if available
 try:
@@ -24,13 +37,64 @@ except ImportError:
 # Initialize Rich console
 console = Console()
 
+# Base URL for Google Maps API (override to point at a mock server)
+GOOGLE_MAPS_BASE_URL = os.environ.get("GOOGLE_MAPS_API_BASE_URL", "https://maps.googleapis.com/maps/api")
+
+# Endpoint paths under the base URL
+PLACES_API_PATH = "/place/nearbysearch/json"
+DISTANCE_API_PATH = "/distancematrix/json"
+
 # URLs for Google Maps API
-PLACES_API_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-DISTANCE_API_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+PLACES_API_URL = GOOGLE_MAPS_BASE_URL + PLACES_API_PATH
+DISTANCE_API_URL = GOOGLE_MAPS_BASE_URL + DISTANCE_API_PATH
+
+# Most origins the Distance Matrix API accepts in one request
+MAX_MATRIX_ORIGINS = 25
+
+# Listings whose nearest known store is farther than this (in miles) are looked up with Places
+KNOWN_STORE_MAX_MILES = 10.0
+
+# Travel times are requested from the API only for listings whose store is within
+# this straight-line distance (in miles); farther listings get an estimate
+API_BAND_MAX_MILES = 30.0
+
+# Values of Walmart_Travel_Time_Source
+TRAVEL_SOURCE_API = "distance_matrix"
+TRAVEL_SOURCE_ESTIMATE = "road_factor_estimate"
 
 # Maximum retry attempts for API calls
 MAX_RETRIES = 3
 
+# Buffered results are written to the master dataset after this many listings...
+DEFAULT_FLUSH_ROWS = 200
+
+# ...or this many seconds, whichever comes first
+DEFAULT_FLUSH_SECONDS = 30.0
+
+# Concurrent API requests
+DEFAULT_WORKERS = 8
+
+# Requests per second allowed across all workers
+DEFAULT_QPS = 10.0
+
+# Response cache used by make_api_request (set up in main(); None disables caching)
+API_CACHE = None
+
+# Shared HTTP session and rate limiter (set up in main(); None sends unthrottled requests)
+SESSION = None
+RATE_LIMITER = None
+
+# Cap on API requests for this run (set up in main(); None is unlimited)
+REQUEST_BUDGET = None
+
+# Columns written to the master dataset for each listing
+WALMART_COLUMNS = [
+    'Nearest_Walmart_Address',
+    'Nearest_Walmart_Distance_Miles',
+    'Nearest_Walmart_Travel_Time_Minutes',
+    'Walmart_Travel_Time_Source'
+]
+
 def ensure_api_key():
     """Return the Google Maps API key from environment variable."""
     # Get API key from environment variable
@@ -45,43 +109,107 @@ def ensure_api_key():
     return api_key
 
 def read_master_csv():
-    """Read the master CSV file."""
+    """Read the master dataset, indexed by store row id."""
     try:
-        return pd.read_csv('database/master.csv')
+        return get_store().read_frame(with_row_ids=True)
     except Exception as e:
-        console.print(f"[red]Error reading master CSV: {e}[/red]")
+        console.print(f"[red]Error reading master dataset: {e}[/red]")
         return None
 
-def make_api_request(url, params, retry_count=0):
+def create_session(pool_size=DEFAULT_WORKERS):
+    """Create a requests session that keeps one connection per worker open."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class RequestBudget:
+    """Thread-safe count of the API requests a run may still make."""
+    
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+    
+    def take(self):
+        """Use one request. Returns False once the budget is spent."""
+        with self._lock:
+            if self.used >= self.limit:
+                return False
+            self.used += 1
+            if self.used == self.limit:
+                console.print(f"[yellow]API request budget of {self.limit} reached; "
+                              f"remaining travel times will be estimated[/yellow]")
+            return True
+
+def make_api_request(url, params, retries=MAX_RETRIES, use_cache=True):
     """
     Make an API request with retry logic and exponential backoff.
     
+    Responses are served from and stored in API_CACHE when it is set. Each
+    attempt waits for RATE_LIMITER; OVER_QUERY_LIMIT and HTTP 429 responses
+    slow the limiter down and are retried like network errors.
+    
     Args:
         url (str): The API endpoint URL
         params (dict): Request parameters
-        retry_count (int): Current retry attempt count
+        retries (int): Retries after the first attempt
+        use_cache (bool): Look up and store the whole response in API_CACHE
+            (callers that cache parts of the response pass False)
         
     Returns:
         dict: JSON response data or None if failed
     """
-    try:
-        # Increase timeout for potentially slow connections
-        response = requests.get(url, params=params, timeout=30)
-        return response.json()
-    except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
-        if retry_count < MAX_RETRIES:
-            # Exponential backoff with jitter
-            # Wait 2^retry_count + random jitter seconds
-            backoff_time = (2 ** retry_count) + random.uniform(0.1, 1.0)
-            console.print(f"[yellow]API request failed. Retrying in {backoff_time:.2f} seconds... (Attempt {retry_count + 1}/{MAX_RETRIES})[/yellow]")
-            time.sleep(backoff_time)
-            return make_api_request(url, params, retry_count + 1)
-        else:
-            console.print(f"[red]API request failed after {MAX_RETRIES} attempts: {e}[/red]")
+    if use_cache and API_CACHE is not None:
+        cached = API_CACHE.get(url, params)
+        if cached is not None:
+            return cached
+    
+    http = SESSION or requests
+    error = None
+    for attempt in range(retries + 1):
+        if REQUEST_BUDGET is not None and not REQUEST_BUDGET.take():
             return None
+        if RATE_LIMITER is not None:
+            RATE_LIMITER.acquire()
+        try:
+            # Increase timeout for potentially slow connections
+            response = http.get(url, params=params, timeout=30)
+            if response.status_code == 429:
+                error = "HTTP 429 Too Many Requests"
+            else:
+                data = response.json()
+                if data.get('status') == 'OVER_QUERY_LIMIT':
+                    error = "OVER_QUERY_LIMIT"
+                else:
+                    if RATE_LIMITER is not None:
+                        RATE_LIMITER.succeeded()
+                    if use_cache and API_CACHE is not None:
+                        API_CACHE.put(url, params, data)
+                    return data
+            if RATE_LIMITER is not None:
+                RATE_LIMITER.throttled()
+        except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
+            error = e
+        
+        if attempt < retries:
+            # Exponential backoff with full jitter
+            backoff_time = backoff_delay(attempt, base=1.0, cap=30.0)
+            console.print(f"[yellow]API request failed ({error}). Retrying in {backoff_time:.2f} seconds... (Attempt {attempt + 1}/{retries})[/yellow]")
+            time.sleep(backoff_time)
+    
+    console.print(f"[red]API request failed after {retries} retries: {error}[/red]")
+    return None
 
-def find_nearest_walmart(latitude, longitude, api_key):
-    """Find the nearest Walmart using Google Places API."""
+def find_nearest_walmart(latitude, longitude, api_key, base_url=GOOGLE_MAPS_BASE_URL, registry=None):
+    """
+    Find the nearest Walmart using Google Places API.
+    
+    Places results are ordered by prominence, so the closest result is picked
+    by straight-line distance. Every store in the response is added to
+    `registry` when one is given.
+    """
     params = {
         "location": f"{latitude},{longitude}",
         "radius": "50000",  # 50km radius (about 31 miles)
@@ -90,10 +218,19 @@ def find_nearest_walmart(latitude, longitude, api_key):
         "key": api_key
     }
     
-    data = make_api_request(PLACES_API_URL, params)
+    data = make_api_request(base_url + PLACES_API_PATH, params)
     
     if data and data['status'] == 'OK' and len(data['results']) > 0:
-        nearest_walmart = data['results'][0]
+        results = data['results']
+        if registry is not None:
+            registry.add_places_results(results)
+        
+        distances = haversine_miles(
+            latitude, longitude,
+            [result['geometry']['location']['lat'] for result in results],
+            [result['geometry']['location']['lng'] for result in results],
+        )
+        nearest_walmart = results[int(distances.argmin())]
         return {
             'name': nearest_walmart['name'],
             'place_id': nearest_walmart['place_id'],
@@ -107,42 +244,225 @@ def find_nearest_walmart(latitude, longitude, api_key):
         console.print(f"[red]Failed to get place data for {latitude}, {longitude}[/red]")
     return None
 
-def get_travel_details(origin_lat, origin_lng, dest_lat, dest_lng, api_key):
-    """Get travel time and distance using Google Distance Matrix API."""
-    params = {
-        "origins": f"{origin_lat},{origin_lng}",
-        "destinations": f"{dest_lat},{dest_lng}",
+def _travel_from_element(element):
+    """Convert a Distance Matrix element into the travel details dict."""
+    return {
+        'distance_text': element['distance']['text'],
+        'distance_value': element['distance']['value'],  # in meters
+        'duration_text': element['duration']['text'],
+        'duration_value': element['duration']['value']   # in seconds
+    }
+
+def _matrix_params(origins, destination, api_key):
+    """Distance Matrix request parameters for several origins and one destination."""
+    return {
+        "origins": "|".join(f"{lat},{lng}" for lat, lng in origins),
+        "destinations": f"{destination[0]},{destination[1]}",
         "mode": "driving",
         "units": "imperial",
         "key": api_key
     }
+
+def get_travel_details_batch(origins, destination, api_key, base_url=GOOGLE_MAPS_BASE_URL):
+    """
+    Get travel details from several origins to one destination in one Distance Matrix call.
     
-    data = make_api_request(DISTANCE_API_URL, params)
+    When API_CACHE is set, each origin's element is cached on its own, under
+    the key of a single-origin request. A re-run that only resends the
+    listings missing after a partial failure groups origins into different
+    chunks, so whole responses would rarely match; per-origin entries do,
+    and only the origins missing from the cache are sent to the API.
     
-    if data and data['status'] == 'OK' and data['rows'][0]['elements'][0]['status'] == 'OK':
-        element = data['rows'][0]['elements'][0]
-        return {
-            'distance_text': element['distance']['text'],
-            'distance_value': element['distance']['value'],  # in meters
-            'duration_text': element['duration']['text'],
-            'duration_value': element['duration']['value']   # in seconds
+    Args:
+        origins (list): (latitude, longitude) tuples, at most MAX_MATRIX_ORIGINS
+        destination (tuple): (latitude, longitude) of the store
+        api_key (str): Google Maps API key
+        base_url (str): Google Maps API base URL
+        
+    Returns:
+        list: Travel details per origin, in the same order; None where the
+        request or that origin's element failed
+    """
+    if len(origins) > MAX_MATRIX_ORIGINS:
+        raise ValueError(f"At most {MAX_MATRIX_ORIGINS} origins per Distance Matrix request")
+    
+    url = base_url + DISTANCE_API_PATH
+    results = [None] * len(origins)
+    failed = {}
+    
+    def record(i, element):
+        status = element.get('status', 'Unknown')
+        if status == 'OK':
+            results[i] = _travel_from_element(element)
+        else:
+            failed[status] = failed.get(status, 0) + 1
+    
+    pending = list(range(len(origins)))
+    if API_CACHE is not None:
+        pending = []
+        for i, origin in enumerate(origins):
+            cached = API_CACHE.get(url, _matrix_params([origin], destination, api_key))
+            try:
+                record(i, cached['rows'][0]['elements'][0])
+            except (IndexError, KeyError, TypeError):
+                pending.append(i)
+    
+    if pending:
+        data = make_api_request(url, _matrix_params([origins[i] for i in pending], destination, api_key),
+                                use_cache=False)
+        if not data:
+            console.print(f"[red]Failed to get distance data for {len(pending)} listings to {destination[0]}, {destination[1]}[/red]")
+            return results
+        if data.get('status') != 'OK':
+            console.print(f"[yellow]Failed to get travel details. Status: {data.get('status', 'Unknown')}[/yellow]")
+            return results
+        
+        # Rows come back in the order of the origins, one element per destination
+        rows = data.get('rows', [])
+        for position, i in enumerate(pending):
+            try:
+                element = rows[position]['elements'][0]
+            except (IndexError, KeyError, TypeError):
+                element = {'status': 'MISSING'}
+            record(i, element)
+            if API_CACHE is not None and element.get('status') in CACHEABLE_STATUSES:
+                API_CACHE.put(url, _matrix_params([origins[i]], destination, api_key),
+                              {'status': 'OK', 'rows': [{'elements': [element]}]})
+    
+    if failed:
+        summary = ", ".join(f"{status}: {count}" for status, count in failed.items())
+        console.print(f"[yellow]{sum(failed.values())} of {len(origins)} routes failed ({summary})[/yellow]")
+    return results
+
+def get_travel_details(origin_lat, origin_lng, dest_lat, dest_lng, api_key, base_url=GOOGLE_MAPS_BASE_URL):
+    """Get travel time and distance using Google Distance Matrix API."""
+    return get_travel_details_batch([(origin_lat, origin_lng)], (dest_lat, dest_lng), api_key, base_url)[0]
+
+def resolve_travel_times(listings, api_key, base_url=GOOGLE_MAPS_BASE_URL, on_batch=None, workers=1, on_result=None):
+    """
+    Resolve travel details for many listings with batched Distance Matrix calls.
+    
+    Listings are grouped by their nearest store, and each group is sent in
+    chunks of up to MAX_MATRIX_ORIGINS origins against that single store.
+    
+    Args:
+        listings (list): (row_index, latitude, longitude, walmart_data) tuples
+        api_key (str): Google Maps API key
+        base_url (str): Google Maps API base URL
+        on_batch (callable): Called with the number of listings after each request
+        workers (int): Requests sent concurrently
+        on_result (callable): Called as on_result(row_index, travel_details) for
+            each resolved listing as soon as its request completes
+        
+    Returns:
+        dict: row_index -> travel details, for listings whose route was found
+    """
+    by_store = {}
+    for row_index, latitude, longitude, walmart_data in listings:
+        store = by_store.setdefault(walmart_data['place_id'], (walmart_data, []))
+        store[1].append((row_index, latitude, longitude))
+    
+    chunks = []
+    for walmart_data, members in by_store.values():
+        destination = (walmart_data['lat'], walmart_data['lng'])
+        for start in range(0, len(members), MAX_MATRIX_ORIGINS):
+            chunks.append((destination, members[start:start + MAX_MATRIX_ORIGINS]))
+    
+    travel = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        futures = {
+            executor.submit(
+                get_travel_details_batch, [(lat, lng) for _, lat, lng in chunk], destination, api_key, base_url
+            ): chunk
+            for destination, chunk in chunks
         }
-    elif data:
-        console.print(f"[yellow]Failed to get travel details. Status: {data.get('status', 'Unknown')}[/yellow]")
-    else:
-        console.print(f"[red]Failed to get distance data for {origin_lat}, {origin_lng} to {dest_lat}, {dest_lng}[/red]")
-    return None
+        for future in as_completed(futures):
+            chunk = futures[future]
+            for (row_index, _, _), travel_data in zip(chunk, future.result()):
+                if travel_data:
+                    travel[row_index] = travel_data
+                    if on_result:
+                        on_result(row_index, travel_data)
+            if on_batch:
+                on_batch(len(chunk))
+    finally:
+        # Drop queued requests if interrupted; in-flight ones finish
+        executor.shutdown(wait=True, cancel_futures=True)
+    return travel
 
-def update_master_csv(df, row_index, walmart_data, travel_data):
-    """Update the master CSV with Walmart and travel data."""
+class WalmartResultBuffer:
+    """
+    Write-behind buffer for Walmart results.
+    
+    Writing each listing as soon as it resolves costs one transaction per
+    API result. The buffer keeps the rows in memory and writes them with a
+    single row-id upsert every `flush_rows` listings or `flush_seconds`
+    seconds. Each flush is one SQLite transaction, so an interrupted run
+    keeps every flushed batch and never a partial one.
+    """
+    
+    def __init__(self, flush_rows=DEFAULT_FLUSH_ROWS, flush_seconds=DEFAULT_FLUSH_SECONDS):
+        """
+        Args:
+            flush_rows (int): Flush after this many buffered listings (None disables)
+            flush_seconds (float): Flush when the oldest buffered listing is this
+                many seconds old (None disables)
+        """
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.rows = {}
+        self.flushed = 0
+        self._since = None
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def add(self, row_index, values):
+        """Queue the Walmart columns of one listing, flushing if a limit is reached."""
+        if not self.rows:
+            self._since = time.monotonic()
+        self.rows[row_index] = values
+        
+        if (self.flush_rows and len(self.rows) >= self.flush_rows) or \
+                (self.flush_seconds is not None and time.monotonic() - self._since >= self.flush_seconds):
+            self.flush()
+    
+    def flush(self):
+        """
+        Write all queued rows to the master dataset.
+        
+        Returns:
+            int: Number of listings written
+        """
+        if not self.rows:
+            return 0
+        
+        frame = pd.DataFrame.from_dict(self.rows, orient='index', columns=WALMART_COLUMNS)
+        get_store().upsert_columns(frame)
+        written = len(self.rows)
+        self.rows = {}
+        self.flushed += written
+        return written
+
+def update_master_csv(df, row_index, walmart_data, travel_data, buffer=None, source=TRAVEL_SOURCE_API):
+    """
+    Update the master dataset with Walmart and travel data for one listing.
+    
+    Args:
+        df (DataFrame): Master data indexed by row id (updated in place)
+        row_index (int): Row id of the listing
+        walmart_data (dict): Nearest store, as returned by find_nearest_walmart
+        travel_data (dict): Travel details to the store
+        buffer (WalmartResultBuffer): Queue the row here instead of writing it immediately
+        source (str): How the travel details were obtained (TRAVEL_SOURCE_API or
+            TRAVEL_SOURCE_ESTIMATE)
+    """
     try:
         # Only add the address and travel details (not name or coordinates)
-        if 'Nearest_Walmart_Address' not in df.columns:
-            df['Nearest_Walmart_Address'] = None
-        if 'Nearest_Walmart_Distance_Miles' not in df.columns:
-            df['Nearest_Walmart_Distance_Miles'] = None
-        if 'Nearest_Walmart_Travel_Time_Minutes' not in df.columns:
-            df['Nearest_Walmart_Travel_Time_Minutes'] = None
+        for column in WALMART_COLUMNS:
+            if column not in df.columns:
+                df[column] = None
         
         # Update Walmart address
         df.loc[row_index, 'Nearest_Walmart_Address'] = walmart_data['vicinity']
@@ -153,16 +473,67 @@ def update_master_csv(df, row_index, walmart_data, travel_data):
         
         df.loc[row_index, 'Nearest_Walmart_Distance_Miles'] = round(distance_miles, 2)
         df.loc[row_index, 'Nearest_Walmart_Travel_Time_Minutes'] = round(travel_time_minutes, 2)
+        df.loc[row_index, 'Walmart_Travel_Time_Source'] = source
         
-        # Save the updated CSV
-        df.to_csv('database/master.csv', index=False)
+        if buffer is not None:
+            buffer.add(row_index, df.loc[row_index, WALMART_COLUMNS].tolist())
+        else:
+            # Write just this listing's Walmart columns back to the store
+            get_store().upsert_columns(df.loc[[row_index], WALMART_COLUMNS])
         return True
     except Exception as e:
-        console.print(f"[red]Error updating master CSV: {e}[/red]")
+        console.print(f"[red]Error updating master dataset: {e}[/red]")
         return False
 
-def main():
-    """Main function to process all rows in the CSV."""
+def _stored_routes(df, registry):
+    """
+    Straight-line miles, road miles and minutes of routes already fetched from the API.
+    
+    The master data only keeps the store address, so rows are matched to
+    store coordinates through addresses that are unique in the registry.
+    """
+    if 'Nearest_Walmart_Travel_Time_Minutes' not in df.columns or not len(registry):
+        return np.empty(0), np.empty(0), np.empty(0)
+    
+    from_api = df['Nearest_Walmart_Travel_Time_Minutes'].notna()
+    if 'Walmart_Travel_Time_Source' in df.columns:
+        # Rows written before the source column existed all came from the API
+        from_api &= df['Walmart_Travel_Time_Source'].isna() | (df['Walmart_Travel_Time_Source'] == TRAVEL_SOURCE_API)
+    
+    stores = registry.stores.drop_duplicates('vicinity', keep=False).set_index('vicinity')
+    routes = df.loc[from_api].join(stores[['lat', 'lng']], on='Nearest_Walmart_Address', how='inner')
+    straight = haversine_miles(routes['Latitude'], routes['Longitude'], routes['lat'], routes['lng'])
+    return (straight, routes['Nearest_Walmart_Distance_Miles'].to_numpy(dtype=float),
+            routes['Nearest_Walmart_Travel_Time_Minutes'].to_numpy(dtype=float))
+
+def main(base_url=GOOGLE_MAPS_BASE_URL, registry_path=STORE_REGISTRY_PATH, known_store_miles=KNOWN_STORE_MAX_MILES,
+         import_stores=None, cache_path=API_CACHE_PATH, cache_ttl_days=DEFAULT_TTL_DAYS,
+         cache_max_entries=DEFAULT_MAX_ENTRIES, workers=DEFAULT_WORKERS, qps=DEFAULT_QPS,
+         flush_rows=DEFAULT_FLUSH_ROWS, flush_seconds=DEFAULT_FLUSH_SECONDS, api_max_miles=API_BAND_MAX_MILES,
+         api_budget=None):
+    """
+    Main function to process all rows in the CSV.
+    
+    Args:
+        base_url (str): Google Maps API base URL (point at a mock server for testing)
+        registry_path (str): CSV file holding the known store locations
+        known_store_miles (float): Use the nearest known store when it is within this
+            many miles instead of calling the Places API
+        import_stores (str): CSV of stores to merge into the registry first
+        cache_path (str): SQLite file caching API responses (None disables the cache)
+        cache_ttl_days (float): Days before a cached response expires (None never expires)
+        cache_max_entries (int): Maximum number of cached responses
+        workers (int): Concurrent API requests
+        qps (float): Requests per second shared by all workers; halved on
+            OVER_QUERY_LIMIT / HTTP 429 and recovered gradually
+        flush_rows (int): Write buffered results after this many listings
+        flush_seconds (float): Write buffered results at least this often
+        api_max_miles (float): Request travel times only for listings whose store is
+            within this straight-line distance; estimate the rest
+        api_budget (int): Maximum API requests for this run (None is unlimited);
+            travel times are estimated once it is spent
+    """
+    global API_CACHE, SESSION, RATE_LIMITER, REQUEST_BUDGET
     console.clear()
     console.print("[bold blue]Walmart Distance Finder[/bold blue]")
     console.print("[italic]Finding the nearest Walmart and travel time for each property[/italic]\n")
@@ -170,9 +541,7 @@ def main():
     # Get API key
     api_key = ensure_api_key()
     if not api_key:
-        console.print("[red]Error: Google Maps API key not set. Cannot proceed.[/red]")
-        console.print("Please set the GOOGLE_MAPS_API_KEY environment variable and try again.")
-        return
+        console.print("[yellow]Travel times will be estimated for listings near known stores only.[/yellow]")
     
     # Get all rows from the CSV
     df = read_master_csv()
@@ -180,12 +549,18 @@ def main():
         console.print("[red]Error reading CSV file[/red]")
         return
     
-    # Determine which rows need processing (those without Walmart data)
+    # Determine which rows need processing (those without Walmart data, and
+    # estimates that the API may now be able to replace)
     rows_to_process = []
+    estimated = set()
     for index, row in df.iterrows():
-        if pd.isna(row.get('Nearest_Walmart_Address', None)) or pd.isna(row.get('Nearest_Walmart_Travel_Time_Minutes', None)):
+        is_estimate = api_key and row.get('Walmart_Travel_Time_Source', None) == TRAVEL_SOURCE_ESTIMATE
+        if pd.isna(row.get('Nearest_Walmart_Address', None)) or pd.isna(row.get('Nearest_Walmart_Travel_Time_Minutes', None)) \
+                or is_estimate:
             if not pd.isna(row.get('Latitude', None)) and not pd.isna(row.get('Longitude', None)):
                 rows_to_process.append((index, row))
+                if is_estimate:
+                    estimated.add(index)
     
     if not rows_to_process:
         console.print("[green]All listings already have Walmart distance data![/green]")
@@ -193,48 +568,177 @@ def main():
     
     console.print(f"[cyan]Found {len(rows_to_process)} listings that need Walmart distance data[/cyan]")
     
-    # Process each row with progress bar
-    with Progress(
+    if cache_path:
+        ttl = cache_ttl_days * 86400 if cache_ttl_days is not None else None
+        API_CACHE = ApiResponseCache(cache_path, ttl=ttl, max_entries=cache_max_entries)
+        # Write batched last-used times even if the run is interrupted
+        atexit.register(API_CACHE.close)
+    else:
+        API_CACHE = None
+    SESSION = create_session(workers)
+    RATE_LIMITER = AdaptiveRateLimiter(qps)
+    REQUEST_BUDGET = RequestBudget(api_budget) if api_budget is not None else None
+    
+    progress_columns = (
         TextColumn("[progress.description]{task.description}"),
         BarColumn(),
         TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
         TimeElapsedColumn(),
-    ) as progress:
-        task = progress.add_task("[cyan]Processing listings...", total=len(rows_to_process))
+    )
+    
+    registry = StoreRegistry(registry_path)
+    if import_stores:
+        registry.import_csv(import_stores)
+    
+    # Nearest known store for every listing in one query
+    positions, distances = registry.nearest(
+        [row['Latitude'] for _, row in rows_to_process],
+        [row['Longitude'] for _, row in rows_to_process],
+    )
+    
+    located = []
+    to_search = []
+    unresolved = 0
+    for (index, row), position, distance in zip(rows_to_process, positions, distances):
+        if index in estimated and distance > api_max_miles:
+            # An API result would not change the outcome for a listing this far away
+            continue
+        if distance <= known_store_miles or (not api_key and position >= 0):
+            located.append((index, row['Latitude'], row['Longitude'], registry.store(position)))
+        elif api_key:
+            to_search.append((index, row))
+        else:
+            unresolved += 1
+    
+    console.print(f"[cyan]{len(located)} listings matched to {len(registry)} known stores; "
+                  f"{len(to_search)} need a Places lookup[/cyan]")
+    if unresolved:
+        console.print(f"[yellow]{unresolved} listings have no known store and no API key to look one up[/yellow]")
+    
+    # Find the nearest Walmart for the remaining listings
+    not_found = 0
+    with Progress(*progress_columns) as progress:
+        task = progress.add_task("[cyan]Finding nearest Walmarts...", total=len(to_search))
         
-        for i, (index, row) in enumerate(rows_to_process):
-            latitude = row['Latitude']
-            longitude = row['Longitude']
-            
-            progress.update(task, description=f"[cyan]Processing listing {i+1}/{len(rows_to_process)}...")
-            
-            # Find nearest Walmart
-            walmart_data = find_nearest_walmart(latitude, longitude, api_key)
-            
-            if walmart_data:
-                # Get travel details
-                travel_data = get_travel_details(
-                    latitude, longitude, 
-                    walmart_data['lat'], walmart_data['lng'], 
-                    api_key
-                )
-                
-                if travel_data:
-                    # Update master CSV
-                    if update_master_csv(df, index, walmart_data, travel_data):
-                        progress.update(task, advance=1)
-                    else:
-                        progress.update(task, advance=1, description=f"[red]Failed to update listing {i+1}/{len(rows_to_process)}")
+        executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        try:
+            futures = {
+                executor.submit(
+                    find_nearest_walmart, row['Latitude'], row['Longitude'], api_key, base_url, registry
+                ): (index, row['Latitude'], row['Longitude'])
+                for index, row in to_search
+            }
+            for future in as_completed(futures):
+                index, latitude, longitude = futures[future]
+                walmart_data = future.result()
+                if walmart_data:
+                    located.append((index, latitude, longitude, walmart_data))
                 else:
-                    progress.update(task, advance=1, description=f"[yellow]No travel data for listing {i+1}/{len(rows_to_process)}")
-            else:
-                progress.update(task, advance=1, description=f"[yellow]No Walmart found for listing {i+1}/{len(rows_to_process)}")
-            
-            # Add a larger delay between API calls to avoid rate limiting
-            # Google Maps API has a limit of 50 requests per second, but best practice is to be conservative
-            time.sleep(1.5)  # Increased from 0.5 to 1.5 seconds
+                    not_found += 1
+                progress.update(task, advance=1,
+                                description=f"[cyan]Finding nearest Walmarts ({not_found} not found)...")
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    registry.save()
+    
+    # Straight-line distance to each listing's store in one pass; only listings
+    # inside the band are worth a Distance Matrix request
+    straight_miles = haversine_miles(
+        [latitude for _, latitude, _, _ in located], [longitude for _, _, longitude, _ in located],
+        [walmart_data['lat'] for _, _, _, walmart_data in located],
+        [walmart_data['lng'] for _, _, _, walmart_data in located],
+    )
+    in_band = [listing for listing, miles in zip(located, straight_miles) if api_key and miles <= api_max_miles]
+    
+    # Get travel times in batches of listings that share a store; results are
+    # written behind in batches and whatever is buffered is flushed on Ctrl+C or exit
+    buffer = WalmartResultBuffer(flush_rows=flush_rows, flush_seconds=flush_seconds)
+    walmart_by_index = {index: walmart_data for index, _, _, walmart_data in located}
+    atexit.register(buffer.flush)
+    try:
+        with Progress(*progress_columns) as progress:
+            task = progress.add_task("[cyan]Getting travel times...", total=len(in_band))
+            travel = resolve_travel_times(
+                in_band, api_key, base_url, on_batch=lambda count: progress.update(task, advance=count),
+                workers=workers,
+                on_result=lambda index, travel_data: update_master_csv(
+                    df, index, walmart_by_index[index], travel_data, buffer=buffer
+                ),
+            )
+        
+        # Estimate the listings outside the band and those the API could not answer
+        to_estimate = [(listing, miles) for listing, miles in zip(located, straight_miles) if listing[0] not in travel]
+        if to_estimate:
+            stored = _stored_routes(df, registry)
+            road_factor, speed_mph, samples = calibrate_road_model(*stored)
+            road_miles, minutes = estimate_travel([miles for _, miles in to_estimate], road_factor, speed_mph)
+            console.print(f"[cyan]Estimating {len(to_estimate)} travel times (road factor {road_factor:.2f}, "
+                          f"{speed_mph:.1f} mph, calibrated on {samples} routes)[/cyan]")
+            for ((index, _, _, walmart_data), _), road, mins in zip(to_estimate, road_miles, minutes):
+                travel_data = {'distance_value': road * METERS_PER_MILE, 'duration_value': mins * 60}
+                update_master_csv(df, index, walmart_data, travel_data, buffer=buffer, source=TRAVEL_SOURCE_ESTIMATE)
+    except KeyboardInterrupt:
+        buffer.flush()
+        console.print(f"[yellow]Interrupted; saved {buffer.flushed} listings to the master dataset[/yellow]")
+        raise
+    finally:
+        buffer.flush()
+        atexit.unregister(buffer.flush)
+    updated = buffer.flushed
+    
+    console.print(f"[cyan]Updated {updated} of {len(rows_to_process)} listings "
+                  f"({len(travel)} from the Distance Matrix API, {len(to_estimate)} estimated)[/cyan]")
+    if len(to_estimate) > len(located) - len(in_band):
+        console.print(f"[yellow]{len(to_estimate) - (len(located) - len(in_band))} estimates replace failed API requests; "
+                      f"they will be retried on the next run[/yellow]")
+    
+    if RATE_LIMITER.throttle_count:
+        console.print(f"[yellow]Throttled {RATE_LIMITER.throttle_count} times; "
+                      f"finished at {RATE_LIMITER.rate:.2f} requests/second[/yellow]")
+    SESSION.close()
+    SESSION = RATE_LIMITER = REQUEST_BUDGET = None
+    
+    if API_CACHE is not None:
+        print_cache_stats()
+        atexit.unregister(API_CACHE.close)
+        API_CACHE.close()
+        API_CACHE = None
     
     console.print("\n[green]Walmart distance data processing completed![/green]")
 
+def print_cache_stats():
+    """Print a summary of the API response cache."""
+    table = Table(title="Google Maps API cache")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", justify="right")
+    for name, value in API_CACHE.stats().items():
+        table.add_row(name.replace("_", " ").capitalize(), "-" if value is None else str(value))
+    console.print(table)
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Find the nearest Walmart and travel time for each listing.")
+    parser.add_argument("--base-url", default=GOOGLE_MAPS_BASE_URL, help="Google Maps API base URL (e.g. a local mock server).")
+    parser.add_argument("--stores", default=STORE_REGISTRY_PATH, help="CSV registry of known store locations.")
+    parser.add_argument("--import-stores", default=None, help="Merge stores from this CSV into the registry before running.")
+    parser.add_argument("--known-store-miles", type=float, default=KNOWN_STORE_MAX_MILES, help="Skip the Places lookup when a known store is within this many miles.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent API requests.")
+    parser.add_argument("--qps", type=float, default=DEFAULT_QPS, help="Requests per second across all workers (reduced automatically when throttled).")
+    parser.add_argument("--flush-rows", type=int, default=DEFAULT_FLUSH_ROWS, help="Write buffered results after this many listings.")
+    parser.add_argument("--flush-seconds", type=float, default=DEFAULT_FLUSH_SECONDS, help="Write buffered results at least this often.")
+    parser.add_argument("--api-max-miles", type=float, default=API_BAND_MAX_MILES, help="Estimate travel times for listings whose store is farther than this straight-line distance.")
+    parser.add_argument("--api-budget", type=int, default=None, help="Maximum API requests for this run; travel times are estimated once it is spent.")
+    parser.add_argument("--cache", default=API_CACHE_PATH, help="SQLite file caching API responses.")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the API response cache.")
+    parser.add_argument("--cache-ttl-days", type=float, default=DEFAULT_TTL_DAYS, help="Days before a cached response expires.")
+    parser.add_argument("--cache-max-entries", type=int, default=DEFAULT_MAX_ENTRIES, help="Maximum number of cached responses (least recently used are evicted).")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    args = parse_args()
+    main(base_url=args.base_url, registry_path=args.stores, known_store_miles=args.known_store_miles,
+         import_stores=args.import_stores, cache_path=None if args.no_cache else args.cache,
+         cache_ttl_days=args.cache_ttl_days, cache_max_entries=args.cache_max_entries,
+         workers=args.workers, qps=args.qps, flush_rows=args.flush_rows, flush_seconds=args.flush_seconds,
+         api_max_miles=args.api_max_miles, api_budget=args.api_budget) 
\ No newline at end of file
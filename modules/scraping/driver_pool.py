@@ -0,0 +1,203 @@
+"""
+Pool of long-lived WebDriver instances for MCDC scraping.
+
+Starting a browser takes several seconds, which used to be paid for every
+coordinate. The pool keeps a fixed number of headless browsers alive, hands
+them out to worker threads, checks that a driver still responds before reuse,
+and replaces each driver after a configurable number of uses.
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.webdriver.firefox.options import Options as FirefoxOptions
+
+# Browsers the pool knows how to start
+SUPPORTED_BROWSERS = ("chrome", "firefox", "safari")
+
+
+def create_webdriver(browser="chrome", headless=True, page_load_timeout=30):
+    """
+    Start a single WebDriver.
+
+    Args:
+        browser (str): One of "chrome", "firefox" or "safari"
+        headless (bool): Run without a visible window (ignored by Safari)
+        page_load_timeout (int): Page load timeout in seconds
+
+    Returns:
+        WebDriver: The started driver
+    """
+    if browser == "chrome":
+        options = ChromeOptions()
+        if headless:
+            options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--no-sandbox")
+        driver = webdriver.Chrome(options=options)
+    elif browser == "firefox":
+        options = FirefoxOptions()
+        if headless:
+            options.add_argument("-headless")
+        driver = webdriver.Firefox(options=options)
+    elif browser == "safari":
+        driver = webdriver.Safari()
+    else:
+        raise ValueError(f"Unsupported browser '{browser}', expected one of {SUPPORTED_BROWSERS}")
+
+    driver.set_page_load_timeout(page_load_timeout)
+    return driver
+
+
+class WebDriverPool:
+    """
+    Thread-safe pool of reusable WebDrivers.
+
+    Drivers are created lazily up to `size`. A driver that fails its health
+    check, is released as broken, or has served `max_uses` coordinates is
+    quit and replaced on the next acquire.
+    """
+
+    def __init__(self, size=2, browser="chrome", headless=True, max_uses=25,
+                 page_load_timeout=30, factory=None, verbose=False):
+        """
+        Args:
+            size (int): Maximum number of concurrent drivers
+            browser (str): Browser to start (see SUPPORTED_BROWSERS)
+            headless (bool): Run the browsers headless
+            max_uses (int): Recycle a driver after this many uses (None disables recycling)
+            page_load_timeout (int): Page load timeout in seconds for new drivers
+            factory (callable): Zero-argument callable returning a driver; overrides browser/headless
+            verbose (bool): Print pool activity
+        """
+        self.size = max(1, int(size))
+        self.max_uses = max_uses
+        self.verbose = verbose
+        self._factory = factory or (
+            lambda: create_webdriver(browser, headless=headless, page_load_timeout=page_load_timeout)
+        )
+        self._idle = queue.Queue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self.created = 0
+        self.recycled = 0
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    def _start_driver(self):
+        driver = self._factory()
+        if driver is None:
+            raise RuntimeError("Failed to initialize WebDriver")
+        with self._lock:
+            self._uses[id(driver)] = 0
+            self.created += 1
+        self._log(f"Started WebDriver #{self.created}")
+        return driver
+
+    def _quit_driver(self, driver):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            self._log(f"Error closing WebDriver: {e}")
+
+    @staticmethod
+    def is_healthy(driver):
+        """Return True if the driver's browser session still responds."""
+        try:
+            driver.execute_script("return 1")
+            return bool(driver.window_handles)
+        except Exception:
+            return False
+
+    def acquire(self, timeout=None):
+        """
+        Take a driver from the pool, starting one if none is idle.
+
+        Args:
+            timeout (float): Seconds to wait for a free slot (None waits forever)
+
+        Returns:
+            WebDriver: A healthy driver that must be handed back with `release()`
+        """
+        if self._closed:
+            raise RuntimeError("WebDriverPool is closed")
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("Timed out waiting for a free WebDriver")
+
+        try:
+            while True:
+                try:
+                    driver = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._start_driver()
+
+                if self.is_healthy(driver):
+                    return driver
+                self._log("Discarding unresponsive WebDriver")
+                self._quit_driver(driver)
+                self.recycled += 1
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, driver, broken=False):
+        """
+        Return a driver to the pool.
+
+        Args:
+            driver (WebDriver): Driver obtained from `acquire()`
+            broken (bool): Quit the driver instead of reusing it
+        """
+        try:
+            with self._lock:
+                uses = self._uses.get(id(driver), 0) + 1
+                self._uses[id(driver)] = uses
+
+            worn_out = self.max_uses is not None and uses >= self.max_uses
+            if broken or worn_out or self._closed:
+                if worn_out and not broken:
+                    self._log(f"Recycling WebDriver after {uses} uses")
+                self._quit_driver(driver)
+                self.recycled += 1
+            else:
+                self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """Context manager that acquires a driver and releases it (as broken on error)."""
+        driver = self.acquire(timeout=timeout)
+        broken = False
+        try:
+            yield driver
+        except Exception:
+            broken = not self.is_healthy(driver)
+            raise
+        finally:
+            self.release(driver, broken=broken)
+
+    def close(self):
+        """Quit every idle driver and refuse further acquires."""
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit_driver(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -11,6 +11,7 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from rich.console import Console
+from rich.table import Table
 from rich.progress import Progress, TextColumn, BarColumn, TaskProgressColumn, TimeElapsedColumn
 import shutil
 import re
@@ -25,6 +26,17 @@ from tqdm import tqdm
 import requests
 import random
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from modules.datastore.master_store import get_store, COORDINATE_KEY
+from modules.scraping.driver_pool import WebDriverPool, SUPPORTED_BROWSERS
+from modules.scraping.mcdc_client import MCDCClient, WebsiteUnavailableError, MCDC_CAPS_URL, RADII
+from modules.scraping.rate_limit import HostRateLimiter, backoff_delay
+from modules.scraping.job_journal import (
+    FetchJournal, JOURNAL_PATH, IN_FLIGHT, DONE, FAILED, MOCKED, RETRY_STATES
+)
+from modules.scraping.mcdc_cache import (
+    MCDCCache, GridIndex, DEFAULT_PRECISION, SOURCE_REAL, SOURCE_MOCK, parse_filename
+)
 
 # Define the script directory
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -38,6 +50,12 @@ MCDC_DIR = "database/MCDC"
 # Global verbose flag that will be set via command-line arguments
 VERBOSE = False
 
+# Columns recording which coordinates the census data was fetched for
+PROVENANCE_COLUMNS = ['Census_Source_Latitude', 'Census_Source_Longitude', 'Census_Source_Distance_Meters']
+
+# Manifest of downloaded reports (replaced in main() with the command-line settings)
+CACHE = None
+
 # Define the columns to keep in the master CSV (all radii will be added)
 KEEP_COLUMNS = [
     'TotPop', 'Age0_4', 'Age5_9', 'Age10_14', 'Age15_19', 'Age20_24', 'Age25_34', 
@@ -54,6 +72,9 @@ KEEP_COLUMNS = [
     'HvalOver2Million', 'MedianHValue', 'MedianGrossRent'
 ]
 
+# Columns extracted from each MCDC report (one value per radius)
+RADIUS_DATA_COLUMNS = KEEP_COLUMNS + ['AvgGrossRent']
+
 # Generate all column names with radii
 ALL_KEEP_COLUMNS = []
 for base_col in KEEP_COLUMNS:
@@ -70,35 +91,30 @@ def ensure_directory_exists(directory):
 
 def read_master_csv():
     """
-    Read the master CSV file.
+    Read the master dataset.
     
     Returns:
-        DataFrame containing the master CSV data, or None if the file doesn't exist or can't be read
+        DataFrame containing the master data, or None if it doesn't exist or can't be read
     """
-    master_csv_path = os.path.join("database", "master.csv")
     try:
-        if os.path.exists(master_csv_path):
-            return pd.read_csv(master_csv_path)
-        else:
-            print(f"Master CSV file not found at {master_csv_path}")
-            return None
+        master_df = get_store().read_frame()
+        if master_df is None:
+            print("Master dataset not found")
+        return master_df
     except Exception as e:
-        print(f"Error reading master CSV file: {e}")
+        print(f"Error reading master dataset: {e}")
         return None
 
-def find_existing_csv(latitude, longitude):
-    """Find an existing CSV file for the given coordinates."""
-    # Create the pattern for matching files
-    pattern = os.path.join(MCDC_DIR, f"{latitude}-{longitude}-*.csv")
-    
-    # Find all matching files
-    matching_files = glob.glob(pattern)
-    
-    if matching_files:
-        # If multiple files exist, return the most recent one
-        return max(matching_files, key=os.path.getctime)
-    
-    return None
+def get_cache():
+    """Return the MCDC report manifest, opening it with default settings on first use."""
+    global CACHE
+    if CACHE is None:
+        CACHE = MCDCCache()
+    return CACHE
+
+def find_existing_csv(latitude, longitude, allow_mock=True):
+    """Find an existing CSV file for the given coordinates in the report manifest."""
+    return get_cache().lookup(latitude, longitude, allow_mock=allow_mock)
 
 def extract_data_from_csv(csv_path, verbose=False):
     """
@@ -313,7 +329,112 @@ def download_csv(driver, coord, verbose=False):
         print(f"Error copying CSV file: {e}")
         return None
 
-def fetch_data(lat, lng, force=False, verbose=False):
+def load_caps_form(driver, url=MCDC_CAPS_URL, max_retries=5):
+    """
+    Navigate to the capsACS form, retrying with exponential backoff.
+    
+    Args:
+        driver (WebDriver): The WebDriver instance.
+        url (str): URL of the capsACS form page.
+        max_retries (int): Number of attempts before giving up.
+    
+    Raises:
+        WebsiteUnavailableError: If the form could not be loaded.
+    """
+    for attempt in range(max_retries):
+        try:
+            backoff_time = backoff_delay(attempt)  # Jittered exponential backoff, up to 1, 2, 4, 8, 16 seconds
+            print(f"Navigating to MCDC website (attempt {attempt+1}/{max_retries}, backoff: {backoff_time:.1f}s)...")
+            driver.get(url)
+            
+            # Wait for the page to load
+            WebDriverWait(driver, 30).until(
+                EC.presence_of_element_located((By.ID, "latitude"))
+            )
+            print("Page loaded successfully")
+            return
+        except Exception as e:
+            print(f"Error loading page (attempt {attempt+1}/{max_retries}): {e}")
+            if attempt < max_retries - 1:
+                time.sleep(backoff_time)  # Wait with exponential backoff before retrying
+    
+    raise WebsiteUnavailableError(f"Could not load {url} after {max_retries} attempts")
+
+def scrape_coordinate(driver, coord, url=MCDC_CAPS_URL, max_retries=5, verbose=False):
+    """
+    Submit the capsACS form for one coordinate and download the resulting CSV.
+    
+    Args:
+        driver (WebDriver): The WebDriver instance (left open for reuse).
+        coord (tuple): The (latitude, longitude) tuple.
+        url (str): URL of the capsACS form page.
+        max_retries (int): Attempts for loading the form page.
+        verbose (bool): Whether to print verbose output.
+    
+    Returns:
+        str: Path to the downloaded CSV file, or None if the download failed.
+    
+    Raises:
+        WebsiteUnavailableError: If the form page could not be loaded.
+    """
+    load_caps_form(driver, url=url, max_retries=max_retries)
+    
+    print("Page loaded, filling out the form...")
+    
+    # Fill out the form with separate latitude and longitude fields
+    lat_input = driver.find_element(By.ID, "latitude")
+    lat_input.clear()
+    lat_input.send_keys(f"{coord[0]}")
+    
+    lng_input = driver.find_element(By.ID, "longitude")
+    lng_input.clear()
+    lng_input.send_keys(f"{coord[1]}")
+    
+    # Set all radii
+    radii_str = " ".join(str(r) for r in RADII)
+    
+    radii_input = driver.find_element(By.ID, "radii")
+    radii_input.clear()
+    radii_input.send_keys(radii_str)
+    
+    print(f"Form filled with lat={coord[0]}, lng={coord[1]}, radii={radii_str}")
+    
+    # Submit the form
+    print("Submitting form...")
+    submit_button = driver.find_element(By.XPATH, "//input[@type='submit' and @value='Generate report']")
+    submit_button.click()
+    print("Form submitted")
+    
+    # Wait for the results page to load
+    print("Waiting for results page to load...")
+    try:
+        WebDriverWait(driver, 45).until(
+            EC.presence_of_element_located((By.XPATH, "//a[contains(@href, '.csv')]"))
+        )
+        print("Results page loaded successfully - found CSV links")
+    except Exception as e:
+        print(f"Error waiting for results page: {e}")
+        # Take a screenshot to debug what's happening
+        try:
+            screenshot_path = os.path.join(os.path.expanduser("~"), "Downloads", f"error_page_{coord[0]}_{coord[1]}.png")
+            driver.save_screenshot(screenshot_path)
+            print(f"Saved error screenshot to {screenshot_path}")
+            # Print the current page source for debugging
+            print("Current page HTML:")
+            print(driver.page_source[:500] + "...")  # Print first 500 chars of page source
+        except Exception as ss_error:
+            print(f"Failed to take screenshot: {ss_error}")
+        raise
+    
+    # Save a screenshot of the results page
+    screenshot_path = os.path.join(os.path.expanduser("~"), "Downloads", f"results_page_{coord[0]}_{coord[1]}.png")
+    driver.save_screenshot(screenshot_path)
+    print(f"Saved screenshot to {screenshot_path}")
+    
+    # Download the CSV file
+    return download_csv(driver, coord, verbose=verbose)
+
+def fetch_data(lat, lng, force=False, verbose=False, pool=None, url=MCDC_CAPS_URL):
     """
     Fetch data from MCDC website.
     
@@ -322,228 +443,157 @@ def fetch_data(lat, lng, force=False, verbose=False):
         lng (float): Longitude.
         force (bool): Whether to force fetch data even if it already exists.
         verbose (bool): Whether to print verbose output.
+        pool (WebDriverPool): Pool to borrow a driver from; a one-off driver is started if None.
+        url (str): URL of the capsACS form page.
         
     Returns:
         str: Path to the downloaded CSV file, or None if download failed.
     """
     # Check if we already have data for these coordinates
-    target_file = os.path.join("database", "MCDC", f"mcdc_{lat}_{lng}.csv")
+    target_file = find_existing_csv(lat, lng)
     
-    if os.path.exists(target_file) and not force:
+    if target_file and not force:
         print(f"Data already exists for coordinates: ({lat}, {lng})")
         return target_file
     
-    # Initialize WebDriver
-    driver = initialize_webdriver()
-    if not driver:
-        print("Failed to initialize WebDriver")
-        return None
-    
     try:
-        # Navigate to MCDC website
-        print("Navigating to MCDC website...")
-        driver.get("https://mcdc.missouri.edu/applications/capsACS.html")
-        
-        # Wait for the page to load
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "latitude"))
-        )
-        
-        print("Page loaded, filling out the form...")
-        
-        # Fill out the form with separate latitude and longitude fields
-        lat_input = driver.find_element(By.ID, "latitude")
-        lat_input.clear()
-        lat_input.send_keys(f"{lat}")
-        
-        lng_input = driver.find_element(By.ID, "longitude")
-        lng_input.clear()
-        lng_input.send_keys(f"{lng}")
-        
-        # Set all radii
-        radii = [5, 10, 15, 20, 25]
-        radii_str = " ".join(str(r) for r in radii)
-        
-        radii_input = driver.find_element(By.ID, "radii")
-        radii_input.clear()
-        radii_input.send_keys(radii_str)
-        
-        print(f"Form filled with lat={lat}, lng={lng}, radii={radii_str}")
-        
-        # Submit the form
-        print("Submitting form...")
-        submit_button = driver.find_element(By.XPATH, "//input[@type='submit' and @value='Generate report']")
-        submit_button.click()
-        print("Form submitted")
-        
-        # Wait for the results page to load
-        print("Waiting for results page to load...")
-        try:
-            WebDriverWait(driver, 45).until(
-                EC.presence_of_element_located((By.XPATH, "//a[contains(@href, '.csv')]"))
-            )
-            print("Results page loaded successfully - found CSV links")
-        except Exception as e:
-            print(f"Error waiting for results page: {e}")
-            # Take a screenshot to debug what's happening
+        if pool is not None:
+            with pool.driver() as driver:
+                csv_file = scrape_coordinate(driver, (lat, lng), url=url, verbose=verbose)
+        else:
+            # Initialize a one-off WebDriver
+            driver = initialize_webdriver()
+            if not driver:
+                print("Failed to initialize WebDriver")
+                return None
             try:
-                screenshot_path = os.path.join(os.path.expanduser("~"), "Downloads", f"error_page_{lat}_{lng}.png")
-                driver.save_screenshot(screenshot_path)
-                print(f"Saved error screenshot to {screenshot_path}")
-                # Print the current page source for debugging
-                print("Current page HTML:")
-                print(driver.page_source[:500] + "...")  # Print first 500 chars of page source
-            except Exception as ss_error:
-                print(f"Failed to take screenshot: {ss_error}")
-            raise
-        
-        print("Results page loaded")
+                csv_file = scrape_coordinate(driver, (lat, lng), url=url, verbose=verbose)
+            finally:
+                print("Closing WebDriver")
+                driver.quit()
         
-        # Save a screenshot of the results page
-        screenshot_path = os.path.join(os.path.expanduser("~"), "Downloads", f"results_page_{lat}_{lng}.png")
-        driver.save_screenshot(screenshot_path)
-        print(f"Saved screenshot to {screenshot_path}")
-        
-        # Download the CSV file
-        csv_file = download_csv(driver, (lat, lng), verbose=verbose)
         if not csv_file:
             print("Failed to download CSV file")
             return None
         
+        get_cache().record(lat, lng, csv_file, source=SOURCE_REAL)
         return csv_file
     
     except Exception as e:
         print(f"Error fetching data: {e}")
         traceback.print_exc()
         return None
-    
-    finally:
-        # Close the WebDriver
-        print("Closing WebDriver")
-        driver.quit()
 
 def update_master_csv(coord, data, verbose=False):
     """
-    Update the master CSV file with the census data for the given coordinates.
+    Update the master dataset with the census data for the given coordinates.
     
     Args:
         coord (tuple): The (latitude, longitude) tuple.
         data (dict or pd.DataFrame): The census data to add.
         verbose (bool): Whether to print verbose output.
     """
-    # Define the master CSV path
-    master_csv_path = os.path.join("database", "master.csv")
-    master_dir = os.path.dirname(master_csv_path)
-    
-    # Create directory if it doesn't exist
-    os.makedirs(master_dir, exist_ok=True)
-    
     # Convert data to DataFrame if it's a dictionary
     if isinstance(data, dict):
         data_df = pd.DataFrame([data])
     else:
-        data_df = data
+        data_df = data.iloc[[0]].reset_index(drop=True)
     
-    # Check if master CSV exists
-    if os.path.exists(master_csv_path):
-        # Read existing master CSV
-        master_df = pd.read_csv(master_csv_path)
-        if verbose:
-            print(f"Read existing master CSV with {len(master_df)} rows and {len(master_df.columns)} columns")
-        
-        # Ensure master_df has Latitude and Longitude columns
-        if "Latitude" not in master_df.columns:
-            master_df["Latitude"] = None
-        if "Longitude" not in master_df.columns:
-            master_df["Longitude"] = None
-        
-        # Find the row with matching coordinates
-        lat_col = "Latitude"
-        lon_col = "Longitude"
-        
-        # Find the row with matching coordinates
-        row_idx = None
-        for idx, row in master_df.iterrows():
-            if (pd.notna(row[lat_col]) and pd.notna(row[lon_col]) and 
-                abs(float(row[lat_col]) - float(coord[0])) < 0.0001 and 
-                abs(float(row[lon_col]) - float(coord[1])) < 0.0001):
-                row_idx = idx
-                break
-        
-        # Update existing row or add new row to master CSV
-        if row_idx is not None:
-            print(f"Found existing row at index {row_idx} for coordinates: {coord}")
-            
-            # Update the existing row with new data
-            for col in data_df.columns:
-                if col in master_df.columns:
-                    try:
-                        # Explicitly convert the value to a compatible type
-                        value = data_df[col].iloc[0]
-                        # If target column is numeric, ensure proper conversion
-                        if pd.api.types.is_numeric_dtype(master_df[col]):
-                            if pd.notnull(value):
-                                value = pd.to_numeric(value, errors='coerce')
-                        master_df.at[row_idx, col] = value
-                    except Exception as e:
-                        print(f"Warning: Could not update column '{col}': {e}")
-        else:
-            if verbose:
-                print(f"No existing row found for coordinates: {coord}")
-            
-            # Create a new row with the same columns as master_df
-            new_row = pd.Series(index=master_df.columns)
-            
-            # Set coordinates
-            new_row[lat_col] = coord[0]
-            new_row[lon_col] = coord[1]
-            
-            # Set data values
-            for col in data_df.columns:
-                if col in master_df.columns and col not in [lat_col, lon_col]:
-                    new_row[col] = data_df[col].iloc[0]
-            
-            # Append the new row
-            master_df = pd.concat([master_df, pd.DataFrame([new_row])], ignore_index=True)
-            if verbose:
-                print(f"Added new row for coordinates: {coord}")
-    else:
-        # Create new master CSV
-        if verbose:
-            print("Creating new master CSV")
+    # Key the row on the given coordinates
+    data_df = data_df.drop(columns=list(COORDINATE_KEY), errors="ignore")
+    data_df.insert(0, "Latitude", coord[0])
+    data_df.insert(1, "Longitude", coord[1])
+    
+    updated, inserted = get_store().upsert_columns(data_df, key=COORDINATE_KEY, insert_missing=True)
+    if verbose:
+        if updated:
+            print(f"Updated existing row for coordinates: {coord}")
+        if inserted:
+            print(f"Added new row for coordinates: {coord}")
+
+class RadiusDataBuffer:
+    """
+    Collects extracted radius data so it can be merged into the master dataset in one write.
+    
+    Merging one coordinate at a time rewrites the master data once per listing.
+    The buffer instead keeps one row per coordinate and writes them all with a
+    single coordinate-keyed upsert when flushed.
+    """
+    
+    def __init__(self, flush_interval=None, verbose=False):
+        """
+        Args:
+            flush_interval (int): Flush automatically after this many coordinates
+                (None only flushes when `flush()` is called)
+            verbose (bool): Whether to print verbose output
+        """
+        self.flush_interval = flush_interval
+        self.verbose = verbose
+        self.rows = {}
+        self.flushed = 0
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def add(self, coord, radius_data):
+        """Queue radius data for a coordinate, flushing if the interval is reached."""
+        row = {'Latitude': coord[0], 'Longitude': coord[1]}
+        row.update(radius_data)
+        # A later result for the same coordinates replaces the earlier one
+        self.rows[(coord[0], coord[1])] = row
         
-        # Initialize with Latitude and Longitude columns
-        master_df = pd.DataFrame(columns=["Latitude", "Longitude"])
+        if self.flush_interval and len(self.rows) >= self.flush_interval:
+            self.flush()
+    
+    def flush(self):
+        """
+        Merge all queued rows into the master dataset.
         
-        # Add the data
-        new_row = pd.Series()
-        new_row["Latitude"] = coord[0]
-        new_row["Longitude"] = coord[1]
+        Returns:
+            int: Number of coordinates written
+        """
+        if not self.rows:
+            return 0
         
-        # Add data values
-        for col in data_df.columns:
-            if col not in ["Latitude", "Longitude"]:
-                new_row[col] = data_df[col].iloc[0]
+        frame = pd.DataFrame(list(self.rows.values()))
+        updated, inserted = get_store().upsert_columns(frame, key=COORDINATE_KEY, insert_missing=True)
+        written = len(self.rows)
+        self.rows = {}
+        self.flushed += written
         
-        # Append the new row
-        master_df = pd.concat([master_df, pd.DataFrame([new_row])], ignore_index=True)
-        if verbose:
-            print(f"Added new row for coordinates: {coord}")
-    
-    # Save the updated master CSV
-    master_df.to_csv(master_csv_path, index=False)
-    if verbose:
-        print(f"Saved master CSV with {len(master_df)} rows and {len(master_df.columns)} columns")
+        if self.verbose:
+            print(f"Merged census data for {written} coordinates ({updated} rows updated, {inserted} added)")
+        return written
 
-def process_batch(coordinates, force=False, verbose=False, use_mock_data=False):
+def process_batch(coordinates, force=False, verbose=False, use_mock_data=False, flush_interval=None,
+                  pool=None, url=MCDC_CAPS_URL, client=None, rate_limiter=None, progress=None, task=None,
+                  reuse_within=None, journal=None):
     """
     Process a batch of coordinates.
     
+    Coordinates without cached data are fetched concurrently, either through the
+    HTTP client or one per driver in the pool. Extracted census data is
+    buffered and merged into the master dataset in one write at the end of the
+    batch (and every `flush_interval` coordinates).
+    
     Args:
         coordinates (list): List of (latitude, longitude) tuples to process
         force (bool): Whether to force re-fetching data even if it already exists
         verbose (bool): Whether to print verbose output
         use_mock_data (bool): Whether to use mock data instead of fetching real data
+        flush_interval (int): Merge buffered data after this many coordinates
+        pool (WebDriverPool): Shared driver pool; a single-driver pool is used if None
+        url (str): URL of the capsACS form page
+        client (MCDCClient): HTTP client; when given, browsers are not used at all
+        rate_limiter (HostRateLimiter): Per-host limiter applied to browser fetches
+            (the HTTP client carries its own)
+        progress (Progress): Shared rich progress display; one is created for the batch if None
+        task: Task on `progress` to advance per coordinate
+        reuse_within (float): Reuse the report of a point within this many metres
+            instead of fetching (None or 0 disables reuse; with `force`, only
+            reports fetched in this batch are reused)
+        journal (FetchJournal): Journal receiving each coordinate's state; outcomes
+            are appended only after the buffer has been merged into the master data
     
     Returns:
         int: Number of coordinates successfully processed
@@ -551,170 +601,188 @@ def process_batch(coordinates, force=False, verbose=False, use_mock_data=False):
     if verbose:
         print(f"Processing batch of {len(coordinates)} coordinates")
     
+    buffer = RadiusDataBuffer(flush_interval=flush_interval, verbose=verbose)
+    
+    own_progress = progress is None
+    if own_progress:
+        progress = create_progress()
+        progress.start()
+        task = progress.add_task("[cyan]Fetching census data...", total=len(coordinates))
+    
+    outcomes = []
+    
+    def report(coord, state, error=None):
+        if journal is None:
+            return
+        if state == IN_FLIGHT:
+            journal.record(coord, IN_FLIGHT)
+        else:
+            outcomes.append((coord, state, error))
+    
+    try:
+        processed = _process_coordinates(coordinates, buffer, force, verbose, use_mock_data, pool, url,
+                                         client, rate_limiter, lambda n=1: progress.advance(task, n),
+                                         reuse_within, report)
+    finally:
+        # Write whatever was collected, even if the batch was interrupted
+        buffer.flush()
+        if journal is not None:
+            journal.record_many(outcomes)
+        if own_progress:
+            progress.stop()
+    
+    return processed
+
+def create_progress():
+    """Create the progress display used while fetching census data."""
+    return Progress(
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TaskProgressColumn(),
+        TextColumn("{task.completed}/{task.total}"),
+        TimeElapsedColumn(),
+    )
+
+def _use_mock_data(coord, buffer, verbose):
+    """Generate mock census data for a coordinate and queue it in the buffer."""
+    mock_data = generate_mock_census_data(coord, verbose=verbose)
+    csv_path = save_mock_data_to_csv(coord, mock_data, verbose=verbose)
+    get_cache().record(coord[0], coord[1], csv_path, source=SOURCE_MOCK)
+    update_master_csv_with_radius_data(coord, csv_path, verbose=verbose, buffer=buffer)
+
+def _process_coordinates(coordinates, buffer, force, verbose, use_mock_data, pool, url, client=None,
+                         rate_limiter=None, advance=lambda n=1: None, reuse_within=None,
+                         report=lambda coord, state, error=None: None):
+    """Fetch or load census data for each coordinate and queue it in the buffer."""
     processed = 0
+    to_fetch = []
+    
+    # Near-duplicates of a coordinate queued in this batch wait for its report
+    queued = GridIndex(reuse_within) if reuse_within else None
+    followers = {}
     
     for coord in coordinates:
         if verbose:
             print(f"Processing coordinates: {coord}")
         
         # Check if we already have data for these coordinates
-        existing_csv = find_existing_csv(coord[0], coord[1])
+        # (mock data only counts when mock data was asked for)
+        existing_csv = find_existing_csv(coord[0], coord[1], allow_mock=use_mock_data)
         
         if existing_csv and not force:
             if verbose:
                 print(f"Using existing data for {coord[0]}, {coord[1]} from {existing_csv}")
             
-            # Extract data from existing CSV and update master CSV
-            # data = extract_data_from_csv(existing_csv, verbose=verbose)
-            # update_master_csv(coord, data, verbose=verbose)
-            
             # Use the new function to update master CSV with radius-specific data
-            update_master_csv_with_radius_data(coord, existing_csv, verbose=verbose)
+            update_master_csv_with_radius_data(coord, existing_csv, verbose=verbose, buffer=buffer)
             
             processed += 1
+            report(coord, DONE)
+            advance()
             continue
         
         if use_mock_data:
             if verbose:
                 print(f"Using mock data for {coord[0]}, {coord[1]}")
             
-            # Generate mock data and update master CSV
-            mock_data = generate_mock_census_data(coord, verbose=verbose)
-            csv_path = save_mock_data_to_csv(coord, mock_data, verbose=verbose)
-            
-            # Update master CSV with mock data
-            # update_master_csv(coord, mock_data, verbose=verbose)
-            
-            # Use the new function to update master CSV with radius-specific data
-            update_master_csv_with_radius_data(coord, csv_path, verbose=verbose)
-            
+            _use_mock_data(coord, buffer, verbose)
             processed += 1
+            report(coord, MOCKED)
+            advance()
             continue
         
+        if reuse_within:
+            # --force re-fetches, so only reports fetched in this batch are shared
+            nearby = None if force else get_cache().nearest(coord[0], coord[1], reuse_within)
+            if nearby:
+                csv_path, source_lat, source_lng, distance = nearby
+                if verbose:
+                    print(f"Reusing data from ({source_lat}, {source_lng}), {distance:.0f} m away, for {coord}")
+                update_master_csv_with_radius_data(coord, csv_path, verbose=verbose, buffer=buffer,
+                                                   source=(source_lat, source_lng, distance))
+                processed += 1
+                report(coord, DONE)
+                advance()
+                continue
+            
+            leader = queued.nearest(coord[0], coord[1], reuse_within)
+            if leader:
+                followers.setdefault(leader[0], []).append((coord, leader[3]))
+                continue
+            queued.add(coord[0], coord[1], coord)
+        
         # If we get here, we need to fetch new data
+        to_fetch.append(coord)
+    
+    if not to_fetch:
+        return processed
+    
+    own_pool = client is None and pool is None
+    if own_pool:
+        pool = WebDriverPool(size=1, factory=initialize_webdriver, verbose=verbose)
+    
+    for coord in to_fetch:
+        report(coord, IN_FLIGHT)
+    
+    def fetch_one(coord):
         if verbose:
             print(f"Fetching new data for {coord[0]}, {coord[1]}")
-        
-        # Initialize WebDriver
-        driver = initialize_webdriver()
-        if not driver:
-            print("Failed to initialize WebDriver")
-            continue
-        
-        try:
-            # Navigate to MCDC website with retry logic and exponential backoff
-            max_retries = 5
-            for attempt in range(max_retries):
-                try:
-                    backoff_time = 2 ** attempt  # Exponential backoff: 1, 2, 4, 8, 16 seconds
-                    print(f"Navigating to MCDC website (attempt {attempt+1}/{max_retries}, backoff: {backoff_time}s)...")
-                    driver.get("https://mcdc.missouri.edu/applications/capsACS.html")
-                    
-                    # Wait for the page to load
-                    WebDriverWait(driver, 30).until(
-                        EC.presence_of_element_located((By.ID, "latitude"))
-                    )
-                    print("Page loaded successfully")
-                    break
-                except Exception as e:
-                    print(f"Error loading page (attempt {attempt+1}/{max_retries}): {e}")
-                    if attempt == max_retries - 1:
-                        # If all retries failed, use mock data as fallback
-                        print("All retries failed. Falling back to mock data.")
-                        driver.quit()
-                        mock_data = generate_mock_census_data(coord, verbose=verbose)
-                        csv_path = save_mock_data_to_csv(coord, mock_data, verbose=verbose)
-                        
-                        # Update master CSV with mock data
-                        # update_master_csv(coord, mock_data, verbose=verbose)
-                        
-                        # Use the new function to update master CSV with radius-specific data
-                        update_master_csv_with_radius_data(coord, csv_path, verbose=verbose)
-                        
-                        processed += 1
-                        raise Exception("Website unavailable, used mock data instead")
-                    time.sleep(backoff_time)  # Wait with exponential backoff before retrying
-            
-            print("Page loaded, filling out the form...")
-            
-            # Fill out the form with separate latitude and longitude fields
-            lat_input = driver.find_element(By.ID, "latitude")
-            lat_input.clear()
-            lat_input.send_keys(f"{coord[0]}")
-            
-            lng_input = driver.find_element(By.ID, "longitude")
-            lng_input.clear()
-            lng_input.send_keys(f"{coord[1]}")
-            
-            # Set all radii
-            radii = [5, 10, 15, 20, 25]
-            radii_str = " ".join(str(r) for r in radii)
-            
-            radii_input = driver.find_element(By.ID, "radii")
-            radii_input.clear()
-            radii_input.send_keys(radii_str)
-            
-            print(f"Form filled with lat={coord[0]}, lng={coord[1]}, radii={radii_str}")
-            
-            # Submit the form
-            print("Submitting form...")
-            submit_button = driver.find_element(By.XPATH, "//input[@type='submit' and @value='Generate report']")
-            submit_button.click()
-            print("Form submitted")
+        if client is not None:
+            return client.fetch(coord, radii=RADII)
+        if rate_limiter is not None:
+            rate_limiter.acquire(url)
+        with pool.driver() as driver:
+            return scrape_coordinate(driver, coord, url=url, verbose=verbose)
+    
+    workers = client.pool_size if client is not None else pool.size
+    
+    try:
+        # Fetch concurrently; results are merged on this thread
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(fetch_one, coord): coord for coord in to_fetch}
             
-            # Wait for the results page to load
-            print("Waiting for results page to load...")
-            try:
-                WebDriverWait(driver, 45).until(
-                    EC.presence_of_element_located((By.XPATH, "//a[contains(@href, '.csv')]"))
-                )
-                print("Results page loaded successfully - found CSV links")
-            except Exception as e:
-                print(f"Error waiting for results page: {e}")
-                # Take a screenshot to debug what's happening
+            for future in as_completed(futures):
+                coord = futures[future]
+                nearby = followers.pop(coord, [])
+                group = [coord] + [c for c, _ in nearby]
+                advance(len(group))
                 try:
-                    screenshot_path = os.path.join(os.path.expanduser("~"), "Downloads", f"error_page_{coord[0]}_{coord[1]}.png")
-                    driver.save_screenshot(screenshot_path)
-                    print(f"Saved error screenshot to {screenshot_path}")
-                    # Print the current page source for debugging
-                    print("Current page HTML:")
-                    print(driver.page_source[:500] + "...")  # Print first 500 chars of page source
-                except Exception as ss_error:
-                    print(f"Failed to take screenshot: {ss_error}")
-                raise
-            
-            print("Results page loaded")
-            
-            # Save a screenshot of the results page
-            screenshot_path = os.path.join(os.path.expanduser("~"), "Downloads", f"results_page_{coord[0]}_{coord[1]}.png")
-            driver.save_screenshot(screenshot_path)
-            print(f"Saved screenshot to {screenshot_path}")
-            
-            # Download the CSV file
-            csv_path = download_csv(driver, coord, verbose=verbose)
-            
-            if csv_path:
-                # Extract data from the CSV and update master CSV
-                # census_data = extract_data_from_csv(csv_path, verbose=verbose)
-                # update_master_csv(coord, census_data, verbose=verbose)
-                
-                # Use the new function to update master CSV with radius-specific data
-                update_master_csv_with_radius_data(coord, csv_path, verbose=verbose)
+                    csv_path = future.result()
+                except WebsiteUnavailableError as e:
+                    # If all retries failed, use mock data as fallback
+                    print("All retries failed. Falling back to mock data.")
+                    for mock_coord in group:
+                        _use_mock_data(mock_coord, buffer, verbose)
+                        report(mock_coord, MOCKED, str(e))
+                    processed += len(group)
+                    continue
+                except Exception as e:
+                    print(f"Error processing coordinates {coord}: {e}")
+                    traceback.print_exc()
+                    for failed_coord in group:
+                        report(failed_coord, FAILED, f"{type(e).__name__}: {e}")
+                    continue
                 
-                print(f"Successfully processed data for coordinates: {coord}")
-                processed += 1
-            else:
-                print(f"Failed to download CSV for coordinates: {coord}")
-        
-        except Exception as e:
-            print(f"Error processing coordinates {coord}: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        finally:
-            # Close the WebDriver
-            print("Closing WebDriver")
-            driver.quit()
+                if csv_path:
+                    get_cache().record(coord[0], coord[1], csv_path, source=SOURCE_REAL)
+                    
+                    # Use the new function to update master CSV with radius-specific data
+                    update_master_csv_with_radius_data(coord, csv_path, verbose=verbose, buffer=buffer)
+                    for near_coord, distance in nearby:
+                        update_master_csv_with_radius_data(near_coord, csv_path, verbose=verbose, buffer=buffer,
+                                                           source=(coord[0], coord[1], distance))
+                    
+                    print(f"Successfully processed data for coordinates: {coord}")
+                    processed += len(group)
+                    for done_coord in group:
+                        report(done_coord, DONE)
+                else:
+                    print(f"Failed to download CSV for coordinates: {coord}")
+                    for failed_coord in group:
+                        report(failed_coord, FAILED, "no CSV report downloaded")
+    finally:
+        if own_pool:
+            pool.close()
     
     return processed
 
@@ -724,17 +792,47 @@ def parse_args():
     parser.add_argument("--force", action="store_true", help="Force fetch data even if it already exists.")
     parser.add_argument("--verbose", action="store_true", help="Print verbose output.")
     parser.add_argument("--limit", type=int, default=None, help="Limit the number of coordinates to process.")
-    parser.add_argument("--batch-size", type=int, default=5, help="Number of coordinates to process in each batch.")
+    parser.add_argument("--batch-size", type=int, default=50, help="Number of coordinates to process in each batch (fetched concurrently, merged in one write).")
     parser.add_argument("--verify", action="store_true", help="Verify existing data.")
-    parser.add_argument("--retry-failed", action="store_true", help="Retry failed coordinates.")
+    parser.add_argument("--retry-failed", action="store_true", help="Only process coordinates the job journal records as failed or mocked.")
+    parser.add_argument("--journal", default=JOURNAL_PATH, help="Job journal used to resume interrupted runs.")
+    parser.add_argument("--no-journal", action="store_true", help="Neither read nor write the job journal.")
     parser.add_argument("--start-index", type=int, default=0, help="Index to start processing from.")
     parser.add_argument("--use-mock-data", action="store_true", help="Use mock data instead of fetching from the website.")
+    parser.add_argument("--flush-interval", type=int, default=None, help="Merge census data into the master dataset every N coordinates (default: once per batch).")
+    parser.add_argument("--engine", choices=["http", "selenium"], default="http", help="Fetch reports with direct HTTP requests or by driving a browser.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Coordinates fetched at once by the http engine.")
+    parser.add_argument("--rate", type=float, default=2.0, help="Maximum requests per second to each host.")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per coordinate for transient HTTP errors, with jittered backoff.")
+    parser.add_argument("--browser", choices=SUPPORTED_BROWSERS, default="chrome", help="Browser used for scraping.")
+    parser.add_argument("--drivers", type=int, default=2, help="Number of browsers kept open to scrape concurrently.")
+    parser.add_argument("--driver-max-uses", type=int, default=25, help="Restart a browser after this many coordinates.")
+    parser.add_argument("--headed", action="store_true", help="Show the browser windows instead of running headless.")
+    parser.add_argument("--cache-precision", type=int, default=DEFAULT_PRECISION, help="Decimal places of the coordinates used to key cached reports.")
+    parser.add_argument("--cache-ttl-days", type=float, default=None, help="Re-fetch cached reports older than this many days.")
+    parser.add_argument("--reuse-within", type=float, default=None, metavar="METRES", help="Reuse census data already fetched for a point within this many metres.")
+    parser.add_argument("--rehydrate", action="store_true", help="Rebuild the census columns from the reports in database/MCDC and exit.")
+    parser.add_argument("--workers", type=int, default=None, help="Processes used by --rehydrate (default: CPU count).")
+    parser.add_argument("--cache-stats", action="store_true", help="Print report cache statistics and exit.")
+    parser.add_argument("--mcdc-url", default=MCDC_CAPS_URL, help="URL of the capsACS form (e.g. a local stub page for testing).")
     return parser.parse_args()
 
 def main():
     """Main function."""
     args = parse_args()
     
+    global CACHE
+    ttl = args.cache_ttl_days * 86400 if args.cache_ttl_days is not None else None
+    CACHE = MCDCCache(precision=args.cache_precision, ttl=ttl)
+    
+    if args.cache_stats:
+        print_cache_stats()
+        return
+    
+    if args.rehydrate:
+        rehydrate_census_data(workers=args.workers, precision=args.cache_precision, verbose=args.verbose)
+        return
+    
     # Initialize listings and coordinates
     coordinates = initialize_coordinates()
     
@@ -749,6 +847,24 @@ def main():
         coordinates = coordinates[:args.limit]
         print(f"Limiting to {args.limit} listings starting from index {args.start_index}")
     
+    journal = None if args.no_journal else FetchJournal(args.journal, precision=args.cache_precision)
+    if journal is not None:
+        counts = journal.summary()
+        if counts:
+            print("Job journal: " + ", ".join(f"{count} {state}" for state, count in sorted(counts.items())))
+        
+        if args.retry_failed:
+            coordinates = journal.select(coordinates, RETRY_STATES)
+            print(f"Retrying {len(coordinates)} failed or mocked listings")
+        elif not args.force:
+            remaining = [coord for coord in coordinates if not journal.is_finished(coord, max_age=ttl)]
+            if len(remaining) < len(coordinates):
+                print(f"Skipping {len(coordinates) - len(remaining)} listings finished in earlier runs")
+            coordinates = remaining
+    elif args.retry_failed:
+        print("--retry-failed needs the job journal")
+        return
+    
     print(f"Processing {len(coordinates)} listings")
     
     # Process in batches
@@ -758,9 +874,150 @@ def main():
     # Split coordinates into batches
     batches = [coordinates[i:i + batch_size] for i in range(0, len(coordinates), batch_size)]
     
-    for i, batch in enumerate(batches):
-        print(f"Processing batch {i+1}/{len(batches)} with {len(batch)} coordinates")
-        process_batch(batch, force=args.force, verbose=args.verbose, use_mock_data=args.use_mock_data)
+    rate_limiter = HostRateLimiter(args.rate)
+    
+    if args.engine == "http":
+        # One pooled, rate-limited session serves every batch
+        fetcher = MCDCClient(form_url=args.mcdc_url, pool_size=args.concurrency, verbose=args.verbose,
+                             rate_limiter=rate_limiter, retries=args.retries)
+        fetch_kwargs = {"client": fetcher}
+    else:
+        # Browsers are started lazily and reused across batches
+        fetcher = WebDriverPool(size=args.drivers, browser=args.browser, headless=not args.headed,
+                                max_uses=args.driver_max_uses, verbose=args.verbose)
+        fetch_kwargs = {"pool": fetcher, "rate_limiter": rate_limiter}
+    
+    with fetcher, create_progress() as progress:
+        task = progress.add_task("[cyan]Fetching census data...", total=len(coordinates))
+        for i, batch in enumerate(batches):
+            progress.update(task, description=f"[cyan]Batch {i+1}/{len(batches)}")
+            process_batch(batch, force=args.force, verbose=args.verbose, use_mock_data=args.use_mock_data,
+                          flush_interval=args.flush_interval, url=args.mcdc_url, progress=progress, task=task,
+                          reuse_within=args.reuse_within, journal=journal, **fetch_kwargs)
+    
+    if journal is not None:
+        journal.close()
+
+    print_cache_stats()
+
+def print_cache_stats():
+    """Print a summary of the report cache."""
+    stats = get_cache().stats()
+    table = Table(title="MCDC report cache")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", justify="right")
+    for name, value in stats.items():
+        table.add_row(name.replace("_", " ").capitalize(), "-" if value is None else str(value))
+    console.print(table)
+
+def _parse_report(path):
+    """
+    Process-pool worker for rehydration: parse one report file.
+    
+    Returns:
+        tuple: (path, data dict or None, parse seconds, error message or None)
+    """
+    start = time.perf_counter()
+    try:
+        data = parse_radius_data(path, RADIUS_DATA_COLUMNS)
+        error = None if data else "no census columns found"
+    except Exception as e:
+        data, error = None, f"{type(e).__name__}: {e}"
+    return path, data or None, time.perf_counter() - start, error
+
+def rehydrate_census_data(mcdc_dir=MCDC_DIR, workers=None, precision=DEFAULT_PRECISION, verbose=False):
+    """
+    Rebuild the census columns of the master dataset from the local report files.
+    
+    Every report in `mcdc_dir` is parsed in a process pool. The results are
+    collected into one wide frame keyed by coordinates and joined to the
+    master listings (on coordinates rounded to `precision` places), and all
+    matched rows are written in a single upsert.
+    
+    Args:
+        mcdc_dir (str): Directory holding the MCDC report CSVs
+        workers (int): Worker processes (default: CPU count)
+        precision (int): Decimal places used to match report and listing coordinates
+        verbose (bool): Print the parse time of every file
+        
+    Returns:
+        dict: Counts of files parsed, failed and listings updated
+    """
+    started = time.perf_counter()
+    
+    # Newest file wins when several files have the same coordinates
+    reports = {}
+    entries = os.scandir(mcdc_dir) if os.path.isdir(mcdc_dir) else []
+    for entry in entries:
+        coord = parse_filename(entry.name)
+        if coord is None:
+            continue
+        mtime = entry.stat().st_mtime
+        if coord not in reports or mtime > reports[coord][1]:
+            reports[coord] = (entry.path, mtime)
+    
+    if not reports:
+        console.print(f"[yellow]No MCDC reports found in {mcdc_dir}[/yellow]")
+        return {"files": 0, "parsed": 0, "failed": 0, "updated": 0}
+    
+    console.print(f"[cyan]Parsing {len(reports)} MCDC reports from {mcdc_dir}...[/cyan]")
+    coord_by_path = {path: coord for coord, (path, _) in reports.items()}
+    records, timings, failures = [], [], []
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor, create_progress() as progress:
+        task = progress.add_task("[cyan]Parsing reports...", total=len(coord_by_path))
+        chunksize = max(1, len(coord_by_path) // ((workers or os.cpu_count() or 1) * 4))
+        for path, data, seconds, error in executor.map(_parse_report, list(coord_by_path), chunksize=chunksize):
+            progress.advance(task)
+            timings.append((path, seconds))
+            if verbose:
+                print(f"{seconds * 1000:8.1f} ms  {path}" + (f"  ({error})" if error else ""))
+            if error:
+                failures.append((path, error))
+                continue
+            lat, lng = coord_by_path[path]
+            records.append({**dict(zip(PROVENANCE_COLUMNS, (lat, lng, 0.0))), **data})
+    
+    updated = 0
+    if records:
+        # Join the wide census frame to the listings on rounded coordinates
+        census = pd.DataFrame(records)
+        census['_lat_key'] = census['Census_Source_Latitude'].round(precision)
+        census['_lng_key'] = census['Census_Source_Longitude'].round(precision)
+        store = get_store()
+        listings = store.read_frame(columns=list(COORDINATE_KEY), with_row_ids=True)
+        listings['_lat_key'] = listings['Latitude'].round(precision)
+        listings['_lng_key'] = listings['Longitude'].round(precision)
+        joined = listings.reset_index().merge(census, on=['_lat_key', '_lng_key'], how='inner')
+        joined = joined.set_index(listings.index.name)
+        frame = joined.drop(columns=['_lat_key', '_lng_key', *COORDINATE_KEY])
+        if len(frame):
+            updated, _ = store.upsert_columns(frame)
+    
+    _print_rehydrate_report(timings, failures)
+    console.print(f"[green]Rehydrated {updated} listings from {len(records)} reports "
+                  f"in {time.perf_counter() - started:.1f}s[/green]")
+    return {"files": len(coord_by_path), "parsed": len(records), "failed": len(failures), "updated": updated}
+
+def _print_rehydrate_report(timings, failures, slowest=10):
+    """Print parse-time statistics, the slowest files and every failure."""
+    seconds = np.array([t for _, t in timings])
+    table = Table(title="Report parse times")
+    table.add_column("File", style="cyan")
+    table.add_column("ms", justify="right")
+    for path, t in sorted(timings, key=lambda item: item[1], reverse=True)[:slowest]:
+        table.add_row(os.path.basename(path), f"{t * 1000:.1f}")
+    console.print(table)
+    console.print(f"Files: {len(seconds)}  total: {seconds.sum():.2f}s  "
+                  f"mean: {seconds.mean() * 1000:.1f} ms  p95: {np.percentile(seconds, 95) * 1000:.1f} ms")
+    
+    if failures:
+        table = Table(title=f"{len(failures)} reports failed to parse", style="red")
+        table.add_column("File")
+        table.add_column("Error")
+        for path, error in failures:
+            table.add_row(os.path.basename(path), error)
+        console.print(table)
 
 def update_master_census_data(master_df, verbose=False):
     """
@@ -790,14 +1047,8 @@ def update_master_census_data(master_df, verbose=False):
     if verbose:
         print(f"Found {len(valid_df)} rows with valid coordinates")
     
-    # Initialize WebDriver
-    if verbose:
-        print("Initializing WebDriver")
-    driver = initialize_webdriver()
-    if not driver:
-        if verbose:
-            print("Failed to initialize WebDriver")
-        return master_df
+    # Reuse one WebDriver for every row
+    pool = WebDriverPool(size=1, factory=initialize_webdriver, verbose=verbose)
     
     try:
         # Process each row
@@ -810,7 +1061,7 @@ def update_master_census_data(master_df, verbose=False):
             
             # Fetch census data
             try:
-                csv_path = fetch_data(lat, lng, verbose=verbose)
+                csv_path = fetch_data(lat, lng, verbose=verbose, pool=pool)
                 
                 if csv_path:
                     # Read data from CSV
@@ -834,10 +1085,9 @@ def update_master_census_data(master_df, verbose=False):
     
     finally:
         # Close WebDriver
-        if driver:
-            driver.quit()
-            if verbose:
-                print("Closed WebDriver")
+        pool.close()
+        if verbose:
+            print("Closed WebDriver")
     
     return master_df
 
@@ -970,17 +1220,17 @@ def initialize_webdriver():
 
 def initialize_listings():
     """
-    Initialize the listings data from the master CSV file.
+    Initialize the listings data from the master dataset.
     
     Returns:
         pandas.DataFrame: The listings data.
     """
-    master_csv = os.path.join("database", "master.csv")
-    if not os.path.exists(master_csv):
-        print("Master CSV file not found")
+    listings = get_store().read_frame()
+    if listings is None:
+        print("Master dataset not found")
         return pd.DataFrame(columns=["Latitude", "Longitude"])
     
-    return pd.read_csv(master_csv)
+    return listings
 
 def initialize_coordinates():
     """
@@ -1069,196 +1319,139 @@ def save_mock_data_to_csv(coord, mock_data, verbose=False):
     
     return file_path
 
-def extract_radius_data(csv_filepath, column_names):
+def clean_mcdc_values(values):
     """
-    Extract specific columns from the CSV generated by MCDC for different radii.
+    Convert raw MCDC report cells to numbers in one vectorized pass.
+    
+    Quotes, thousands separators and dollar signs are stripped from text cells,
+    'N' and blanks become NaN, decimals become floats and whole numbers ints.
+    Text that still is not numeric is kept (cleaned) as text, and cells pandas
+    already parsed as numbers are left unchanged.
+    
+    Args:
+        values (array-like): Report cells, any mix of text and numbers
+        
+    Returns:
+        np.ndarray: Cleaned values (object dtype)
+    """
+    values = np.array(values, dtype=object)
+    is_text = np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+    if not is_text.any():
+        return values
+    
+    text = pd.Series(values[is_text], dtype=object)
+    cleaned = text.str.replace('"', '', regex=False).str.replace(',', '', regex=False)
+    missing = cleaned.str.strip().isin(['N', '']).to_numpy()
+    cleaned = cleaned.str.replace('$', '', regex=False)
+    
+    has_dot = cleaned.str.contains('.', regex=False).to_numpy(dtype=bool)
+    is_float = has_dot & pd.to_numeric(cleaned, errors='coerce').notna().to_numpy()
+    is_int = ~has_dot & cleaned.str.fullmatch(r'\s*[+-]?\d+\s*').to_numpy(dtype=bool)
+    
+    strings = cleaned.to_numpy(dtype=object)
+    result = strings.copy()
+    result[is_float] = strings[is_float].astype(float)
+    result[is_int] = strings[is_int].astype(np.int64)
+    result[missing] = np.nan
+    
+    values[is_text] = result
+    return values
+
+def parse_radius_data(csv_filepath, column_names, verbose=False):
+    """
+    Parse an MCDC report into `{column}_{radius}` values, raising on errors.
+    
+    The report has one row per radius, in the order of RADII (row 0 is 5mi).
     
     Args:
         csv_filepath (str): Path to the CSV file
         column_names (list): List of column names to extract
+        verbose (bool): Report columns missing from the file
         
     Returns:
         dict: Dictionary with keys being 'column_radius' and values being the value
     """
-    try:
-        # Read the CSV file
-        csv_df = pd.read_csv(csv_filepath)
-        
-        print(f"CSV file has {len(csv_df)} rows and {len(csv_df.columns)} columns")
-        
-        # Define the radii and their corresponding rows in the CSV
-        radii_rows = {
-            5: 0,   # 5mi radius is on row 1 (index 0)
-            10: 1,  # 10mi radius is on row 2 (index 1)
-            15: 2,  # 15mi radius is on row 3 (index 2)
-            20: 3,  # 20mi radius is on row 4 (index 3)
-            25: 4   # 25mi radius is on row 5 (index 4)
-        }
-        
-        # Initialize results dictionary
-        results = {}
-        
-        # Get the exact columns present in the CSV
-        csv_columns = csv_df.columns.tolist()
-        
-        # Print the first few columns for debugging
-        print(f"First 10 columns in CSV: {csv_columns[:10]}")
-        
-        # Print the TotPop values for each row
-        print("TotPop values by row:")
-        if 'TotPop' in csv_columns:
-            for i in range(min(5, len(csv_df))):
-                print(f"  Row {i}: {csv_df.loc[i, 'TotPop']}")
-        else:
-            print("  'TotPop' column not found in CSV")
-        
-        # Print the TotalOwnerUnits values for each row
-        print("TotalOwnerUnits values by row:")
-        if 'TotalOwnerUnits' in csv_columns:
-            for i in range(min(5, len(csv_df))):
-                print(f"  Row {i}: {csv_df.loc[i, 'TotalOwnerUnits']}")
-        else:
-            print("  'TotalOwnerUnits' column not found in CSV")
-        
-        # Extract data for each radius
-        for radius, row_idx in radii_rows.items():
-            if row_idx < len(csv_df):
-                radius_data_count = 0
-                for col in column_names:
-                    if col in csv_columns:
-                        # Create a new column name with radius suffix
-                        new_col = f"{col}_{radius}"
-                        
-                        # Extract the value and clean it
-                        value = csv_df.loc[row_idx, col]
-                        
-                        # Clean the value if it's a string (remove commas, quotes, and convert to numeric if possible)
-                        if isinstance(value, str):
-                            # Remove quotes and commas
-                            cleaned_value = value.replace('"', '').replace(',', '')
-                            
-                            # Handle 'N' or other non-numeric values
-                            if cleaned_value.strip() == 'N' or cleaned_value.strip() == '':
-                                value = np.nan
-                            else:
-                                # Try to convert to numeric
-                                try:
-                                    # Remove dollar signs for currency values
-                                    cleaned_value = cleaned_value.replace('$', '')
-                                    
-                                    if '.' in cleaned_value:
-                                        value = float(cleaned_value)
-                                    else:
-                                        value = int(cleaned_value)
-                                except (ValueError, TypeError):
-                                    # Keep as string if conversion fails
-                                    value = cleaned_value
-                        
-                        # Store the cleaned value
-                        results[new_col] = value
-                        radius_data_count += 1
-                    else:
-                        print(f"Warning: Column '{col}' not found in the CSV file")
-                
-                print(f"Extracted {radius_data_count} columns for radius {radius}mi")
-        
-        # Print some of the extracted data for verification
-        print("\nExtracted data:")
-        sample_cols = ["TotalOwnerUnits", "TotPop"]
-        for col in sample_cols:
-            for radius in radii_rows.keys():
-                col_name = f"{col}_{radius}"
-                if col_name in results:
-                    print(f"{col_name}: {results[col_name]}")
+    wanted = set(column_names)
+    csv_df = pd.read_csv(csv_filepath, usecols=lambda col: col in wanted)
+    
+    present = [col for col in column_names if col in csv_df.columns]
+    if verbose:
+        missing = [col for col in column_names if col not in csv_df.columns]
+        if missing:
+            print(f"Warning: {len(missing)} columns not found in {csv_filepath}: {', '.join(missing)}")
+    if not present:
+        return {}
+    
+    # Stack the radius rows into one wide record, radius by radius
+    radii = RADII[:len(csv_df)]
+    cells = csv_df.loc[:len(radii) - 1, present].to_numpy(dtype=object).ravel()
+    keys = [f"{col}_{radius}" for radius in radii for col in present]
+    return dict(zip(keys, clean_mcdc_values(cells)))
+
+def extract_radius_data(csv_filepath, column_names, verbose=False):
+    """
+    Extract specific columns from the CSV generated by MCDC for different radii.
+    
+    Args:
+        csv_filepath (str): Path to the CSV file
+        column_names (list): List of column names to extract
+        verbose (bool): Report columns missing from the file
         
-        return results
+    Returns:
+        dict: Dictionary with keys being 'column_radius' and values being the
+        value (empty if the file could not be parsed)
+    """
+    try:
+        return parse_radius_data(csv_filepath, column_names, verbose=verbose)
     except Exception as e:
         print(f"Error extracting radius data from {csv_filepath}: {e}")
-        import traceback
         traceback.print_exc()
         return {}
 
-def update_master_csv_with_radius_data(coord, csv_path, verbose=False):
+def update_master_csv_with_radius_data(coord, csv_path, verbose=False, buffer=None, source=None):
     """
-    Update the master CSV with radius-specific data from the MCDC CSV.
+    Update the master dataset with radius-specific data from the MCDC CSV.
     
     Args:
         coord (tuple): Latitude, longitude tuple
         csv_path (str): Path to the MCDC CSV file
         verbose (bool): Print verbose output
+        buffer (RadiusDataBuffer): Queue the data here instead of writing it immediately
+        source (tuple): (latitude, longitude, distance in metres) of the point the
+            report was fetched for, when it is reused for a nearby coordinate
     """
     if verbose:
         print(f"Updating master CSV with radius data from {csv_path}")
     
-    # Define the columns to extract (as specified by the user)
-    columns_to_extract = [
-        "TotPop", "Age0_4", "Age5_9", "Age10_14", "Age15_19", "Age20_24", 
-        "Age25_34", "Age35_44", "Age45_54", "Age55_59", "Age60_64", "Age65_74", 
-        "Age75_84", "Over85", "TotHHs", "HHInc0", "HHInc10", "HHInc15", "HHInc25", 
-        "HHInc35", "HHInc50", "HHInc75", "HHInc100", "HHInc150", "HHInc200", 
-        "MedianHHInc", "AvgHHInc", "InKindergarten", "InElementary", "InHighSchool", 
-        "InCollege", "Disabled", "DisabledUnder18", "NonInst18_64", "Disabled18_64", 
-        "NonInstOver65", "DisabledElder", "TotHUs", "OccHUs", "OwnerOcc", "RenterOcc", 
-        "AvgOwnerHHSize", "AvgRenterHHSize", "VacHUs", "VacantForSale", "VacantForRent", 
-        "VacantSeasonal", "TotalOwnerUnits", "OwnerVacRate", "TotalRentalUnits", 
-        "RenterVacRate", "PersonsInOwnerUnits", "PersonsInRenterUnits", "MobileHomes", 
-        "MobileHomesPerK", "HvalUnder50", "Hval50", "Hval100", "Hval150", "Hval200", 
-        "Hval300", "Hval500", "HvalOverMillion", "HvalOver2Million", "MedianHValue",
-        "MedianGrossRent", "AvgGrossRent"
-    ]
     
     # Extract the radius data
-    radius_data = extract_radius_data(csv_path, columns_to_extract)
+    radius_data = extract_radius_data(csv_path, RADIUS_DATA_COLUMNS, verbose=verbose)
     
     if not radius_data:
         print(f"No radius data extracted from {csv_path}")
         return
     
-    # Initialize or load the master CSV
-    master_df = initialize_listings()
+    # Record where the data came from
+    source_lat, source_lng, distance = source if source else (coord[0], coord[1], 0.0)
+    radius_data.update(zip(PROVENANCE_COLUMNS, (source_lat, source_lng, round(distance, 1))))
     
-    # Check if these coordinates already exist in the master CSV
+    if buffer is not None:
+        buffer.add(coord, radius_data)
+        return
+    
+    # Write the radius columns into the row with these coordinates (adding it if needed)
     lat, lng = coord
-    existing_rows = master_df[(master_df['Latitude'] == lat) & (master_df['Longitude'] == lng)]
+    row = {'Latitude': lat, 'Longitude': lng}
+    row.update(radius_data)
+    updated, inserted = get_store().upsert_columns(
+        pd.DataFrame([row]), key=COORDINATE_KEY, insert_missing=True
+    )
     
-    if len(existing_rows) > 0:
-        # Update existing row
-        index = existing_rows.index[0]
-        
-        # Add new columns if they don't exist
-        for col in radius_data.keys():
-            if col not in master_df.columns:
-                if verbose:
-                    print(f"Added new column: {col}")
-                master_df[col] = None
-        
-        # Update the radius data
-        for col, value in radius_data.items():
-            master_df.at[index, col] = value
-        
-        if verbose:
+    if verbose:
+        if updated:
             print(f"Updated row with {len(radius_data)} radius-specific data points")
-    else:
-        # Create a new row (this should be rare, as coordinates should already exist)
-        new_row = {'Latitude': lat, 'Longitude': lng}
-        
-        # Add the radius data
-        for col, value in radius_data.items():
-            if col not in master_df.columns:
-                if verbose:
-                    print(f"Added new column: {col}")
-                master_df[col] = None
-            new_row[col] = value
-        
-        # Append the new row
-        master_df = pd.concat([master_df, pd.DataFrame([new_row])], ignore_index=True)
-        if verbose:
+        if inserted:
             print(f"Added new row with {len(radius_data)} radius-specific data points")
-    
-    # Save the updated master CSV
-    master_df.to_csv('database/master.csv', index=False)
-    if verbose:
-        print(f"Saved master CSV with {master_df.shape[0]} rows and {master_df.shape[1]} columns")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,175 @@
+"""
+Append-only journal of census fetch jobs.
+
+Each state change of a coordinate (in-flight, done, failed, mocked) is
+appended to a JSONL file and flushed to disk straight away. On start-up the
+journal is replayed into a dictionary keyed by rounded coordinates, so a
+restarted run can skip finished coordinates with a dictionary lookup and
+`--retry-failed` can select exactly the coordinates that failed. Coordinates
+left in-flight by a crash count as unfinished.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+from modules.scraping.mcdc_client import MCDC_DIR
+from modules.scraping.mcdc_cache import DEFAULT_PRECISION
+
+# Default journal location
+JOURNAL_PATH = os.path.join(MCDC_DIR, "fetch_jobs.jsonl")
+
+# Job states
+PENDING = "pending"
+IN_FLIGHT = "in-flight"
+DONE = "done"
+FAILED = "failed"
+MOCKED = "mocked"
+
+# States that need no further work on a resumed run
+FINISHED_STATES = (DONE, MOCKED)
+
+# States selected by --retry-failed
+RETRY_STATES = (FAILED, MOCKED)
+
+
+class FetchJournal:
+    """
+    Crash-safe record of per-coordinate fetch state.
+
+    Records are appended and fsynced one line at a time, so a crash can at
+    worst lose a partially written last line, which is ignored on replay.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, precision=DEFAULT_PRECISION):
+        """
+        Args:
+            path (str): JSONL file holding the journal
+            precision (int): Decimal places used to key coordinates
+        """
+        self.path = path
+        self.precision = precision
+        self.jobs = {}
+        self._lines = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._load()
+
+    def key(self, coord):
+        return round(float(coord[0]), self.precision), round(float(coord[1]), self.precision)
+
+    def _load(self):
+        """Replay the journal into `self.jobs`."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self.jobs[self.key((record["lat"], record["lng"]))] = record
+                self._lines += 1
+
+    def _append(self, records):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(json.dumps(record) + "\n" for record in records))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._lines += len(records)
+
+    def get(self, coord):
+        """Return the latest record for a coordinate, or None."""
+        return self.jobs.get(self.key(coord))
+
+    def state(self, coord):
+        """Return the state of a coordinate (PENDING if it was never recorded)."""
+        record = self.get(coord)
+        return record["state"] if record else PENDING
+
+    def is_finished(self, coord, max_age=None):
+        """
+        Whether a coordinate needs no further work.
+
+        Args:
+            coord (tuple): (latitude, longitude)
+            max_age (float): Treat records older than this many seconds as unfinished
+        """
+        record = self.get(coord)
+        if record is None or record["state"] not in FINISHED_STATES:
+            return False
+        return max_age is None or time.time() - record["ts"] <= max_age
+
+    def record_many(self, updates):
+        """
+        Append state changes.
+
+        Args:
+            updates (iterable): (coord, state, error) tuples; entering IN_FLIGHT
+                counts as a new attempt
+        """
+        records = []
+        with self._lock:
+            for coord, state, error in updates:
+                previous = self.jobs.get(self.key(coord)) or {}
+                attempts = previous.get("attempts", 0) + (1 if state == IN_FLIGHT else 0)
+                # Keep the last error until the coordinate succeeds
+                last_error = None if state == DONE else (error or previous.get("error"))
+                record = {
+                    "lat": float(coord[0]),
+                    "lng": float(coord[1]),
+                    "state": state,
+                    "attempts": attempts,
+                    "error": last_error,
+                    "ts": time.time(),
+                }
+                self.jobs[self.key(coord)] = record
+                records.append(record)
+            if records:
+                self._append(records)
+
+    def record(self, coord, state, error=None):
+        """Append a single state change."""
+        self.record_many([(coord, state, error)])
+
+    def select(self, coordinates, states):
+        """Return the coordinates whose current state is in `states`."""
+        return [coord for coord in coordinates if self.state(coord) in states]
+
+    def summary(self):
+        """Return the number of coordinates in each state."""
+        return Counter(record["state"] for record in self.jobs.values())
+
+    def compact(self):
+        """Rewrite the journal with only the latest record per coordinate."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in self.jobs.values():
+                    f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._lines = len(self.jobs)
+
+    def close(self):
+        """Close the journal, compacting it if most lines are superseded."""
+        if self._lines > 2 * max(len(self.jobs), 1):
+            self.compact()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,303 @@
+"""
+Manifest of downloaded MCDC reports.
+
+Reports were found by globbing database/MCDC for `{lat}-{lng}-*.csv` with the
+raw float repr, while the scraper and the mock generator save
+`mcdc_{lat}_{lng}.csv`, so most lookups missed and each one scanned the whole
+directory. The manifest is a small SQLite table keyed by coordinates rounded to
+a fixed precision plus the radii set. Each entry records the file path, fetch
+time, source (real or mock) and a SHA-256 checksum of the file. Existing files
+in both naming schemes are indexed once, the first time the manifest is opened.
+
+For near-duplicate listings the manifest can also return the closest cached
+report within a distance tolerance, using a grid of fixed-size cells so only
+the neighbouring cells are checked.
+"""
+
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from modules.scraping.mcdc_client import MCDC_DIR, RADII
+
+# Default location of the manifest
+CACHE_DB_PATH = os.path.join(MCDC_DIR, "manifest.db")
+
+# Decimal places kept when keying coordinates (5 places is about 1 metre)
+DEFAULT_PRECISION = 5
+
+# Sources recorded for cached files
+SOURCE_REAL = "real"
+SOURCE_MOCK = "mock"
+
+# Metres per degree of latitude
+METRES_PER_DEGREE = 111320.0
+
+# Earth radius used for distances
+EARTH_RADIUS_M = 6371008.8
+
+# File name patterns used by the scraper/mock generator and by older downloads
+_FILE_PATTERNS = (
+    re.compile(r"^mcdc_(-?\d+(?:\.\d+)?)_(-?\d+(?:\.\d+)?)\.csv$"),
+    re.compile(r"^(-?\d+(?:\.\d+)?)-(-?\d+(?:\.\d+)?)-.*\.csv$"),
+)
+
+
+def file_checksum(path):
+    """Return the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def detect_source(path):
+    """Tell mock files (one row keyed by Latitude/Longitude) from MCDC reports."""
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        header = f.readline()
+    return SOURCE_MOCK if header.startswith("Latitude,") else SOURCE_REAL
+
+
+def parse_filename(filename):
+    """Return (latitude, longitude) encoded in a report file name, or None."""
+    for pattern in _FILE_PATTERNS:
+        match = pattern.match(filename)
+        if match:
+            return float(match.group(1)), float(match.group(2))
+    return None
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres between two coordinates."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class GridIndex:
+    """
+    Bucket points into square cells of `cell_m` metres of latitude.
+
+    Cells have the same size in degrees on both axes, so a longitude degree is
+    shorter than a cell edge away from the equator. A query widens the
+    longitude search by 1 / cos(latitude) cells to compensate.
+    """
+
+    def __init__(self, cell_m):
+        self.cell_deg = cell_m / METRES_PER_DEGREE
+        self.cells = {}
+
+    def _cell(self, latitude, longitude):
+        return math.floor(latitude / self.cell_deg), math.floor(longitude / self.cell_deg)
+
+    def __len__(self):
+        return sum(len(points) for points in self.cells.values())
+
+    def add(self, latitude, longitude, item):
+        """Add an item located at (latitude, longitude)."""
+        self.cells.setdefault(self._cell(latitude, longitude), []).append((latitude, longitude, item))
+
+    def nearest(self, latitude, longitude, max_distance_m):
+        """
+        Return (item, latitude, longitude, distance_m) of the closest point within
+        `max_distance_m`, or None.
+        """
+        row, col = self._cell(latitude, longitude)
+        lat_span = math.ceil(max_distance_m / METRES_PER_DEGREE / self.cell_deg)
+        cos_lat = max(math.cos(math.radians(min(abs(latitude) + lat_span * self.cell_deg, 89.9))), 1e-6)
+        lng_span = math.ceil(lat_span / cos_lat)
+
+        best = None
+        for i in range(row - lat_span, row + lat_span + 1):
+            for j in range(col - lng_span, col + lng_span + 1):
+                for point_lat, point_lng, item in self.cells.get((i, j), ()):
+                    distance = distance_m(latitude, longitude, point_lat, point_lng)
+                    if distance <= max_distance_m and (best is None or distance < best[3]):
+                        best = (item, point_lat, point_lng, distance)
+        return best
+
+
+class MCDCCache:
+    """
+    Coordinate-keyed manifest of MCDC report files.
+
+    Lookups hit the table's primary key. Entries older than `ttl` seconds, or
+    whose file has disappeared, count as misses so the coordinate is fetched again.
+    """
+
+    def __init__(self, db_path=CACHE_DB_PATH, precision=DEFAULT_PRECISION, radii=RADII,
+                 ttl=None, mcdc_dir=MCDC_DIR):
+        """
+        Args:
+            db_path (str): SQLite file holding the manifest
+            precision (int): Decimal places kept when keying coordinates
+            radii (list): Radii set the cached reports were requested with
+            ttl (float): Seconds after which an entry is stale (None keeps entries forever)
+            mcdc_dir (str): Directory indexed on first use
+        """
+        self.db_path = db_path
+        self.precision = precision
+        self.radii_key = ",".join(str(r) for r in sorted(radii))
+        self.ttl = ttl
+        self.mcdc_dir = mcdc_dir
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._grid = None
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS entries ("
+                    "lat_key REAL NOT NULL, lng_key REAL NOT NULL, radii TEXT NOT NULL, "
+                    "path TEXT NOT NULL, fetched_at REAL NOT NULL, source TEXT NOT NULL, "
+                    "checksum TEXT, PRIMARY KEY (lat_key, lng_key, radii))"
+                )
+                self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            indexed = self._conn.execute("SELECT value FROM meta WHERE key = 'indexed_at'").fetchone()
+            if indexed is None:
+                self._index_directory()
+        return self._conn
+
+    def key(self, latitude, longitude):
+        """Return the (lat_key, lng_key) a coordinate is stored under."""
+        return round(float(latitude), self.precision), round(float(longitude), self.precision)
+
+    def _index_directory(self):
+        """Record every report already in the MCDC directory (runs once per manifest)."""
+        rows = []
+        if os.path.isdir(self.mcdc_dir):
+            for filename in os.listdir(self.mcdc_dir):
+                coord = parse_filename(filename)
+                if coord is None:
+                    continue
+                path = os.path.join(self.mcdc_dir, filename)
+                try:
+                    rows.append((*self.key(*coord), self.radii_key, path, os.path.getmtime(path),
+                                 detect_source(path), file_checksum(path)))
+                except OSError:
+                    continue
+
+        # Newest file wins when several map to the same key
+        rows.sort(key=lambda row: row[4])
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('indexed_at', ?)", (str(time.time()),))
+        if rows:
+            print(f"Indexed {len(rows)} existing MCDC files into {self.db_path}")
+
+    def lookup(self, latitude, longitude, allow_mock=True):
+        """
+        Return the cached report path for a coordinate, or None on a miss.
+
+        Args:
+            latitude (float): Latitude
+            longitude (float): Longitude
+            allow_mock (bool): Whether mock data counts as a hit
+
+        Returns:
+            str: Path to the cached CSV file, or None
+        """
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT path, fetched_at, source FROM entries WHERE lat_key = ? AND lng_key = ? AND radii = ?",
+                (*self.key(latitude, longitude), self.radii_key),
+            ).fetchone()
+
+            if row is None or (row[2] == SOURCE_MOCK and not allow_mock):
+                self.misses += 1
+                return None
+
+            path, fetched_at, _ = row
+            if (self.ttl is not None and time.time() - fetched_at > self.ttl) or not os.path.exists(path):
+                self.stale += 1
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return path
+
+    def record(self, latitude, longitude, path, source=SOURCE_REAL):
+        """Add or replace the manifest entry for a coordinate."""
+        checksum = file_checksum(path)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (*self.key(latitude, longitude), self.radii_key, path, time.time(), source, checksum),
+                )
+            if self._grid is not None and source == SOURCE_REAL:
+                self._grid.add(*self.key(latitude, longitude), path)
+
+    def nearest(self, latitude, longitude, max_distance_m):
+        """
+        Find the closest real report within `max_distance_m` metres.
+
+        The grid is built from the manifest on the first call and kept up to
+        date by `record()`. Expired entries and missing files are skipped.
+
+        Returns:
+            tuple: (path, source_latitude, source_longitude, distance_m), or None
+        """
+        with self._lock:
+            if self._grid is None:
+                query = "SELECT lat_key, lng_key, path FROM entries WHERE radii = ? AND source = ?"
+                params = [self.radii_key, SOURCE_REAL]
+                if self.ttl is not None:
+                    query += " AND fetched_at >= ?"
+                    params.append(time.time() - self.ttl)
+                self._grid = GridIndex(max_distance_m)
+                for lat_key, lng_key, path in self._connection().execute(query, params):
+                    self._grid.add(lat_key, lng_key, path)
+
+            match = self._grid.nearest(float(latitude), float(longitude), max_distance_m)
+            if match is None or not os.path.exists(match[0]):
+                return None
+            self.reused += 1
+            return match
+
+    def stats(self):
+        """Return entry counts by source, stale entries and this session's hit/miss counters."""
+        with self._lock:
+            conn = self._connection()
+            by_source = dict(conn.execute("SELECT source, COUNT(*) FROM entries GROUP BY source").fetchall())
+            oldest, newest = conn.execute("SELECT MIN(fetched_at), MAX(fetched_at) FROM entries").fetchone()
+            expired = 0
+            if self.ttl is not None:
+                expired = conn.execute(
+                    "SELECT COUNT(*) FROM entries WHERE fetched_at < ?", (time.time() - self.ttl,)
+                ).fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(by_source.values()),
+                "real": by_source.get(SOURCE_REAL, 0),
+                "mock": by_source.get(SOURCE_MOCK, 0),
+                "expired": expired,
+                "oldest": time.strftime("%Y-%m-%d %H:%M", time.localtime(oldest)) if oldest else None,
+                "newest": time.strftime("%Y-%m-%d %H:%M", time.localtime(newest)) if newest else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "reused_nearby": self.reused,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
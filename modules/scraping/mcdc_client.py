@@ -0,0 +1,286 @@
+"""
+Direct HTTP client for the MCDC capsACS circular area profile report.
+
+The capsACS form only posts a latitude, longitude and list of radii, and the
+result page links to a CSV of the report. This client submits the form with
+`requests`, finds the CSV link with BeautifulSoup and downloads the file
+through a pooled session, so no browser is needed.
+"""
+
+import os
+import threading
+import time
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from modules.scraping.rate_limit import backoff_delay, retry_with_backoff
+
+# MCDC circular area profile (capsACS) form
+MCDC_CAPS_URL = "https://mcdc.missouri.edu/applications/capsACS.html"
+
+# Radii (in miles) requested for every coordinate
+RADII = [5, 10, 15, 20, 25]
+
+# Directory where downloaded reports are stored
+MCDC_DIR = os.path.join("database", "MCDC")
+
+
+class WebsiteUnavailableError(Exception):
+    """Raised when the MCDC form page cannot be loaded after all retries."""
+
+
+def create_session(pool_size=10, retries=0):
+    """
+    Create a requests session with connection pooling.
+
+    MCDCClient retries failed form loads and whole fetches itself, with
+    jittered backoff, so its session does no transport retries of its own.
+    Retries enabled here only cover GET requests: resending a form POST
+    could submit it twice.
+
+    Args:
+        pool_size (int): Connections kept open per host
+        retries (int): Transport retries of GET requests on connection errors
+            and 502/503/504 responses
+
+    Returns:
+        requests.Session: The configured session
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=1,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=["GET"],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": "ADLA census fetcher"})
+    return session
+
+
+def parse_form(html, page_url):
+    """
+    Parse the capsACS form out of the form page.
+
+    Args:
+        html (str): HTML of the form page
+        page_url (str): URL the page was loaded from (used to resolve the action)
+
+    Returns:
+        dict: action URL, HTTP method, default field values and the names of the
+        latitude, longitude and radii fields
+    """
+    soup = BeautifulSoup(html, "lxml")
+
+    form = None
+    for candidate in soup.find_all("form"):
+        if candidate.find(attrs={"id": "latitude"}) or candidate.find(attrs={"name": "latitude"}):
+            form = candidate
+            break
+    if form is None:
+        raise ValueError("capsACS form not found on page")
+
+    fields = {}
+    for element in form.find_all(["input", "select", "textarea"]):
+        name = element.get("name")
+        if not name:
+            continue
+        if element.name == "select":
+            option = element.find("option", selected=True) or element.find("option")
+            if option is not None:
+                fields[name] = option.get("value", option.text)
+        elif element.name == "textarea":
+            fields[name] = element.text
+        else:
+            input_type = (element.get("type") or "text").lower()
+            if input_type in ("checkbox", "radio") and not element.has_attr("checked"):
+                continue
+            if input_type in ("submit", "button", "image", "reset"):
+                continue
+            fields[name] = element.get("value", "")
+
+    def field_name(field_id):
+        element = form.find(attrs={"id": field_id}) or form.find(attrs={"name": field_id})
+        return element.get("name") or field_id
+
+    return {
+        "action": urljoin(page_url, form.get("action") or page_url),
+        "method": (form.get("method") or "get").lower(),
+        "fields": fields,
+        "latitude": field_name("latitude"),
+        "longitude": field_name("longitude"),
+        "radii": field_name("radii"),
+    }
+
+
+def find_csv_link(html, page_url):
+    """
+    Return the absolute URL of the first CSV link on a results page, or None.
+    """
+    soup = BeautifulSoup(html, "lxml")
+    for link in soup.find_all("a", href=True):
+        href = link["href"]
+        if ".csv" in href.split("?")[0].lower():
+            return urljoin(page_url, href)
+    return None
+
+
+class MCDCClient:
+    """
+    Thread-safe capsACS client built on a pooled requests session.
+
+    The form page is fetched and parsed once per client; every coordinate then
+    costs one form submission and one CSV download. Every request waits on the
+    optional per-host rate limiter first.
+    """
+
+    def __init__(self, form_url=MCDC_CAPS_URL, session=None, pool_size=10, timeout=60,
+                 max_retries=5, output_dir=MCDC_DIR, verbose=False, rate_limiter=None, retries=3):
+        """
+        Args:
+            form_url (str): URL of the capsACS form page (a local fake server in tests)
+            session (requests.Session): Session to use; a pooled one is created if None
+            pool_size (int): Connection pool size, also the suggested number of workers
+            timeout (int): Per-request timeout in seconds
+            max_retries (int): Attempts for loading the form page
+            output_dir (str): Directory for downloaded CSV files
+            verbose (bool): Print request details
+            rate_limiter (HostRateLimiter): Shared per-host limiter, or None for no limit
+            retries (int): Retries of a failed submission/download per coordinate
+        """
+        self.form_url = form_url
+        self.session = session or create_session(pool_size=pool_size)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.output_dir = output_dir
+        self.verbose = verbose
+        self.rate_limiter = rate_limiter
+        self.retries = retries
+        self._form = None
+        self._form_lock = threading.Lock()
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    def _request(self, method, url, **kwargs):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(url)
+        return self.session.request(method, url, timeout=self.timeout, **kwargs)
+
+    def get_form(self):
+        """
+        Load and parse the form page, retrying with exponential backoff.
+
+        Raises:
+            WebsiteUnavailableError: If the form could not be loaded.
+        """
+        with self._form_lock:
+            if self._form is not None:
+                return self._form
+
+            last_error = None
+            for attempt in range(self.max_retries):
+                try:
+                    self._log(f"Loading capsACS form (attempt {attempt+1}/{self.max_retries})...")
+                    response = self._request("GET", self.form_url)
+                    response.raise_for_status()
+                    self._form = parse_form(response.text, response.url)
+                    return self._form
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    last_error = e
+                    print(f"Error loading capsACS form (attempt {attempt+1}/{self.max_retries}): {e}")
+                    if attempt < self.max_retries - 1:
+                        time.sleep(backoff_delay(attempt))
+
+            raise WebsiteUnavailableError(
+                f"Could not load {self.form_url} after {self.max_retries} attempts: {last_error}"
+            )
+
+    def submit(self, coord, radii=RADII):
+        """
+        Submit the form for one coordinate.
+
+        Returns:
+            requests.Response: The results page response
+        """
+        form = self.get_form()
+        data = dict(form["fields"])
+        data[form["latitude"]] = f"{coord[0]}"
+        data[form["longitude"]] = f"{coord[1]}"
+        data[form["radii"]] = " ".join(str(r) for r in radii)
+
+        self._log(f"Submitting capsACS form for {coord}")
+        if form["method"] == "post":
+            response = self._request("POST", form["action"], data=data)
+        else:
+            response = self._request("GET", form["action"], params=data)
+        response.raise_for_status()
+        return response
+
+    def download(self, csv_url, coord):
+        """
+        Download a report CSV into the output directory.
+
+        Returns:
+            str: Path of the saved file
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        dest_path = os.path.join(self.output_dir, f"mcdc_{coord[0]}_{coord[1]}.csv")
+        tmp_path = f"{dest_path}.part"
+
+        with self._request("GET", csv_url, stream=True) as response:
+            response.raise_for_status()
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=65536):
+                    f.write(chunk)
+
+        os.replace(tmp_path, dest_path)
+        self._log(f"Saved report CSV to {dest_path}")
+        return dest_path
+
+    def fetch(self, coord, radii=RADII):
+        """
+        Fetch the capsACS report for a coordinate, retrying transient errors
+        with jittered exponential backoff.
+
+        Returns:
+            str: Path to the downloaded CSV, or None if the results page had no CSV link
+
+        Raises:
+            WebsiteUnavailableError: If the form page could not be loaded.
+        """
+        def on_retry(attempt, error, delay):
+            print(f"Request for {coord} failed ({error}); retry {attempt+1}/{self.retries} in {delay:.1f}s")
+
+        return retry_with_backoff(
+            lambda: self._fetch_once(coord, radii),
+            retries=self.retries,
+            retry_on=(requests.exceptions.RequestException,),
+            on_retry=on_retry,
+        )
+
+    def _fetch_once(self, coord, radii):
+        response = self.submit(coord, radii=radii)
+        csv_url = find_csv_link(response.text, response.url)
+        if not csv_url:
+            print(f"No CSV link found on results page for {coord}")
+            return None
+        return self.download(csv_url, coord)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,201 @@
+"""
+Rate limiting and retry helpers shared by the network-bound fetchers.
+
+`TokenBucket` caps the request rate for one host, `HostRateLimiter` keeps one
+bucket per host so concurrent workers share a budget, `AdaptiveRateLimiter`
+slows a shared bucket down when the server reports throttling, and `backoff_delay` /
+`retry_with_backoff` implement exponential backoff with full jitter so retries
+from many workers do not hit a server in lock-step.
+"""
+
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill continuously at `rate` per second up to `capacity`; each
+    request takes one token and blocks until one is available.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate (float): Tokens added per second (requests per second)
+            capacity (float): Maximum burst size; defaults to max(1, rate)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate, drain=False):
+        """
+        Change the refill rate.
+
+        Args:
+            rate (float): New tokens per second
+            drain (bool): Drop the tokens already in the bucket so no burst follows
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+            if drain:
+                self._tokens = 0.0
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available without waiting. Returns True on success."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """
+        Block until `tokens` are available and take them.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class HostRateLimiter:
+    """One token bucket per host, created on first use."""
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate (float): Requests per second allowed for each host
+            capacity (float): Burst size for each host's bucket
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url):
+        """Return the bucket for the host of `url` (a bare host name also works)."""
+        host = urlparse(url).netloc or url
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.capacity)
+            return self._buckets[host]
+
+    def acquire(self, url):
+        """Wait for a request slot on the host of `url`. Returns seconds waited."""
+        return self.bucket(url).acquire()
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket that adapts to server throttling (additive increase, multiplicative decrease).
+
+    Each `throttled()` call divides the rate by `decrease` (down to `min_rate`)
+    and drains the bucket. Each `succeeded()` call adds `max_rate / recovery_steps`
+    back, up to the configured `max_rate`.
+    """
+
+    def __init__(self, rate, min_rate=None, decrease=2.0, recovery_steps=20, capacity=None):
+        """
+        Args:
+            rate (float): Target (and maximum) requests per second
+            min_rate (float): Lowest rate backed off to; defaults to rate / 16
+            decrease (float): Factor the rate is divided by on throttling
+            recovery_steps (int): Successful requests needed to climb from zero back to `rate`
+            capacity (float): Burst size of the bucket
+        """
+        self.max_rate = float(rate)
+        self.min_rate = float(min_rate) if min_rate else self.max_rate / 16
+        self.decrease = decrease
+        self.step = self.max_rate / recovery_steps
+        self.throttle_count = 0
+        self.bucket = TokenBucket(rate, capacity)
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def acquire(self):
+        """Wait for a request slot. Returns seconds waited."""
+        return self.bucket.acquire()
+
+    def throttled(self):
+        """Record a throttling response and slow down."""
+        with self._lock:
+            self.throttle_count += 1
+            self.bucket.set_rate(max(self.min_rate, self.bucket.rate / self.decrease), drain=True)
+
+    def succeeded(self):
+        """Record a successful response and speed back up towards the target rate."""
+        with self._lock:
+            if self.bucket.rate < self.max_rate:
+                self.bucket.set_rate(min(self.max_rate, self.bucket.rate + self.step))
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """
+    Exponential backoff with full jitter.
+
+    Args:
+        attempt (int): Zero-based retry attempt
+        base (float): Delay scale in seconds
+        cap (float): Upper bound for the delay
+
+    Returns:
+        float: Seconds to sleep, uniformly drawn from [0, min(cap, base * 2**attempt)]
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_with_backoff(func, retries=3, base=1.0, cap=60.0, retry_on=(Exception,), on_retry=None):
+    """
+    Call `func()` and retry it with jittered exponential backoff.
+
+    Args:
+        func (callable): Zero-argument callable
+        retries (int): Retries after the first attempt
+        base (float): Backoff scale in seconds
+        cap (float): Maximum delay between attempts
+        retry_on (tuple): Exception types that trigger a retry
+        on_retry (callable): Called as on_retry(attempt, error, delay) before sleeping
+
+    Returns:
+        The return value of `func()`; the last error is re-raised once retries run out.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except retry_on as e:
+            if attempt >= retries:
+                raise
+            delay = backoff_delay(attempt, base=base, cap=cap)
+            if on_retry:
+                on_retry(attempt, e, delay)
+            time.sleep(delay)
@@ -5,9 +5,10 @@ Handles web server, routes, and data processing for the dashboard.
 
 import os
 import pandas as pd
+import numpy as np
 import threading
 import webbrowser
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 from rich.console import Console
 import json
 import sys
@@ -16,6 +17,12 @@ from pathlib import Path
 import plotly.utils
 import plotly.graph_objects as go
 import requests  # Add this import for making API requests to OpenAI
+from modules.datastore.master_cache import master_cache, get_master_data
+from modules.analytics.scenarios import ScenarioEngine, parse_weights, weight_grid, random_weights, DEFAULT_WEIGHTS, MAX_TOP_K
+from modules.analytics.market_stats import get_market_stats
+from modules.analytics.viz_payloads import data_version, get_visualization_payload
+from modules.webui.formatting import format_value
+from modules.webui.listings_index import ListingsIndex, RANGE_FIELDS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 # Load environment variables from .env file if available
 try:
@@ -50,167 +57,99 @@ sys.modules["simple_viz"] = simple_viz
 spec_simple.loader.exec_module(simple_viz)
 
 def load_data():
-    """Load data from master.csv for the dashboard."""
-    try:
-        master_path = os.path.join("database", "master.csv")
-        if not os.path.exists(master_path):
-            console.print(f"[red]Error: Master CSV file not found at {master_path}[/red]")
-            return None
-        
-        console.print(f"[green]Loading data from {master_path}...[/green]")
-        df = pd.read_csv(master_path)
-        console.print(f"[green]Successfully loaded data: {len(df)} rows[/green]")
-        return df
-    except Exception as e:
-        console.print(f"[red]Error loading data: {str(e)}[/red]")
-        return None
+    """Load data from master.csv for the dashboard (served from the shared cache)."""
+    return get_master_data()
 
 @app.route('/')
 def index():
     """Main dashboard page."""
     return render_template('dashboard.html')
 
+# Listings index for the current master data, as (store signature, index)
+_listings_index = (None, None)
+_listings_lock = threading.Lock()
+
+def get_listings_index():
+    """Return the listings index for the current master data, rebuilding it when the data changes."""
+    global _listings_index
+    signature = master_cache.store.signature()
+    with _listings_lock:
+        if _listings_index[0] != signature or _listings_index[1] is None:
+            df = load_data()
+            if df is None:
+                return None
+            index = ListingsIndex(df)
+            if index.missing_columns:
+                console.print(f"[yellow]Warning: Missing columns in DataFrame: {index.missing_columns}[/yellow]")
+            _listings_index = (signature, index)
+        return _listings_index[1]
+
+def _float_arg(name):
+    """Read an optional float query parameter (ValueError if it is not a number)."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
 @app.route('/api/listings')
 def get_listings():
-    """API endpoint to get listings data."""
+    """
+    API endpoint to get one page of listings.
+    
+    Query parameters:
+    - filter: all, priced or nonpriced
+    - page, page_size: page to return (from 1) and listings per page (at most 1000)
+    - sort, order: sort key (score, market_score, price, acres, price_per_acre, demand,
+      housing_gap, affordability, convenience, stock) and asc/desc
+    - q: text matched against the stock number, address and location columns
+    - min_<key>, max_<key>: numeric range filters for the sort keys above
+    """
     try:
-        df = load_data()
+        index = get_listings_index()
         
-        if df is None:
+        if index is None:
             return jsonify({"error": "Failed to load data"}), 500
         
-        # Get filter parameter (all, priced, nonpriced)
+        # Read the paging, sorting and filter parameters
         filter_type = request.args.get('filter', 'all')
-        console.print(f"[blue]Filtering listings by: {filter_type}[/blue]")
-        
-        # Clone DataFrame to avoid modifying the original
-        filtered_df = df.copy()
-        
-        # Apply filters
-        if filter_type == 'priced':
-            if 'Price Per Acre' not in filtered_df.columns:
-                console.print("[yellow]Warning: 'Price Per Acre' column not found in DataFrame[/yellow]")
-                return jsonify({"error": "Price Per Acre column not found"}), 500
-            filtered_df = filtered_df[filtered_df['Price Per Acre'].notna()]
-            console.print(f"[blue]Found {len(filtered_df)} priced listings[/blue]")
-        elif filter_type == 'nonpriced':
-            if 'Price Per Acre' not in filtered_df.columns:
-                console.print("[yellow]Warning: 'Price Per Acre' column not found in DataFrame[/yellow]")
-                return jsonify({"error": "Price Per Acre column not found"}), 500
-            filtered_df = filtered_df[filtered_df['Price Per Acre'].isna()]
-            console.print(f"[blue]Found {len(filtered_df)} non-priced listings[/blue]")
-        else:
-            console.print(f"[blue]Showing all {len(filtered_df)} listings[/blue]")
-        
-        # Ensure all required columns exist
-        required_columns = [
-            'StockNumber', 
-            'For Sale Price', 
-            'Land Area (AC)',
-            'Price Per Acre', 
-            'Demand for Attainable Rent', 
-            'Housing Gap', 
-            'Home Affordability Gap', 
-            'Weighted Demand and Convenience',
-            'Composite Score'
-        ]
-        
-        # Check and log missing columns
-        missing_columns = [col for col in required_columns if col not in filtered_df.columns]
-        if missing_columns:
-            console.print(f"[yellow]Warning: Missing columns in DataFrame: {missing_columns}[/yellow]")
-            console.print(f"[blue]Available columns: {list(filtered_df.columns)}[/blue]")
-            
-        # Create a dictionary to map actual column names to display names
-        display_names = {
-            'For Sale Price': 'Sale Price',
-            'Land Area (AC)': 'Acres',
-            'Price Per Acre': 'Price/Acre',
-            'Demand for Attainable Rent': 'Demand',
-            'Housing Gap': 'Housing Gap',
-            'Home Affordability Gap': 'Affordability',
-            'Weighted Demand and Convenience': 'Convenience',
-            'Composite Score': 'Score'
-        }
-        
-        # For missing columns, add placeholders
-        for col in required_columns:
-            if col not in filtered_df.columns:
-                filtered_df[col] = None
-                console.print(f"[yellow]Added placeholder for missing column: {col}[/yellow]")
-        
-        # Sort by Composite Score (descending)
-        if 'Composite Score' in filtered_df.columns:
-            filtered_df = filtered_df.sort_values(by='Composite Score', ascending=False)
-            console.print("[blue]Sorted listings by Composite Score (descending)[/blue]")
+        try:
+            page = max(1, request.args.get('page', 1, type=int) or 1)
+            page_size = request.args.get('page_size', DEFAULT_PAGE_SIZE, type=int) or DEFAULT_PAGE_SIZE
+            page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+            sort = request.args.get('sort', 'score')
+            order = request.args.get('order', 'desc')
+            ranges = {}
+            for field in RANGE_FIELDS:
+                low, high = _float_arg(f"min_{field}"), _float_arg(f"max_{field}")
+                if low is not None or high is not None:
+                    ranges[field] = (low, high)
+            positions, filter_total = index.query(
+                filter_type, request.args.get('q', '').strip(), ranges, sort, order
+            )
+        except KeyError as e:
+            console.print(f"[yellow]Warning: {e.args[0]}[/yellow]")
+            return jsonify({"error": e.args[0]}), 500
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Select and rename columns for the response
-        columns_to_show = {col: display_names.get(col, col) for col in required_columns if col in filtered_df.columns}
-        result_df = filtered_df[list(columns_to_show.keys())].copy()
+        total = len(positions)
+        pages = max(1, -(-total // page_size))
+        page = min(page, pages)
         
-        # Format numeric values
-        try:
-            # Helper function to safely format numeric values
-            def safe_format_numeric(value, format_type='number', precision=2):
-                if pd.isna(value):
-                    return "N/A"
-                try:
-                    # Try to convert to numeric
-                    num_value = pd.to_numeric(value, errors='coerce')
-                    if pd.isna(num_value):  # If conversion failed
-                        return str(value)
-                    
-                    # Format based on type
-                    if format_type == 'currency':
-                        if num_value == 0:
-                            return "N/A"
-                        return f"${num_value:,.0f}"
-                    elif format_type == 'percent':
-                        return f"{num_value:.2%}"
-                    else:  # regular number
-                        if num_value == 0:
-                            return "0.00"
-                        format_str = f"{{:,.{precision}f}}"
-                        return format_str.format(num_value)
-                except:
-                    # Return as string if anything fails
-                    return str(value) if value is not None else "N/A"
-            
-            # Format currency fields
-            if 'For Sale Price' in result_df.columns:
-                result_df['For Sale Price'] = result_df['For Sale Price'].apply(
-                    lambda x: safe_format_numeric(x, 'currency')
-                )
-                
-            if 'Price Per Acre' in result_df.columns:
-                result_df['Price Per Acre'] = result_df['Price Per Acre'].apply(
-                    lambda x: safe_format_numeric(x, 'currency')
-                )
-            
-            # Format Composite Score (special handling for 0-1 range)
-            if 'Composite Score' in result_df.columns:
-                result_df['Composite Score'] = result_df['Composite Score'].apply(
-                    lambda x: safe_format_numeric(x, precision=2)
-                )
-            
-            # Format other numeric columns
-            for col in result_df.columns:
-                if col not in ['For Sale Price', 'Price Per Acre', 'Composite Score', 'StockNumber']:
-                    result_df[col] = result_df[col].apply(
-                        lambda x: safe_format_numeric(x)
-                    )
-            
-            # Rename columns for display
-            result_df = result_df.rename(columns=columns_to_show)
-            
-            # Convert to dictionary for JSON response
-            results = result_df.to_dict(orient='records')
-            console.print(f"[green]Successfully prepared {len(results)} listings for display[/green]")
-            
-            return jsonify({"listings": results})
-        except Exception as e:
-            console.print(f"[red]Error formatting data: {str(e)}[/red]")
-            return jsonify({"error": f"Error formatting data: {str(e)}"}), 500
+        return jsonify({
+            "listings": index.page(positions, page, page_size),
+            "page": page,
+            "page_size": page_size,
+            "pages": pages,
+            "total": total,
+            "filter_total": filter_total,
+            "sort": sort,
+            "order": order,
+            "charts": index.charts(positions),
+        })
             
     except Exception as e:
         console.print(f"[red]Error processing listings: {str(e)}[/red]")
@@ -244,32 +183,6 @@ def get_property_details(stock_number):
         # Convert to dictionary with proper formatting
         result = {}
         
-        # Helper function to safely format numeric values (reusing from get_listings)
-        def safe_format_numeric(value, format_type='number', precision=2):
-            if pd.isna(value):
-                return "N/A"
-            try:
-                # Try to convert to numeric
-                num_value = pd.to_numeric(value, errors='coerce')
-                if pd.isna(num_value):  # If conversion failed
-                    return str(value)
-                
-                # Format based on type
-                if format_type == 'currency':
-                    if num_value == 0:
-                        return "N/A"
-                    return f"${num_value:,.0f}"
-                elif format_type == 'percent':
-                    return f"{num_value:.2%}"
-                else:  # regular number
-                    if num_value == 0:
-                        return "0.00"
-                    format_str = f"{{:,.{precision}f}}"
-                    return format_str.format(num_value)
-            except:
-                # Return as string if anything fails
-                return str(value) if value is not None else "N/A"
-                
         # Organize data into categories for better display
         categories = {
             "Property Information": [
@@ -363,13 +276,13 @@ def get_property_details(stock_number):
                     
                     # Format value if needed
                     if field in ["For Sale Price", "Last Sale Price"]:
-                        value = safe_format_numeric(value, format_type='currency')
+                        value = format_value(value, format_type='currency')
                     elif "Percent" in field or "%" in field:
-                        value = safe_format_numeric(value, format_type='percent')
+                        value = format_value(value, format_type='percent')
                     else:
                         # Use specific precision settings for certain fields
                         precision = precision_settings.get(field, 2)
-                        value = safe_format_numeric(property_row[field], precision=precision)
+                        value = format_value(property_row[field], precision=precision)
                     
                     result["categories"][category].append({
                         "field": field,
@@ -409,9 +322,9 @@ def get_property_details(stock_number):
         summary = {
             "stockNumber": property_row.get("StockNumber", ""),
             "location": f"{property_row.get('City', '')}, {property_row.get('State', '')}",
-            "price": safe_format_numeric(property_row.get("For Sale Price"), format_type='currency'),
-            "acres": safe_format_numeric(property_row.get("Land Area (AC)")),
-            "score": safe_format_numeric(property_row.get("Composite Score")),
+            "price": format_value(property_row.get("For Sale Price"), format_type='currency'),
+            "acres": format_value(property_row.get("Land Area (AC)")),
+            "score": format_value(property_row.get("Composite Score")),
             "company": str(property_row.get("Sale Company Name", "N/A")),
             "phone": str(property_row.get("Sale Company Phone", "N/A"))
         }
@@ -431,6 +344,90 @@ def get_property_details(stock_number):
         console.print(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/cache/stats')
+def cache_stats():
+    """API endpoint reporting hit/miss counters for the master data cache."""
+    return jsonify(master_cache.stats())
+
+# Scenario engine for the current master data, as (store signature, engine)
+_scenario_engine = (None, None)
+_scenario_lock = threading.Lock()
+
+def get_scenario_engine():
+    """Return a scenario engine for the current master data, rebuilding it when the data changes."""
+    global _scenario_engine
+    signature = master_cache.store.signature()
+    with _scenario_lock:
+        if _scenario_engine[0] != signature or _scenario_engine[1] is None:
+            df = load_data()
+            if df is None:
+                return None
+            _scenario_engine = (signature, ScenarioEngine(df))
+        return _scenario_engine[1]
+
+@app.route('/api/scenarios', methods=['GET', 'POST'])
+def score_scenarios():
+    """
+    Score Composite Score weight scenarios.
+    
+    Accepts JSON (POST) or query parameters (GET):
+    - weights: list of 4-value weight vectors (GET: repeated "0.2,0.2,0.2,0.4")
+    - grid: add every weight vector with this step (e.g. 0.1)
+    - random: add this many random weight vectors (with optional seed)
+    - top_k: listings kept per scenario (default 10, at most 1000)
+    
+    The grid size, random count and top_k are checked before any scenario is
+    built; more than 20,000 scenarios in total is rejected with a 400.
+    """
+    try:
+        if request.method == 'POST':
+            params = request.get_json(silent=True) or {}
+            weights = params.get('weights', [])
+        else:
+            params = request.args
+            weights = [parse_weights(value) for value in request.args.getlist('weights')]
+        top_k = int(params.get('top_k', 10))
+        if not 0 <= top_k <= MAX_TOP_K:
+            return jsonify({"error": f"top_k must be between 0 and {MAX_TOP_K}"}), 400
+        
+        scenarios = [ScenarioEngine.prepare_weights(weights, normalize=False) if len(weights)
+                     else np.empty((0, len(DEFAULT_WEIGHTS)), dtype=np.float32)]
+        if params.get('grid'):
+            scenarios.append(weight_grid(float(params.get('grid'))))
+        if params.get('random'):
+            seed = params.get('seed')
+            scenarios.append(random_weights(int(params.get('random')), int(seed) if seed is not None else None))
+        weights = np.concatenate(scenarios)
+        if not len(weights):
+            weights = np.asarray([DEFAULT_WEIGHTS], dtype=np.float32)
+        
+        engine = get_scenario_engine()
+        if engine is None:
+            return jsonify({"error": "Failed to load data"}), 500
+        return jsonify(engine.run(weights, k=top_k))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        console.print(f"[red]Error scoring scenarios: {str(e)}[/red]")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/market-stats')
+def market_stats():
+    """
+    Per-market and overall statistics of the metric columns, from the last analytics run.
+    
+    Query parameters:
+    - column: only return the statistics of this column
+    """
+    stats = get_market_stats(master_cache.store)
+    if stats is None:
+        return jsonify({"error": "No statistics stored; run the analytics report first"}), 404
+    return jsonify({
+        "computed_at": stats.computed_at,
+        "markets": stats.markets(),
+        "stats": stats.to_records(request.args.get('column')),
+    })
+
 @app.route('/property/<stock_number>')
 def property_detail(stock_number):
     """Property detail page."""
@@ -447,39 +444,67 @@ def opportunity_dashboard():
 def opportunity_visualizations():
     """
     Retrieve all opportunity visualizations.
+    
+    The figures are rendered once per version of the master data and served
+    as stored JSON, with the data version as the ETag (304 when unchanged).
     """
     try:
-        console.print("[blue]Retrieving opportunity visualizations...[/blue]")
-        visualizations = opportunity_viz.create_all_visualizations()
-        
-        # Check if visualizations dictionary is empty
-        if not visualizations:
+        version = data_version(master_cache.store)
+        if version is not None and version in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(version)
+            return response
+        
+        version, payload = get_visualization_payload(master_cache.store)
+        if payload is None:
             console.print("[yellow]Warning: No visualizations were created[/yellow]")
             return jsonify({"error": "No visualizations could be created"}), 500
         
-        # Convert Plotly figures to JSON
-        result = {}
-        for name, fig in visualizations.items():
-            if fig is not None:
-                try:
-                    console.print(f"[blue]Converting {name} visualization to JSON...[/blue]")
-                    result[name] = json.loads(fig.to_json())
-                    console.print(f"[green]Successfully converted {name} visualization[/green]")
-                except Exception as e:
-                    console.print(f"[red]Error converting {name} visualization to JSON: {str(e)}[/red]")
-                    import traceback
-                    traceback.print_exc()
-            else:
-                console.print(f"[yellow]Skipping {name} visualization as it is None[/yellow]")
-        
-        console.print(f"[green]Returning {len(result)} visualizations[/green]")
-        return jsonify(result)
+        response = Response(payload, mimetype='application/json')
+        response.set_etag(version)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     except Exception as e:
         console.print(f"[red]Error in opportunity_visualizations route: {str(e)}[/red]")
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/opportunity/competitive-matrix')
+def opportunity_competitive_matrix():
+    """
+    Competitive advantage matrix for the top properties by Composite Score.
+    
+    Query parameters:
+    - top_n: number of properties shown (default 15, at most 1000)
+    """
+    try:
+        top_n = request.args.get('top_n', opportunity_viz.DEFAULT_MATRIX_PROPERTIES, type=int)
+        if top_n is None or top_n < 1:
+            return jsonify({"error": "top_n must be a positive integer"}), 400
+        top_n = min(top_n, opportunity_viz.MAX_MATRIX_PROPERTIES)
+        
+        etag = f"{data_version(master_cache.store)}-{top_n}"
+        if etag in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        
+        df = opportunity_viz.load_master_data()
+        if df is None:
+            return jsonify({"error": "Failed to load property data"}), 500
+        fig = opportunity_viz.create_competitive_advantage_matrix(df, top_n)
+        if fig is None:
+            return jsonify({"error": "Failed to create competitive advantage matrix"}), 500
+        
+        response = Response(fig.to_json(), mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        console.print(f"[red]Error in opportunity_competitive_matrix route: {str(e)}[/red]")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/opportunity/properties')
 def get_opportunity_properties():
     """API endpoint to get list of properties for the radar chart selector."""
@@ -526,7 +551,7 @@ def opportunity_radar_chart(property_id):
             return jsonify({"error": f"Property ID {property_id} not found"}), 404
         
         # Generate radar chart
-        fig = opportunity_viz.create_radar_chart(df, property_id)
+        fig = opportunity_viz.create_radar_chart(df, property_id, get_market_stats(master_cache.store))
         if fig is None:
             console.print(f"[red]Failed to create radar chart for property ID {property_id}[/red]")
             return jsonify({"error": "Failed to create radar chart"}), 500
@@ -0,0 +1,144 @@
+"""
+Display formatting for the dashboard API.
+
+`get_listings` and `get_property_details` each defined their own
+`safe_format_numeric` helper. The listings table applied it to every cell,
+with a `pd.to_numeric` call per value. `format_column` formats a whole column
+at once instead: NumPy masks pick out missing, zero and non-numeric values,
+and only the remaining numbers are formatted. NumPy has no thousands
+separator format, so those numbers go through `format()`. Its output is
+identical to `format_value`, the single-value version used by the property
+details.
+
+The formatted listings table is built once per version of the master data
+(see `ListingsIndex`), so serving a page of listings is a row lookup.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Text shown for missing values
+NA_TEXT = "N/A"
+
+# Columns of the listings table, in display order
+LISTING_COLUMNS = [
+    'StockNumber',
+    'For Sale Price',
+    'Land Area (AC)',
+    'Price Per Acre',
+    'Demand for Attainable Rent',
+    'Housing Gap',
+    'Home Affordability Gap',
+    'Weighted Demand and Convenience',
+    'Composite Score',
+    'Market Composite Score'
+]
+
+# Names the listings table uses for the columns
+LISTING_DISPLAY_NAMES = {
+    'For Sale Price': 'Sale Price',
+    'Land Area (AC)': 'Acres',
+    'Price Per Acre': 'Price/Acre',
+    'Demand for Attainable Rent': 'Demand',
+    'Housing Gap': 'Housing Gap',
+    'Home Affordability Gap': 'Affordability',
+    'Weighted Demand and Convenience': 'Convenience',
+    'Composite Score': 'Score',
+    'Market Composite Score': 'Market Score'
+}
+
+# Listing columns shown as whole dollars
+LISTING_CURRENCY_COLUMNS = ('For Sale Price', 'Price Per Acre')
+
+
+def format_value(value, format_type='number', precision=2):
+    """
+    Format one value for display.
+
+    Args:
+        value: Value to format (numbers and numeric strings are formatted, other text is kept)
+        format_type (str): "currency" (whole dollars, 0 shown as N/A), "percent" or "number"
+        precision (int): Decimal places for numbers (0 is always shown as "0.00")
+
+    Returns:
+        str: The formatted value
+    """
+    if pd.isna(value):
+        return NA_TEXT
+    try:
+        num_value = pd.to_numeric(value, errors='coerce')
+        if pd.isna(num_value):
+            return str(value)
+
+        if format_type == 'currency':
+            if num_value == 0:
+                return NA_TEXT
+            return f"${num_value:,.0f}"
+        elif format_type == 'percent':
+            return f"{num_value:.2%}"
+        else:
+            if num_value == 0:
+                return "0.00"
+            return f"{num_value:,.{precision}f}"
+    except Exception:
+        return str(value) if value is not None else NA_TEXT
+
+
+def format_column(values, format_type='number', precision=2):
+    """
+    Format a whole column the way `format_value` formats each value.
+
+    Args:
+        values (Series): Values to format
+        format_type (str): "currency", "percent" or "number"
+        precision (int): Decimal places for numbers
+
+    Returns:
+        ndarray: Formatted strings (object dtype), aligned with `values`
+    """
+    values = pd.Series(values)
+    numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+    missing = values.isna().to_numpy()
+    text = ~missing & np.isnan(numbers)
+
+    result = np.empty(len(values), dtype=object)
+    result[missing] = NA_TEXT
+    result[text] = values[text].astype(str).to_numpy()
+
+    numeric = ~missing & ~text
+    zero = numeric & (numbers == 0)
+    if format_type == 'currency':
+        result[zero] = NA_TEXT
+        spec, prefix = ",.0f", "$"
+    elif format_type == 'percent':
+        zero[:] = False
+        spec, prefix = ".2%", ""
+    else:
+        result[zero] = "0.00"
+        spec, prefix = f",.{precision}f", ""
+
+    rest = numeric & ~zero
+    result[rest] = [prefix + format(number, spec) for number in numbers[rest].tolist()]
+    return result
+
+
+def format_listing_table(df):
+    """
+    Format the listings table for every row of the master data.
+
+    Missing columns are shown as N/A. StockNumber is kept as is.
+
+    Returns:
+        DataFrame: LISTING_COLUMNS under their display names, indexed like `df`
+    """
+    table = {}
+    for col in LISTING_COLUMNS:
+        values = df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if col == 'StockNumber':
+            formatted = values.to_numpy(dtype=object)
+        elif col in LISTING_CURRENCY_COLUMNS:
+            formatted = format_column(values, 'currency')
+        else:
+            formatted = format_column(values, precision=2)
+        table[LISTING_DISPLAY_NAMES.get(col, col)] = formatted
+    return pd.DataFrame(table, index=df.index)
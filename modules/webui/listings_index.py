@@ -0,0 +1,173 @@
+"""
+In-memory index of the master listings behind the dashboard table.
+
+/api/listings used to format and return every listing, and the browser then
+sorted, searched and rendered the whole set. The index keeps the sortable
+columns as numpy arrays, with every sort order computed once per version of
+the master data. A request then only builds a filter mask, keeps the masked
+positions of one pre-sorted order and looks up one page of the listings
+table, which is formatted once when the index is built.
+"""
+
+import numpy as np
+import pandas as pd
+
+from modules.webui.formatting import LISTING_COLUMNS, format_listing_table
+
+# Sort keys accepted by /api/listings and the columns they sort by
+SORT_FIELDS = {
+    'stock': 'StockNumber',
+    'price': 'For Sale Price',
+    'acres': 'Land Area (AC)',
+    'price_per_acre': 'Price Per Acre',
+    'demand': 'Demand for Attainable Rent',
+    'housing_gap': 'Housing Gap',
+    'affordability': 'Home Affordability Gap',
+    'convenience': 'Weighted Demand and Convenience',
+    'score': 'Composite Score',
+    'market_score': 'Market Composite Score',
+}
+
+# Sort keys that also take min_<key> / max_<key> range filters
+RANGE_FIELDS = tuple(field for field in SORT_FIELDS if field != 'stock')
+
+# Text columns matched by the search term
+SEARCH_COLUMNS = [
+    'StockNumber', 'Property Address', 'City', 'County', 'State', 'Market', 'Sub-Market', 'Nearest Town'
+]
+
+# Listings per page by default, and at most
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+# Bin edges of the Composite Score histogram (0.0-0.1, ..., 0.9-1.0)
+SCORE_BINS = np.linspace(0, 1, 11)
+
+# Smallest bin width of the Price per Acre histogram
+PRICE_BIN_STEP = 10000
+
+
+def _numeric(frame, column):
+    """Return a column as a float array (all NaN if the column is missing)."""
+    if column not in frame.columns:
+        return np.full(len(frame), np.nan)
+    return pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=float)
+
+
+class ListingsIndex:
+    """Pre-sorted positions and filter columns for one version of the master data."""
+
+    def __init__(self, df):
+        """
+        Args:
+            df (DataFrame): Master data (kept by reference; not modified)
+        """
+        self.frame = df
+        self.formatted = format_listing_table(df)
+        self.missing_columns = [col for col in LISTING_COLUMNS if col not in df.columns]
+        self.values = {field: _numeric(df, column) for field, column in SORT_FIELDS.items() if field != 'stock'}
+
+        stock = df['StockNumber'] if 'StockNumber' in df.columns else pd.Series('', index=df.index)
+        stock = stock.astype(object).where(stock.notna(), '').astype(str).to_numpy()
+
+        # Ascending and descending orders, with missing values last in both
+        self.orders = {}
+        for field, values in self.values.items():
+            self.orders[(field, 'asc')] = np.argsort(values, kind='stable')
+            self.orders[(field, 'desc')] = np.argsort(-values, kind='stable')
+        stock_asc = np.argsort(stock, kind='stable')
+        missing = stock[stock_asc] == ''
+        self.orders[('stock', 'asc')] = np.concatenate([stock_asc[~missing], stock_asc[missing]])
+        self.orders[('stock', 'desc')] = np.concatenate([stock_asc[~missing][::-1], stock_asc[missing]])
+
+        search_columns = [col for col in SEARCH_COLUMNS if col in df.columns]
+        text = pd.Series('', index=df.index)
+        for col in search_columns:
+            text = text + ' ' + df[col].astype(object).where(df[col].notna(), '').astype(str)
+        self.search_text = text.str.lower().reset_index(drop=True)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def query(self, filter_type='all', q=None, ranges=None, sort='score', order='desc'):
+        """
+        Positions of the matching listings, in sort order.
+
+        Args:
+            filter_type (str): "all", "priced" or "nonpriced" (by Price Per Acre)
+            q (str): Case-insensitive text matched against SEARCH_COLUMNS
+            ranges (dict): field -> (min, max); either bound may be None
+            sort (str): Key of SORT_FIELDS
+            order (str): "asc" or "desc"
+
+        Returns:
+            tuple: (positions array, number of listings matching filter_type alone)
+
+        Raises:
+            KeyError: If filtering by price and the data has no Price Per Acre column
+            ValueError: On an unknown sort key, order or range field
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Unknown sort field: {sort}")
+        if order not in ('asc', 'desc'):
+            raise ValueError("order must be 'asc' or 'desc'")
+
+        mask = np.ones(len(self), dtype=bool)
+        if filter_type in ('priced', 'nonpriced'):
+            if SORT_FIELDS['price_per_acre'] not in self.frame.columns:
+                raise KeyError("Price Per Acre column not found")
+            priced = ~np.isnan(self.values['price_per_acre'])
+            mask &= priced if filter_type == 'priced' else ~priced
+        filter_total = int(mask.sum())
+
+        if q:
+            mask &= self.search_text.str.contains(q.lower(), regex=False).to_numpy()
+
+        for field, (low, high) in (ranges or {}).items():
+            if field not in RANGE_FIELDS:
+                raise ValueError(f"Unknown range filter: {field}")
+            values = self.values[field]
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+
+        positions = self.orders[(sort, order)]
+        return positions[mask[positions]], filter_total
+
+    def page(self, positions, page=1, page_size=DEFAULT_PAGE_SIZE):
+        """Return the formatted listings of one page of `positions` (pages start at 1) as dicts."""
+        start = (page - 1) * page_size
+        return self.formatted.iloc[positions[start:start + page_size]].to_dict(orient='records')
+
+    def charts(self, positions):
+        """
+        Composite Score and Price per Acre histograms of the matching listings.
+
+        Returns:
+            dict: "score" and "price", each with "labels" and "counts"
+        """
+        scores = self.values['score'][positions]
+        counts, _ = np.histogram(scores[np.isfinite(scores)], bins=SCORE_BINS)
+        score = {
+            "labels": [f"{low:.1f}-{high:.1f}" for low, high in zip(SCORE_BINS[:-1], SCORE_BINS[1:])],
+            "counts": counts.tolist(),
+        }
+
+        prices = self.values['price_per_acre'][positions]
+        prices = prices[np.isfinite(prices)]
+        price = {"labels": [], "counts": []}
+        if len(prices):
+            # About ten bins, each a multiple of PRICE_BIN_STEP wide
+            low = np.floor(prices.min() / PRICE_BIN_STEP) * PRICE_BIN_STEP
+            high = np.ceil(prices.max() / PRICE_BIN_STEP) * PRICE_BIN_STEP
+            step = max(PRICE_BIN_STEP, np.ceil((high - low) / 10 / PRICE_BIN_STEP) * PRICE_BIN_STEP)
+            edges = np.arange(low, high + step, step)
+            if len(edges) <= 1:
+                edges = np.array([low, low + step])
+            counts, _ = np.histogram(prices, bins=edges)
+            price = {
+                "labels": [f"${a / 1000:.0f}k-${b / 1000:.0f}k" for a, b in zip(edges[:-1], edges[1:])],
+                "counts": counts.tolist(),
+            }
+        return {"score": score, "price": price}
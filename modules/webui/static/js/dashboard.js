@@ -4,8 +4,14 @@
 let currentFilter = 'all';
 let scoreChart = null;
 let priceChart = null;
-let allListings = [];
+let allListings = []; // Listings on the current page
 let sortBy = 'score-desc'; // Default sort order
+let searchTerm = '';
+let currentPage = 1;
+const pageSize = 50;
+const exportPageSize = 1000; // Largest page the API returns
+let searchTimer = null;
+let requestSeq = 0; // Ignore responses to superseded requests
 
 // Initialize dashboard
 document.addEventListener('DOMContentLoaded', function() {
@@ -37,7 +43,7 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     // Load initial data
-    loadListings('all');
+    loadListings();
 });
 
 // Set active filter
@@ -56,15 +62,34 @@ function setFilter(filter) {
     
     // Update current filter and load data
     currentFilter = filter;
-    loadListings(filter);
+    currentPage = 1;
+    loadListings();
 }
 
-// Load listings data from API
-function loadListings(filter) {
+// Build the /api/listings query for the current filter, search and sort
+function listingsQuery(page, size) {
+    const [sort, order] = sortBy.split('-');
+    const params = new URLSearchParams({
+        filter: currentFilter,
+        page: page,
+        page_size: size,
+        sort: sort,
+        order: order
+    });
+    if (searchTerm) {
+        params.set('q', searchTerm);
+    }
+    return `/api/listings?${params.toString()}`;
+}
+
+// Load one page of listings from the API
+function loadListings() {
+    const seq = ++requestSeq;
+    
     // Show loading message
     document.getElementById('listings-data').innerHTML = `
         <tr>
-            <td colspan="9" class="text-center">
+            <td colspan="10" class="text-center">
                 <div class="spinner-border text-accent my-5" role="status">
                     <span class="visually-hidden">Loading...</span>
                 </div>
@@ -74,150 +99,145 @@ function loadListings(filter) {
     `;
     
     // Fetch data from API
-    fetch(`/api/listings?filter=${filter}`)
+    fetch(listingsQuery(currentPage, pageSize))
         .then(response => response.json())
         .then(data => {
-            // Store all listings for charts and searching
+            // A newer request has been made since this one
+            if (seq !== requestSeq) return;
+            if (data.error) throw new Error(data.error);
+            
             allListings = data.listings;
+            currentPage = data.page;
             
-            // Update property count badge
-            updatePropertyCount(allListings.length);
+            // Update property counts
+            updatePropertyCount(data);
             
-            // Sort the listings
-            sortListings(allListings);
+            // Show empty state if no results
+            const noResults = data.total === 0;
+            document.getElementById('empty-state').classList.toggle('d-none', !noResults);
+            document.getElementById('listings-table').classList.toggle('d-none', noResults);
             
             // Display listings
             displayListings(allListings);
+            displayPagination(data);
             
-            // Update charts
-            updateCharts(allListings);
+            // Update charts (computed by the server over every matching listing)
+            updateCharts(data.charts);
         })
         .catch(error => {
+            if (seq !== requestSeq) return;
             console.error('Error fetching listings:', error);
             document.getElementById('listings-data').innerHTML = 
-                '<tr><td colspan="9" class="text-center text-danger">Error loading data. Please try again.</td></tr>';
+                '<tr><td colspan="10" class="text-center text-danger">Error loading data. Please try again.</td></tr>';
         });
 }
 
 // Update property count in header
-function updatePropertyCount(count) {
+function updatePropertyCount(data) {
     const countElement = document.getElementById('total-properties');
     if (countElement) {
-        countElement.textContent = count;
+        countElement.textContent = data.filter_total;
     }
     
     // Update results count
     const totalCountElement = document.getElementById('total-count');
     if (totalCountElement) {
-        totalCountElement.textContent = count;
+        totalCountElement.textContent = data.total;
     }
     
     const visibleCountElement = document.getElementById('visible-count');
     if (visibleCountElement) {
-        visibleCountElement.textContent = count;
+        const first = data.total === 0 ? 0 : (data.page - 1) * data.page_size + 1;
+        const last = (data.page - 1) * data.page_size + data.listings.length;
+        visibleCountElement.textContent = data.total === 0 ? '0' : `${first}-${last}`;
     }
 }
 
+// Display page links for the current result set
+function displayPagination(data) {
+    const pagination = document.getElementById('pagination');
+    if (!pagination) return;
+    
+    if (data.pages <= 1) {
+        pagination.innerHTML = '';
+        return;
+    }
+    
+    // First, last, and the pages around the current one
+    const pages = new Set([1, data.pages]);
+    for (let page = data.page - 2; page <= data.page + 2; page++) {
+        if (page >= 1 && page <= data.pages) pages.add(page);
+    }
+    const sorted = [...pages].sort((a, b) => a - b);
+    
+    const item = (label, page, disabled, active) => `
+        <li class="page-item${disabled ? ' disabled' : ''}${active ? ' active' : ''}">
+            <a class="page-link" href="#" data-page="${page}">${label}</a>
+        </li>`;
+    
+    let html = item('&laquo;', data.page - 1, data.page === 1, false);
+    sorted.forEach((page, i) => {
+        if (i > 0 && page - sorted[i - 1] > 1) {
+            html += '<li class="page-item disabled"><span class="page-link">&hellip;</span></li>';
+        }
+        html += item(page, page, false, page === data.page);
+    });
+    html += item('&raquo;', data.page + 1, data.page === data.pages, false);
+    pagination.innerHTML = html;
+    
+    pagination.querySelectorAll('a.page-link').forEach(link => {
+        link.addEventListener('click', e => {
+            e.preventDefault();
+            const page = parseInt(link.dataset.page, 10);
+            if (page >= 1 && page <= data.pages && page !== data.page) {
+                currentPage = page;
+                loadListings();
+            }
+        });
+    });
+}
+
 // Handle sorting
 function handleSort(e) {
     sortBy = e.target.value;
-    sortListings(allListings);
-    displayListings(allListings);
+    currentPage = 1;
+    loadListings();
 }
 
-// Sort listings based on current sort selection
-function sortListings(listings) {
-    // Skip if no listings
-    if (!listings || listings.length === 0) return;
-    
-    switch (sortBy) {
-        case 'score-desc':
-            listings.sort((a, b) => {
-                const scoreA = parseFloat(a.Score) || 0;
-                const scoreB = parseFloat(b.Score) || 0;
-                return scoreB - scoreA;
-            });
-            break;
-        case 'score-asc':
-            listings.sort((a, b) => {
-                const scoreA = parseFloat(a.Score) || 0;
-                const scoreB = parseFloat(b.Score) || 0;
-                return scoreA - scoreB;
-            });
-            break;
-        case 'price-desc':
-            listings.sort((a, b) => {
-                const priceA = parseNumericValue(a['Sale Price']) || 0;
-                const priceB = parseNumericValue(b['Sale Price']) || 0;
-                return priceB - priceA;
-            });
-            break;
-        case 'price-asc':
-            listings.sort((a, b) => {
-                const priceA = parseNumericValue(a['Sale Price']) || 0;
-                const priceB = parseNumericValue(b['Sale Price']) || 0;
-                return priceA - priceB;
-            });
-            break;
-    }
-}
-
-// Parse numeric value from formatted string (e.g. "$123,456")
-function parseNumericValue(value) {
-    if (typeof value !== 'string') return value;
-    return parseFloat(value.replace(/[^0-9.-]+/g, ''));
+// Handle search input (debounced so typing does not send a request per key)
+function handleSearch(e) {
+    const term = e.target.value.trim();
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => {
+        if (term === searchTerm) return;
+        searchTerm = term;
+        currentPage = 1;
+        loadListings();
+    }, 250);
 }
 
-// Handle search input
-function handleSearch(e) {
-    const searchTerm = e.target.value.toLowerCase().trim();
-    
-    // If search is empty, show all listings
-    if (!searchTerm) {
-        document.getElementById('empty-state').classList.add('d-none');
-        sortListings(allListings);
-        displayListings(allListings);
+// Export every matching listing (all pages) to CSV
+async function exportToCSV() {
+    const listings = [];
+    try {
+        for (let page = 1; ; page++) {
+            const response = await fetch(listingsQuery(page, exportPageSize));
+            const data = await response.json();
+            if (data.error) throw new Error(data.error);
+            listings.push(...data.listings);
+            if (page >= data.pages) break;
+        }
+    } catch (error) {
+        console.error('Error exporting listings:', error);
         return;
     }
     
-    // Filter listings based on search term
-    const filteredListings = allListings.filter(listing => {
-        return Object.values(listing).some(value => {
-            if (value === null || value === undefined) return false;
-            return String(value).toLowerCase().includes(searchTerm);
-        });
-    });
-    
-    // Sort the filtered listings
-    sortListings(filteredListings);
-    
-    // Show empty state if no results
-    if (filteredListings.length === 0) {
-        document.getElementById('empty-state').classList.remove('d-none');
-        document.getElementById('listings-table').classList.add('d-none');
-    } else {
-        document.getElementById('empty-state').classList.add('d-none');
-        document.getElementById('listings-table').classList.remove('d-none');
-    }
-    
-    // Update counts
-    const visibleCountElement = document.getElementById('visible-count');
-    if (visibleCountElement) {
-        visibleCountElement.textContent = filteredListings.length;
-    }
-    
-    // Display filtered listings
-    displayListings(filteredListings);
-}
-
-// Export data to CSV
-function exportToCSV() {
     // Skip if no listings
-    if (!allListings || allListings.length === 0) return;
+    if (listings.length === 0) return;
     
     // Create CSV content
-    const headers = Object.keys(allListings[0]).join(',');
-    const rows = allListings.map(listing => Object.values(listing).map(value => {
+    const headers = Object.keys(listings[0]).join(',');
+    const rows = listings.map(listing => Object.values(listing).map(value => {
         if (value === null || value === undefined) return '';
         return `"${String(value).replace(/"/g, '""')}"`;
     }).join(','));
@@ -244,7 +264,7 @@ function displayListings(listings) {
     
     // Check if we have listings
     if (!listings || listings.length === 0) {
-        tableBody.innerHTML = '<tr><td colspan="9" class="text-center">No listings found.</td></tr>';
+        tableBody.innerHTML = '<tr><td colspan="10" class="text-center">No listings found.</td></tr>';
         return;
     }
     
@@ -276,6 +296,7 @@ function displayListings(listings) {
                 <td class="number-cell">${formatNumber(listing.Affordability)}</td>
                 <td class="number-cell">${formatNumber(listing.Convenience)}</td>
                 <td class="number-cell score-cell">${listing.Score || 'N/A'}</td>
+                <td class="number-cell">${listing['Market Score'] || 'N/A'}</td>
             </tr>
         `;
     });
@@ -299,49 +320,10 @@ function displayListings(listings) {
     });
 }
 
-// Update charts with new data
-function updateCharts(listings) {
-    // Prepare data for score chart
-    const scoreData = prepareScoreChartData(listings);
-    updateScoreChart(scoreData);
-    
-    // Prepare data for price chart
-    const priceData = preparePriceChartData(listings);
-    updatePriceChart(priceData);
-}
-
-// Prepare data for score chart
-function prepareScoreChartData(listings) {
-    // Get all valid composite scores
-    const scores = listings.map(item => {
-        // Extract number from string if needed
-        if (typeof item.Score === 'string') {
-            return parseFloat(item.Score);
-        }
-        return item.Score;
-    }).filter(score => !isNaN(score) && score !== null);
-    
-    // Create bins for histogram (0.0-0.1, 0.1-0.2, etc.)
-    const bins = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0];
-    const labels = bins.slice(0, -1).map((bin, i) => `${bin.toFixed(1)}-${bins[i+1].toFixed(1)}`);
-    
-    // Count listings in each bin
-    const counts = Array(bins.length - 1).fill(0);
-    
-    scores.forEach(score => {
-        for (let i = 0; i < bins.length - 1; i++) {
-            if (score >= bins[i] && score < bins[i+1]) {
-                counts[i]++;
-                break;
-            }
-            // Handle the case where score is exactly 1.0
-            if (score === 1.0 && i === bins.length - 2) {
-                counts[i]++;
-            }
-        }
-    });
-    
-    return { labels, counts };
+// Update charts with the histograms returned by the API
+function updateCharts(charts) {
+    updateScoreChart(charts.score);
+    updatePriceChart(charts.price);
 }
 
 // Update score distribution chart
@@ -400,60 +382,6 @@ function updateScoreChart(data) {
     });
 }
 
-// Prepare data for price chart
-function preparePriceChartData(listings) {
-    // Extract prices and remove any non-numeric values
-    const prices = listings.map(item => {
-        if (typeof item['Price/Acre'] === 'string') {
-            // Remove $ and commas
-            return parseFloat(item['Price/Acre'].replace(/[$,]/g, ''));
-        }
-        return item['Price/Acre'];
-    }).filter(price => !isNaN(price) && price !== null);
-    
-    // Skip if no valid prices
-    if (prices.length === 0) {
-        return { labels: [], counts: [] };
-    }
-    
-    // Find min and max prices (rounded to nearest 10,000)
-    const minPrice = Math.floor(Math.min(...prices) / 10000) * 10000;
-    const maxPrice = Math.ceil(Math.max(...prices) / 10000) * 10000;
-    
-    // Create price ranges (bins)
-    const binSize = Math.max(10000, Math.ceil((maxPrice - minPrice) / 10 / 10000) * 10000);
-    const bins = [];
-    for (let i = minPrice; i <= maxPrice; i += binSize) {
-        bins.push(i);
-    }
-    if (bins.length <= 1) {
-        bins.push(maxPrice + binSize);
-    }
-    
-    // Create labels for each bin
-    const labels = bins.slice(0, -1).map((bin, i) => {
-        return `$${(bin/1000).toFixed(0)}k-$${(bins[i+1]/1000).toFixed(0)}k`;
-    });
-    
-    // Count listings in each bin
-    const counts = Array(bins.length - 1).fill(0);
-    
-    prices.forEach(price => {
-        for (let i = 0; i < bins.length - 1; i++) {
-            if (price >= bins[i] && price < bins[i+1]) {
-                counts[i]++;
-                break;
-            }
-            // Handle the case where price is exactly the max
-            if (price === bins[bins.length-1] && i === bins.length - 2) {
-                counts[i]++;
-            }
-        }
-    });
-    
-    return { labels, counts };
-}
-
 // Update price distribution chart
 function updatePriceChart(data) {
     const ctx = document.getElementById('price-chart').getContext('2d');
@@ -0,0 +1,42 @@
+"""
+Time the row-wise and vectorized analytics metrics on a synthetic frame.
+
+Usage: python tests/benchmark_metrics.py --rows 100000
+(equivalence is checked by tests/test_metrics.py)
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test_metrics import rowwise_reference, synthetic_frame, vectorized  # noqa: E402
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized analytics metrics.")
+    parser.add_argument("--rows", type=int, default=100000, help="Rows in the synthetic frame.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic frame.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    df = synthetic_frame(args.rows, args.seed)
+
+    start = time.perf_counter()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rowwise_reference(df)
+    rowwise_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized(df)
+    vectorized_seconds = time.perf_counter() - start
+
+    print(f"{args.rows:,} rows - row-wise apply: {rowwise_seconds:.2f}s, vectorized: {vectorized_seconds:.4f}s "
+          f"({rowwise_seconds / max(vectorized_seconds, 1e-9):,.0f}x faster)")
@@ -0,0 +1,186 @@
+"""
+Shared pytest fixtures.
+
+`caps_server` runs a local stand-in for the MCDC capsACS application: the
+form page (tests/fixtures/capsacs_form.html), the form handler that answers
+with a results page, and the report CSVs linked from it. Both the HTTP client
+and the browser scraper can be pointed at it with `--mcdc-url`.
+"""
+
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+# Make the repository importable when pytest is run from another directory
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+# Static pages served by the fake servers
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Paths of the fake capsACS application
+CAPS_FORM_PATH = "/applications/capsACS.html"
+CAPS_SUBMIT_PATH = "/cgi-bin/broker"
+CAPS_REPORT_PREFIX = "/tmp/capsACS_"
+
+
+def caps_report(latitude, radii):
+    """
+    Build a capsACS report CSV: one row per radius, formatted like MCDC's.
+
+    Counts carry thousands separators, incomes a dollar sign, and the rent of
+    the last radius is "N" (not available). Values depend on the latitude so
+    reports of different coordinates differ.
+    """
+    base = round(abs(float(latitude)) * 100)
+    lines = ["SiteName,Radius,TotPop,TotHHs,MedianHHInc,MedianGrossRent,AvgGrossRent"]
+    for i, radius in enumerate(radii):
+        rent = "N" if i == len(radii) - 1 else str(900 + i * 10)
+        lines.append(
+            f'"Site",{radius},"{base * 1000 * (i + 1):,}",{base * 400 * (i + 1)},'
+            f'"${50000 + i * 1000:,}",{rent},{950 + i * 10}.5'
+        )
+    return "\n".join(lines) + "\n"
+
+
+class FakeCapsServer:
+    """
+    Threaded HTTP server imitating capsACS.
+
+    Set `fail_form` / `fail_submit` / `fail_report` to the number of requests
+    that should get a 503 before the server answers normally. Every request is
+    recorded in `requests` as (method, path, status), and every form
+    submission's fields in `submissions`.
+    """
+
+    def __init__(self):
+        self.fail_form = 0
+        self.fail_submit = 0
+        self.fail_report = 0
+        self.requests = []
+        self.submissions = []
+        self._lock = threading.Lock()
+        with open(os.path.join(FIXTURES_DIR, "capsacs_form.html"), "rb") as f:
+            self.form_page = f.read()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def form_url(self):
+        return self.base_url + CAPS_FORM_PATH
+
+    def count(self, method, path_prefix):
+        """Number of requests with this method whose path starts with `path_prefix`."""
+        with self._lock:
+            return sum(1 for m, path, _ in self.requests if m == method and path.startswith(path_prefix))
+
+    def _take_failure(self, attribute):
+        with self._lock:
+            remaining = getattr(self, attribute)
+            if remaining > 0:
+                setattr(self, attribute, remaining - 1)
+                return True
+            return False
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body=b"", content_type="text/html"):
+                with server._lock:
+                    server.requests.append((self.command, urlparse(self.path).path, status))
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _submit(self, fields):
+                if server._take_failure("fail_submit"):
+                    return self._send(503, b"Service Unavailable")
+                fields = {name: values[-1] for name, values in fields.items()}
+                with server._lock:
+                    server.submissions.append(fields)
+                    number = len(server.submissions)
+                page = (
+                    "<html><body><h1>capsACS report</h1>"
+                    f'<a href="{CAPS_REPORT_PREFIX}{number}.html">Report</a> '
+                    f'<a href="{CAPS_REPORT_PREFIX}{number}.csv">Comma-delimited (csv) file</a>'
+                    "</body></html>"
+                )
+                self._send(200, page.encode())
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == CAPS_FORM_PATH:
+                    if server._take_failure("fail_form"):
+                        return self._send(503, b"Service Unavailable")
+                    return self._send(200, server.form_page)
+                if url.path == CAPS_SUBMIT_PATH:
+                    return self._submit(parse_qs(url.query, keep_blank_values=True))
+                if url.path.startswith(CAPS_REPORT_PREFIX) and url.path.endswith(".csv"):
+                    if server._take_failure("fail_report"):
+                        return self._send(503, b"Service Unavailable")
+                    number = url.path[len(CAPS_REPORT_PREFIX):-len(".csv")]
+                    with server._lock:
+                        fields = server.submissions[int(number) - 1] if number.isdigit() else None
+                    if fields is None:
+                        return self._send(404, b"Not Found")
+                    report = caps_report(fields.get("latitude") or 0, fields.get("radii", "").split())
+                    return self._send(200, report.encode(), "text/csv")
+                self._send(404, b"Not Found")
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode()
+                if url.path == CAPS_SUBMIT_PATH:
+                    return self._submit(parse_qs(body, keep_blank_values=True))
+                self._send(404, b"Not Found")
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def caps_server():
+    """A running fake capsACS server."""
+    server = FakeCapsServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    Run the test from an empty directory with a home of its own.
+
+    The pipeline reads and writes database/... relative to the working
+    directory, and the browser scraper saves files under ~/Downloads.
+    """
+    home = tmp_path / "home"
+    (home / "Downloads").mkdir(parents=True)
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "database").mkdir()
+    return tmp_path
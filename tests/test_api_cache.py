@@ -0,0 +1,85 @@
+"""
+Tests of the Google Maps API response cache.
+"""
+
+import sqlite3
+
+from modules.googledistance import api_cache
+from modules.googledistance.api_cache import ApiResponseCache
+
+# Endpoint the cached requests are made to
+URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+
+
+def params(i):
+    return {"location": f"{40 + i / 1000:.5f},-75.00000", "key": "secret"}
+
+
+def last_used(cache, i):
+    endpoint, key = cache.key(URL, params(i))
+    conn = sqlite3.connect(cache.db_path)
+    try:
+        return conn.execute(
+            "SELECT last_used FROM responses WHERE endpoint = ? AND params = ?", (endpoint, key)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_hits_are_written_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(api_cache, "TOUCH_FLUSH_ENTRIES", 3)
+    cache = ApiResponseCache(str(tmp_path / "cache.db"))
+    for i in range(3):
+        cache.put(URL, params(i), {"status": "OK", "results": [i]})
+    stored = [last_used(cache, i) for i in range(3)]
+
+    assert cache.get(URL, params(0)) == {"status": "OK", "results": [0]}
+    assert cache.get(URL, params(1))["results"] == [1]
+    assert [last_used(cache, i) for i in range(3)] == stored
+
+    # The third pending entry writes all of them
+    cache.get(URL, params(2))
+    touched = [last_used(cache, i) for i in range(3)]
+    assert all(after > before for after, before in zip(touched, stored))
+
+    # Pending hits are written on close
+    cache.get(URL, params(0))
+    cache.close()
+    assert last_used(cache, 0) > touched[0]
+    assert cache.hits == 4
+
+
+def test_eviction_waits_for_slack_and_keeps_recent_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(api_cache, "EVICTION_SLACK", 0.5)
+    cache = ApiResponseCache(str(tmp_path / "cache.db"), max_entries=4)
+    for i in range(6):
+        cache.put(URL, params(i), {"status": "OK", "results": [i]})
+    # A pending hit counts as a use when entries are evicted
+    cache.get(URL, params(0))
+    assert cache.stats()["entries"] == 6
+    assert cache.evicted == 0
+
+    cache.put(URL, params(6), {"status": "OK", "results": [6]})
+    assert cache.stats()["entries"] == 4
+    assert cache.evicted == 3
+    assert cache.get(URL, params(1)) is None
+    assert cache.get(URL, params(0)) is not None
+    assert cache.get(URL, params(6)) is not None
+    cache.close()
+
+    # The entry count is read back when the cache is reopened
+    reopened = ApiResponseCache(str(tmp_path / "cache.db"), max_entries=4)
+    reopened.put(URL, params(7), {"status": "OK", "results": [7]})
+    reopened.put(URL, params(8), {"status": "OK", "results": [8]})
+    assert reopened.stats()["entries"] == 6
+    reopened.put(URL, params(9), {"status": "OK", "results": [9]})
+    assert reopened.stats()["entries"] == 4
+    reopened.close()
+
+
+def test_uncacheable_responses_are_not_stored(tmp_path):
+    cache = ApiResponseCache(str(tmp_path / "cache.db"))
+    assert not cache.put(URL, params(0), {"status": "OVER_QUERY_LIMIT"})
+    assert cache.get(URL, params(0)) is None
+    assert cache.stats()["entries"] == 0
+    cache.close()
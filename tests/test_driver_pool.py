@@ -0,0 +1,205 @@
+"""
+Tests for WebDriverPool and the browser scraper.
+
+The pool bookkeeping is checked with stand-in drivers. The browser tests
+drive a real headless browser against the stub capsACS page and are skipped
+when neither Chrome/Chromium nor Firefox is installed.
+"""
+
+import shutil
+import sys
+
+import pandas as pd
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from modules.datastore.master_store import MasterStore
+from modules.scraping import fetch
+from modules.scraping.driver_pool import WebDriverPool, create_webdriver
+from modules.scraping.mcdc_cache import MCDCCache
+
+# Executables that make a browser usable by the tests
+BROWSER_EXECUTABLES = {
+    "chrome": ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser"),
+    "firefox": ("firefox",),
+}
+
+# Listings scraped in the browser tests
+LISTINGS = pd.DataFrame({
+    "StockNumber": ["MO-1", "MO-2", "MO-3"],
+    "Latitude": [38.95, 39.1, 37.2],
+    "Longitude": [-92.33, -94.58, -93.29],
+})
+
+
+class FakeDriver:
+    """Stand-in for a WebDriver whose browser can be made to crash."""
+
+    def __init__(self):
+        self.alive = True
+        self.quit_calls = 0
+
+    @property
+    def window_handles(self):
+        if not self.alive:
+            raise WebDriverException("invalid session id")
+        return ["main"]
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise WebDriverException("invalid session id")
+        return 1
+
+    def quit(self):
+        self.alive = False
+        self.quit_calls += 1
+
+
+class FakeDriverFactory:
+    """Pool factory that starts FakeDrivers and keeps every one it started."""
+
+    def __init__(self):
+        self.drivers = []
+
+    def __call__(self):
+        driver = FakeDriver()
+        self.drivers.append(driver)
+        return driver
+
+
+@pytest.fixture
+def fake_drivers():
+    return FakeDriverFactory()
+
+
+@pytest.fixture(scope="module")
+def browser():
+    """Name of a browser that can be started headless, or skip."""
+    for name, executables in BROWSER_EXECUTABLES.items():
+        if not any(shutil.which(executable) for executable in executables):
+            continue
+        try:
+            create_webdriver(name, headless=True).quit()
+        except Exception:
+            continue
+        return name
+    pytest.skip("no headless Chrome/Chromium or Firefox available")
+
+
+@pytest.fixture
+def master_listings(workdir, monkeypatch):
+    """Master CSV of LISTINGS in the working directory, and an empty report cache."""
+    LISTINGS.to_csv(workdir / "database" / "master.csv", index=False)
+    monkeypatch.setattr(fetch, "CACHE", MCDCCache())
+    return LISTINGS
+
+
+def assert_census_columns(frame):
+    """Check the census columns merged from the stub reports (see `caps_report`)."""
+    rows = frame.set_index("StockNumber")
+    for stock, latitude in zip(LISTINGS["StockNumber"], LISTINGS["Latitude"]):
+        base = round(latitude * 100)
+        assert rows.at[stock, "TotPop_5"] == base * 1000
+        assert rows.at[stock, "TotPop_25"] == base * 1000 * 5
+        assert rows.at[stock, "MedianHHInc_10"] == 51000
+        assert rows.at[stock, "MedianGrossRent_20"] == 930
+        assert pd.isna(rows.at[stock, "MedianGrossRent_25"])
+        assert rows.at[stock, "Census_Source_Latitude"] == latitude
+
+
+def test_pool_recycles_driver_after_max_uses(fake_drivers):
+    with WebDriverPool(size=1, max_uses=3, factory=fake_drivers) as pool:
+        used = []
+        for _ in range(7):
+            with pool.driver() as driver:
+                used.append(driver)
+
+    assert [fake_drivers.drivers.index(driver) for driver in used] == [0, 0, 0, 1, 1, 1, 2]
+    assert pool.created == 3
+    assert pool.recycled == 2
+    assert all(driver.quit_calls == 1 for driver in fake_drivers.drivers)
+
+
+def test_pool_replaces_unresponsive_idle_driver(fake_drivers):
+    with WebDriverPool(size=1, max_uses=None, factory=fake_drivers) as pool:
+        first = pool.acquire()
+        pool.release(first)
+        first.alive = False
+
+        second = pool.acquire()
+        pool.release(second)
+
+    assert second is not first
+    assert first.quit_calls == 1
+    assert (pool.created, pool.recycled) == (2, 1)
+
+
+def test_pool_quits_driver_that_crashed_in_use(fake_drivers):
+    pool = WebDriverPool(size=2, max_uses=None, factory=fake_drivers)
+    with pytest.raises(RuntimeError):
+        with pool.driver() as driver:
+            driver.alive = False
+            raise RuntimeError("page crashed")
+
+    # A driver that raised but still responds goes back to the pool
+    with pytest.raises(ValueError):
+        with pool.driver() as healthy:
+            raise ValueError("form changed")
+    with pool.driver() as reused:
+        pass
+    pool.close()
+
+    assert driver.quit_calls == 1
+    assert reused is healthy
+    assert (pool.created, pool.recycled) == (2, 1)
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+
+def test_browser_pool_health_checks_and_recycling(browser, caps_server):
+    with WebDriverPool(size=1, browser=browser, max_uses=2) as pool:
+        first = pool.acquire()
+        first.get(caps_server.form_url)
+        assert pool.is_healthy(first)
+        pool.release(first)
+
+        # Second use wears the driver out; it is quit on release
+        assert pool.acquire() is first
+        pool.release(first)
+        assert not pool.is_healthy(first)
+
+        second = pool.acquire()
+        assert second is not first
+        pool.release(second)
+
+        # A browser that dies while idle fails the health check and is replaced
+        second.quit()
+        third = pool.acquire()
+        assert third is not second and pool.is_healthy(third)
+        pool.release(third)
+
+    assert (pool.created, pool.recycled) == (3, 2)
+
+
+def test_process_batch_scrapes_stub_page(browser, caps_server, master_listings):
+    coordinates = list(zip(LISTINGS["Latitude"], LISTINGS["Longitude"]))
+    with WebDriverPool(size=2, browser=browser, max_uses=2) as pool:
+        processed = fetch.process_batch(coordinates, pool=pool, url=caps_server.form_url)
+
+    assert processed == len(coordinates)
+    assert pool.created >= 2 and pool.recycled >= 1
+    submitted = {(float(s["latitude"]), float(s["longitude"])) for s in caps_server.submissions}
+    assert submitted == set(coordinates)
+    assert all(s["radii"] == "5 10 15 20 25" for s in caps_server.submissions)
+    assert_census_columns(MasterStore().read_frame())
+
+
+def test_selenium_engine_uses_mcdc_url(browser, caps_server, master_listings, monkeypatch):
+    monkeypatch.setattr(sys, "argv", [
+        "fetch.py", "--engine", "selenium", "--browser", browser, "--drivers", "1",
+        "--driver-max-uses", "2", "--no-journal", "--mcdc-url", caps_server.form_url,
+    ])
+    fetch.main()
+
+    assert len(caps_server.submissions) == len(LISTINGS)
+    assert_census_columns(MasterStore().read_frame())
@@ -0,0 +1,55 @@
+"""
+Tests of the census fetch batches, run with MCDCClient against the fake capsACS server.
+"""
+
+import pandas as pd
+import pytest
+
+from modules.datastore.master_store import MasterStore
+from modules.scraping import fetch, mcdc_client, rate_limit
+from modules.scraping.mcdc_cache import MCDCCache
+from modules.scraping.mcdc_client import MCDCClient
+
+# A listing, and one about 110 m north of it
+NEAR_PAIR = [(38.95, -92.33), (38.951, -92.33)]
+
+
+@pytest.fixture
+def batch_env(caps_server, workdir, monkeypatch):
+    """Master data for NEAR_PAIR, an empty report cache and a client for the fake server."""
+    pd.DataFrame({
+        "StockNumber": ["MO-1", "MO-2"],
+        "Latitude": [lat for lat, _ in NEAR_PAIR],
+        "Longitude": [lng for _, lng in NEAR_PAIR],
+    }).to_csv(workdir / "database" / "master.csv", index=False)
+    monkeypatch.setattr(fetch, "CACHE", MCDCCache())
+    monkeypatch.setattr(rate_limit, "backoff_delay", lambda attempt, base=1.0, cap=60.0: 0)
+    monkeypatch.setattr(mcdc_client, "backoff_delay", lambda attempt, base=1.0, cap=60.0: 0)
+    with MCDCClient(form_url=caps_server.form_url, pool_size=2, timeout=10, retries=0) as client:
+        yield client
+
+
+def test_reuse_within_shares_reports_of_nearby_points(caps_server, batch_env):
+    assert fetch.process_batch(NEAR_PAIR, client=batch_env, reuse_within=500) == 2
+    assert len(caps_server.submissions) == 1
+
+    # A second run finds both points in the cache
+    assert fetch.process_batch(NEAR_PAIR, client=batch_env, reuse_within=500) == 2
+    assert len(caps_server.submissions) == 1
+
+    rows = MasterStore().read_frame().set_index("StockNumber")
+    assert rows.at["MO-2", "Census_Source_Latitude"] == NEAR_PAIR[0][0]
+    assert 100 < rows.at["MO-2", "Census_Source_Distance_Meters"] < 120
+
+
+def test_force_refetches_despite_reuse_within(caps_server, batch_env):
+    fetch.process_batch(NEAR_PAIR[:1], client=batch_env)
+    assert len(caps_server.submissions) == 1
+
+    # The cached report of the point itself (distance 0) must not be reused
+    assert fetch.process_batch(NEAR_PAIR[:1], client=batch_env, force=True, reuse_within=500) == 1
+    assert len(caps_server.submissions) == 2
+
+    # Near-duplicates in a forced batch still share the one fresh report
+    assert fetch.process_batch(NEAR_PAIR, client=batch_env, force=True, reuse_within=500) == 2
+    assert len(caps_server.submissions) == 3
@@ -0,0 +1,155 @@
+"""
+Tests of the market statistics tables and the market-relative scores.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.analytics.analytics import generate_analytics_report
+from modules.analytics.market_stats import (
+    GLOBAL_MARKET, MIN_MARKET_ROWS, QUANTILE_NAMES, MarketStats, StatsStore, compute_stats, same_stats
+)
+from modules.datastore.master_store import MasterStore
+
+from test_metric_registry import master_frame
+
+
+def market_frame():
+    """A large market with values 0-99, a small one with 1000-1004, and listings without a market."""
+    return pd.DataFrame({
+        'Market': ['Big'] * 100 + ['Small'] * (MIN_MARKET_ROWS - 5) + [None] * 2,
+        'Housing Gap': list(range(100)) + [1000 + i for i in range(MIN_MARKET_ROWS - 5)] + [50.0, 2000.0],
+    })
+
+
+def test_small_markets_and_missing_markets_use_global_stats():
+    df = market_frame()
+    stats = MarketStats(compute_stats(df, columns=['Housing Gap']))
+
+    assert stats.row('Housing Gap', 'Big')['count'] == 100
+    assert stats.row('Housing Gap', 'Small')['count'] == len(df)
+    assert stats.row('Housing Gap', 'Unknown')['count'] == len(df)
+    assert stats.bounds('Housing Gap', 'Big') == (0, 99)
+    assert stats.bounds('Housing Gap', 'Small') == (0, 2000)
+
+    normalized = stats.normalize(df['Housing Gap'], 'Housing Gap', df['Market'])
+    assert normalized[99] == 1.0
+    assert normalized[100] == pytest.approx(1000 / 2000)
+    # No market: the global statistics
+    assert normalized.iloc[-2] == pytest.approx(50 / 2000)
+    assert normalized.iloc[-1] == 1.0
+
+
+def stats_with_quantiles(values):
+    """A one-column table whose quantiles (q00 ... q100) are `values`."""
+    frame = pd.DataFrame([{
+        'market': GLOBAL_MARKET, 'column': 'Housing Gap', 'count': 100,
+        'min': values[0], 'max': values[-1], 'mean': np.mean(values), 'std': 1.0,
+        **dict(zip(QUANTILE_NAMES, values)),
+    }])
+    return MarketStats(frame)
+
+
+def test_percentile_interpolates_between_quantiles():
+    stats = stats_with_quantiles([float(i * 10) for i in range(21)])
+
+    result = stats.normalize(pd.Series([0.0, 5.0, 100.0, 137.5, 200.0, -10.0, 500.0]), 'Housing Gap',
+                             method='percentile')
+
+    assert result.tolist() == pytest.approx([0.0, 0.025, 0.5, 0.6875, 1.0, 0.0, 1.0])
+
+
+def test_repeated_quantiles_get_the_middle_of_their_levels():
+    # Half the values are 0, the rest spread over 1-10
+    stats = stats_with_quantiles([0.0] * 11 + [float(i) for i in range(1, 11)])
+
+    result = stats.normalize(pd.Series([0.0, 0.5, 1.0, 10.0]), 'Housing Gap', method='percentile')
+
+    # 0 spans levels 0 to 0.5; the points between merge at its mean level
+    assert result.tolist() == pytest.approx([0.25, 0.25 + 0.5 * (0.55 - 0.25), 0.55, 1.0])
+
+
+def test_constant_quantiles_give_the_middle():
+    stats = stats_with_quantiles([3.0] * 21)
+    result = stats.normalize(pd.Series([3.0, 1.0, 5.0, np.nan]), 'Housing Gap', method='percentile')
+    assert result.tolist()[:3] == pytest.approx([0.5, 0.5, 0.5])
+    assert np.isnan(result.iloc[3])
+
+
+def test_infinite_values_are_left_out_of_stats_and_clipped():
+    # A zero travel time gives an infinite Weighted Demand and Convenience
+    column = 'Weighted Demand and Convenience'
+    df = pd.DataFrame({'Market': ['A'] * 20, column: [float(i) for i in range(18)] + [np.inf, -np.inf]})
+    stats = MarketStats(compute_stats(df, columns=[column]))
+
+    row = stats.row(column, 'A')
+    assert row['count'] == 18 and (row['min'], row['max']) == (0, 17)
+    assert np.isfinite(row[list(QUANTILE_NAMES)].to_numpy(dtype=float)).all()
+
+    for method in ('percentile', 'minmax'):
+        result = stats.normalize(df[column], column, df['Market'], method)
+        assert result.iloc[-2:].tolist() == [1.0, 0.0]
+        assert result.iloc[:18].between(0, 1).all() and result.iloc[17] == 1.0
+
+
+def test_saved_stats_round_trip_through_sqlite(tmp_path):
+    df = master_frame().assign(Market=['A', 'B'] * 3).assign(**{'Housing Gap': [0.4, np.nan, 0.3, 0.2, np.inf, 0.1]})
+    frame = compute_stats(df)
+    stats_store = StatsStore(str(tmp_path / "master.db"))
+    assert stats_store.load() is None
+    stats_store.save(frame)
+
+    loaded = stats_store.load_frame()
+    assert same_stats(frame, loaded)
+    assert not same_stats(frame, compute_stats(df.assign(**{'Land Area (AC)': df['Land Area (AC)'] + 1})))
+
+    reloaded = stats_store.load()
+    assert reloaded.computed_at is not None
+    assert reloaded.fingerprint() == MarketStats(frame).fingerprint()
+    for method in ('percentile', 'minmax'):
+        pd.testing.assert_series_equal(reloaded.normalize(df['Housing Gap'], 'Housing Gap', df['Market'], method),
+                                       MarketStats(frame).normalize(df['Housing Gap'], 'Housing Gap', df['Market'], method))
+
+
+def analytics_listings(rows, seed):
+    """Listings of two markets with every metric input."""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'StockNumber': [f'S{seed}-{i}' for i in range(rows)],
+        'Market': ['A', 'B'] * (rows // 2),
+        'For Sale Price': rng.uniform(1e4, 1e6, rows),
+        'Land Area (AC)': rng.uniform(1, 100, rows),
+        '2024 Median Home Value(10m)': rng.uniform(1e5, 5e5, rows),
+        '2024 Med HH Inc(10m)': rng.uniform(3e4, 1e5, rows),
+        'MedianGrossRent_15': rng.uniform(700, 2000, rows),
+        'MedianHHInc_15': rng.uniform(3e4, 1e5, rows),
+        'TotHUs_20': rng.uniform(1e3, 1e4, rows),
+        'TotPop_20': rng.uniform(1e4, 5e4, rows),
+        'Nearest_Walmart_Travel_Time_Minutes': rng.uniform(2, 60, rows),
+    })
+    for col in ('TotPop_10', 'TotPop_15', 'TotPop_25'):
+        frame[col] = rng.uniform(1e4, 5e4, rows)
+    return frame
+
+
+def test_market_scores_do_not_drift_until_stats_are_rebuilt(workdir, monkeypatch):
+    monkeypatch.setattr('modules.analytics.analytics.get_visualization_payload', lambda store: (None, None))
+    store = MasterStore()
+    store.replace_frame(analytics_listings(40, seed=1))
+    assert generate_analytics_report()
+    before = store.read_frame().set_index('StockNumber')['Market Composite Score']
+
+    # New listings arrive, with outliers in both markets
+    arrivals = analytics_listings(10, seed=2)
+    arrivals['For Sale Price'] = 1.0
+    store.append_rows(arrivals)
+    assert generate_analytics_report()
+    after = store.read_frame().set_index('StockNumber')['Market Composite Score']
+    pd.testing.assert_series_equal(after.loc[before.index], before)
+    assert after.drop(before.index).notna().all()
+
+    # Rebuilding the statistics deliberately re-scores the existing listings
+    assert generate_analytics_report(rebuild_stats=True)
+    rebuilt = store.read_frame().set_index('StockNumber')['Market Composite Score']
+    assert not rebuilt.loc[before.index].equals(before)
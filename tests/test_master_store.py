@@ -0,0 +1,59 @@
+"""
+Tests of the master store's CSV migration and master.csv handling.
+"""
+
+import os
+
+import pandas as pd
+
+from modules.datastore.master_store import MasterStore
+
+
+def write_csv(path, frame, mtime_offset=0):
+    """Write a CSV and move its mtime `mtime_offset` seconds into the future."""
+    frame.to_csv(path, index=False)
+    if mtime_offset:
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + mtime_offset * 10**9))
+
+
+def test_edited_snapshot_does_not_replace_newer_columns(tmp_path):
+    csv_path = tmp_path / "master.csv"
+    listings = pd.DataFrame({"StockNumber": ["MO-1", "MO-2"], "Acres": [1.0, 2.0]})
+    write_csv(csv_path, listings)
+    store = MasterStore(str(tmp_path / "master.db"), str(csv_path))
+    assert store.count() == 2
+
+    # A later stage writes a column that the CSV snapshot does not have
+    store.upsert_columns(pd.DataFrame({"StockNumber": ["MO-1", "MO-2"], "TotPop_5": [100, 200]}),
+                         key="StockNumber")
+
+    # The stale snapshot is edited after the store was last written
+    edited = listings.assign(Acres=[1.5, 2.0])
+    write_csv(csv_path, edited, mtime_offset=5)
+
+    reopened = MasterStore(str(tmp_path / "master.db"), str(csv_path)).read_frame()
+    assert reopened["TotPop_5"].tolist() == [100, 200]
+    assert reopened["Acres"].tolist() == [1.0, 2.0]
+
+
+def test_import_csv_loads_edits_explicitly(tmp_path):
+    csv_path = tmp_path / "master.csv"
+    write_csv(csv_path, pd.DataFrame({"StockNumber": ["MO-1"], "Acres": [1.0]}))
+    store = MasterStore(str(tmp_path / "master.db"), str(csv_path))
+    store.export_csv()
+
+    write_csv(csv_path, pd.DataFrame({"StockNumber": ["MO-1", "MO-2"], "Acres": [3.0, 4.0]}), mtime_offset=5)
+    assert store.count() == 1
+
+    assert store.import_csv() == 2
+    assert store.read_frame()["Acres"].tolist() == [3.0, 4.0]
+
+
+def test_duplicate_stock_numbers_are_kept(tmp_path):
+    csv_path = tmp_path / "master.csv"
+    write_csv(csv_path, pd.DataFrame({"StockNumber": ["MO-1", "MO-1"], "Acres": [1.0, 2.0]}))
+    store = MasterStore(str(tmp_path / "master.db"), str(csv_path))
+
+    # StockNumber has a plain index, not a unique constraint
+    assert store.read_frame()["StockNumber"].tolist() == ["MO-1", "MO-1"]
@@ -0,0 +1,112 @@
+"""
+End-to-end tests of MCDCClient against the fake capsACS server (see conftest.py).
+"""
+
+import sys
+
+import pandas as pd
+import pytest
+
+from modules.datastore.master_store import MasterStore
+from modules.scraping import fetch, mcdc_client, rate_limit
+from modules.scraping.mcdc_cache import MCDCCache
+from modules.scraping.mcdc_client import MCDCClient, WebsiteUnavailableError, RADII
+
+# Coordinates fetched in the tests
+COORDS = [(38.95, -92.33), (39.1, -94.58)]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    """Retry immediately instead of sleeping between attempts."""
+    monkeypatch.setattr(rate_limit, "backoff_delay", lambda attempt, base=1.0, cap=60.0: 0)
+    monkeypatch.setattr(mcdc_client, "backoff_delay", lambda attempt, base=1.0, cap=60.0: 0)
+
+
+@pytest.fixture
+def client(caps_server, tmp_path):
+    with MCDCClient(form_url=caps_server.form_url, pool_size=2, timeout=10, max_retries=3,
+                    output_dir=str(tmp_path / "MCDC"), retries=2) as client:
+        yield client
+
+
+def test_fetch_submits_form_and_downloads_report(caps_server, client):
+    paths = [client.fetch(coord) for coord in COORDS]
+
+    # The form page is loaded once per client
+    assert caps_server.count("GET", "/applications/") == 1
+    assert caps_server.count("POST", "/cgi-bin/broker") == len(COORDS)
+
+    first = caps_server.submissions[0]
+    assert (first["latitude"], first["longitude"]) == ("38.95", "-92.33")
+    assert first["radii"] == " ".join(str(r) for r in RADII)
+    # Hidden fields and selected options are sent as on the page; unchecked boxes are not
+    assert first["_PROGRAM"] == "apps.capsACS.sas"
+    assert first["units"] == "mi"
+    assert "printcaps" not in first
+
+    report = pd.read_csv(paths[0])
+    assert paths[0].endswith("mcdc_38.95_-92.33.csv")
+    assert report["Radius"].tolist() == RADII
+    assert report["TotPop"].tolist()[0] == "3,895,000"
+    assert fetch.parse_radius_data(paths[1], ["TotPop", "MedianHHInc"])["TotPop_10"] == 3910 * 1000 * 2
+
+
+def test_failed_requests_are_retried_by_the_client_only(caps_server, client):
+    caps_server.fail_submit = 1
+    caps_server.fail_report = 1
+
+    assert client.fetch(COORDS[0]).endswith("mcdc_38.95_-92.33.csv")
+
+    # Each failure costs one client-level retry of the whole fetch (submit and
+    # download); the session does not resend the POST or the GET itself
+    assert caps_server.count("POST", "/cgi-bin/broker") == 3
+    assert len(caps_server.submissions) == 2
+    assert caps_server.count("GET", "/tmp/capsACS_") == 2
+
+
+def test_failed_fetch_raises_after_retries(caps_server, client):
+    caps_server.fail_submit = 10
+
+    with pytest.raises(mcdc_client.requests.exceptions.HTTPError):
+        client.fetch(COORDS[0])
+    assert caps_server.count("POST", "/cgi-bin/broker") == client.retries + 1
+
+
+def test_unavailable_form_raises(caps_server, client):
+    caps_server.fail_form = client.max_retries
+
+    with pytest.raises(WebsiteUnavailableError):
+        client.fetch(COORDS[0])
+    assert caps_server.count("GET", "/applications/") == client.max_retries
+    assert caps_server.count("POST", "/cgi-bin/broker") == 0
+
+
+def test_form_recovers_within_max_retries(caps_server, client):
+    caps_server.fail_form = client.max_retries - 1
+
+    assert client.fetch(COORDS[0]) is not None
+    assert caps_server.count("GET", "/applications/") == client.max_retries
+
+
+def test_http_engine_uses_mcdc_url(caps_server, workdir, monkeypatch):
+    listings = pd.DataFrame({
+        "StockNumber": ["MO-1", "MO-2"],
+        "Latitude": [lat for lat, _ in COORDS],
+        "Longitude": [lng for _, lng in COORDS],
+    })
+    listings.to_csv(workdir / "database" / "master.csv", index=False)
+    monkeypatch.setattr(fetch, "CACHE", MCDCCache())
+    monkeypatch.setattr(sys, "argv", [
+        "fetch.py", "--engine", "http", "--concurrency", "2", "--rate", "50", "--no-journal",
+        "--mcdc-url", caps_server.form_url,
+    ])
+
+    fetch.main()
+
+    rows = MasterStore().read_frame().set_index("StockNumber")
+    assert rows.at["MO-1", "TotPop_5"] == 3895 * 1000
+    assert rows.at["MO-2", "TotPop_25"] == 3910 * 1000 * 5
+    assert rows.at["MO-2", "MedianHHInc_15"] == 52000
+    assert pd.isna(rows.at["MO-1", "MedianGrossRent_25"])
+    assert len(caps_server.submissions) == len(COORDS)
@@ -0,0 +1,73 @@
+"""
+Tests of the incremental metric computation and its stored state.
+"""
+
+import os
+
+import pandas as pd
+
+from modules.analytics.metric_registry import MetricState, compute_metrics, default_registry
+from modules.analytics.metrics import COMPOSITE_COMPONENTS
+
+
+def master_frame():
+    """Listings with the inputs of every default metric, indexed by row_id."""
+    rows = 6
+    frame = pd.DataFrame({
+        'For Sale Price': [100000.0 * (i + 1) for i in range(rows)],
+        'Land Area (AC)': [2.0 + i for i in range(rows)],
+        '2024 Median Home Value(10m)': [200000.0 + 10000 * i for i in range(rows)],
+        '2024 Med HH Inc(10m)': [50000.0 + 2000 * i for i in range(rows)],
+        'MedianGrossRent_15': [900.0 + 10 * i for i in range(rows)],
+        'MedianHHInc_15': [48000.0 + 1000 * i for i in range(rows)],
+        'TotHUs_20': [4000.0 + 100 * i for i in range(rows)],
+        'TotPop_20': [10000.0 + 500 * i for i in range(rows)],
+        'Nearest_Walmart_Travel_Time_Minutes': [5.0 + i for i in range(rows)],
+    }, index=pd.RangeIndex(1, rows + 1, name='row_id'))
+    for col in ('TotPop_10', 'TotPop_15', 'TotPop_25'):
+        frame[col] = [8000.0 + 300 * i for i in range(rows)]
+    return frame
+
+
+def signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def test_unchanged_run_does_not_write_state(tmp_path):
+    state = MetricState(str(tmp_path / "master.db"))
+    df = master_frame()
+    registry = default_registry()
+
+    first = compute_metrics(df, registry, state)
+    assert all(len(rows) == len(df) for rows in first.values())
+    before = signature(state.db_path)
+
+    second = compute_metrics(df, registry, state)
+    assert all(len(rows) == 0 for rows in second.values())
+    assert signature(state.db_path) == before
+
+
+def test_changed_bounds_recompute_and_store_only_that_metric(tmp_path):
+    state = MetricState(str(tmp_path / "master.db"))
+    df = master_frame()
+    registry = default_registry()
+    compute_metrics(df, registry, state)
+
+    # A row-local change inside the current bounds recomputes just that row
+    df.loc[3, 'MedianGrossRent_15'] = 905.0
+    changed = compute_metrics(df, registry, state)
+    assert list(changed['Demand for Attainable Rent']) == [3]
+    _, bounds = state.load()
+    assert set(bounds) == {'Composite Score'}
+
+    # A new maximum shifts the Composite Score bounds: every row is rescored
+    df.loc[2, 'TotPop_20'] = 1.0
+    changed = compute_metrics(df, registry, state)
+    assert list(changed['Housing Gap']) == [2]
+    assert len(changed['Composite Score']) == len(df)
+    _, bounds = state.load()
+    assert bounds['Composite Score']['Housing Gap'] == tuple(
+        float(x) for x in (df['Housing Gap'].min(), df['Housing Gap'].max())
+    )
+    assert set(bounds['Composite Score']) == set(COMPOSITE_COMPONENTS)
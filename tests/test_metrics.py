@@ -0,0 +1,168 @@
+"""
+The vectorized metrics must match the row-wise `df.apply` formulas they replaced.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.analytics.analytics import clean_metric_inputs
+from modules.analytics.metrics import (
+    price_per_acre, home_affordability_gap, demand_for_attainable_rent, housing_gap,
+    weighted_demand_convenience
+)
+
+
+def rowwise_reference(df):
+    """The row-wise formulas replaced by the metrics module."""
+    return {
+        'Price Per Acre': df.apply(
+            lambda row: row['For Sale Price'] / row['Land Area (AC)']
+            if pd.notna(row['For Sale Price']) and pd.notna(row['Land Area (AC)']) and row['Land Area (AC)'] > 0
+            else np.nan,
+            axis=1
+        ).round(2),
+        'Demand for Attainable Rent': df.apply(
+            lambda row: row['TotPop_15'] * (row['MedianGrossRent_15'] / (row['MedianHHInc_15'] / 12))
+            if pd.notna(row['TotPop_15']) and pd.notna(row['MedianGrossRent_15']) and
+               pd.notna(row['MedianHHInc_15']) and row['MedianHHInc_15'] > 0
+            else np.nan,
+            axis=1
+        ).round(2),
+        'Housing Gap': df.apply(
+            lambda row: row['TotHUs_20'] / row['TotPop_20']
+            if pd.notna(row['TotHUs_20']) and pd.notna(row['TotPop_20']) and row['TotPop_20'] > 0
+            else np.nan,
+            axis=1
+        ).round(4),
+        'Weighted Demand and Convenience': df.apply(
+            lambda row: (
+                (0.4 * row['TotPop_10'] +
+                 0.3 * row['TotPop_15'] +
+                 0.2 * row['TotPop_20'] +
+                 0.1 * row['TotPop_25']) /
+                np.log(1 + row['Nearest_Walmart_Travel_Time_Minutes'])
+            )
+            if (pd.notna(row['TotPop_10']) and pd.notna(row['TotPop_15']) and
+                pd.notna(row['TotPop_20']) and pd.notna(row['TotPop_25']) and
+                pd.notna(row['Nearest_Walmart_Travel_Time_Minutes']) and
+                row['Nearest_Walmart_Travel_Time_Minutes'] >= 0)
+            else np.nan,
+            axis=1
+        ).round(2),
+    }
+
+
+def vectorized(df):
+    """The same metrics from the metrics module."""
+    return {
+        'Price Per Acre': price_per_acre(df['For Sale Price'], df['Land Area (AC)']),
+        'Demand for Attainable Rent': demand_for_attainable_rent(
+            df['TotPop_15'], df['MedianGrossRent_15'], df['MedianHHInc_15']
+        ),
+        'Housing Gap': housing_gap(df['TotHUs_20'], df['TotPop_20']),
+        'Weighted Demand and Convenience': weighted_demand_convenience(df),
+    }
+
+
+def synthetic_frame(rows, seed=0, missing=0.05):
+    """
+    Build a frame with the metric input columns, including NaNs, zeros and
+    negative values to exercise every mask.
+    """
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'For Sale Price': rng.uniform(1e4, 5e6, rows).round(2),
+        'Land Area (AC)': rng.choice([0.0, -1.0, 0.5, 12.25, 150.0], rows) * rng.uniform(0.5, 2, rows),
+        'MedianGrossRent_15': rng.uniform(500, 3000, rows).round(0),
+        'MedianHHInc_15': rng.choice([0.0, 1.0], rows, p=[0.02, 0.98]) * rng.uniform(2e4, 2e5, rows).round(0),
+        'TotHUs_20': rng.integers(0, 200000, rows).astype(float),
+        'TotPop_20': rng.integers(0, 500000, rows).astype(float),
+        'Nearest_Walmart_Travel_Time_Minutes': rng.choice([0.0, -1.0, 1.0], rows, p=[0.01, 0.01, 0.98])
+                                               * rng.uniform(1, 90, rows).round(2),
+    })
+    for col in ('TotPop_10', 'TotPop_15', 'TotPop_25'):
+        frame[col] = rng.integers(0, 500000, rows).astype(float)
+    for col in frame.columns:
+        frame.loc[rng.random(rows) < missing, col] = np.nan
+    return frame
+
+
+def assert_same(actual, expected):
+    """Values equal, or missing in both."""
+    actual, expected = pd.Series(actual), pd.Series(expected)
+    equal = (actual.to_numpy() == expected.to_numpy()) | (actual.isna().to_numpy() & expected.isna().to_numpy())
+    assert equal.all(), pd.DataFrame({'actual': actual, 'expected': expected})[~equal]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_vectorized_metrics_match_rowwise(seed):
+    df = synthetic_frame(3000, seed)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = rowwise_reference(df)
+    actual = vectorized(df)
+    for name in expected:
+        assert_same(actual[name], expected[name])
+
+
+def test_missing_inputs_give_nan():
+    df = synthetic_frame(4, missing=0)
+    df.loc[0, 'For Sale Price'] = np.nan
+    df.loc[1, 'MedianGrossRent_15'] = np.nan
+    df.loc[2, 'TotPop_20'] = np.nan
+    df.loc[3, 'TotPop_25'] = np.nan
+    df['Land Area (AC)'] = 10.0
+    df['MedianHHInc_15'] = 60000.0
+    df['Nearest_Walmart_Travel_Time_Minutes'] = 12.0
+
+    actual = vectorized(df)
+    assert actual['Price Per Acre'].isna().tolist() == [True, False, False, False]
+    assert actual['Demand for Attainable Rent'].isna().tolist() == [False, True, False, False]
+    assert actual['Housing Gap'].isna().tolist() == [False, False, True, False]
+    assert actual['Weighted Demand and Convenience'].isna().tolist() == [False, False, True, True]
+    for name, expected in rowwise_reference(df).items():
+        assert_same(actual[name], expected)
+
+
+def test_zero_and_negative_area_give_nan():
+    price = pd.Series([100000.0, 100000.0, 100000.0])
+    acres = pd.Series([0.0, -2.0, 4.0])
+    assert_same(price_per_acre(price, acres), [np.nan, np.nan, 25000.0])
+
+
+def test_zero_divisors_give_nan():
+    population = pd.Series([1000.0, 1000.0, 0.0])
+    rent = pd.Series([1200.0, 1200.0, 1200.0])
+    income = pd.Series([0.0, 48000.0, 48000.0])
+    assert_same(demand_for_attainable_rent(population, rent, income), [np.nan, 300.0, 0.0])
+    assert_same(housing_gap(pd.Series([10.0, 10.0]), pd.Series([0.0, 40.0])), [np.nan, 0.25])
+
+
+def test_zero_travel_time_gives_inf_like_rowwise():
+    df = synthetic_frame(3, missing=0)
+    df['Nearest_Walmart_Travel_Time_Minutes'] = [0.0, -1.0, np.e - 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = rowwise_reference(df)['Weighted Demand and Convenience']
+    actual = weighted_demand_convenience(df)
+    assert np.isinf(actual[0]) and np.isnan(actual[1]) and np.isfinite(actual[2])
+    assert_same(actual, expected)
+
+
+def test_string_currency_inputs_are_cleaned():
+    df = pd.DataFrame({
+        '2024 Median Home Value(10m)': ['$250,000', '1,200,000', None, 'N/A'],
+        '2024 Med HH Inc(10m)': ['$50,000', '75000', '$60,000', '$40,000'],
+        'For Sale Price': ['250000', '$1,000', '99000.5', None],
+        'Land Area (AC)': ['2.5', '1', '0', '3'],
+    })
+    clean_metric_inputs(df)
+
+    assert_same(home_affordability_gap(df['2024 Median Home Value(10m)'], df['2024 Med HH Inc(10m)']),
+                [100000.0, 975000.0, np.nan, np.nan])
+    # Currency strings outside the cleaned columns do not parse and give NaN
+    assert_same(price_per_acre(df['For Sale Price'], df['Land Area (AC)']), [100000.0, np.nan, np.nan, np.nan])
+
+
+def test_numeric_strings_are_parsed():
+    assert_same(price_per_acre(pd.Series(['250000', 'n/a']), pd.Series(['2.5', '2'])), [100000.0, np.nan])
+    assert_same(housing_gap(pd.Series(['30', '']), pd.Series(['120', '5'])), [0.25, np.nan])
@@ -0,0 +1,54 @@
+"""
+Tests of the scenario engine's input limits.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.analytics.metrics import COMPOSITE_COMPONENTS
+from modules.analytics.scenarios import (
+    MAX_SCENARIOS, MAX_TOP_K, ScenarioEngine, grid_size, random_weights, weight_grid
+)
+
+
+def metric_frame(rows=50, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({column: rng.uniform(0, 100, rows) for column in COMPOSITE_COMPONENTS})
+    frame['StockNumber'] = [f'MO-{i}' for i in range(rows)]
+    return frame
+
+
+def test_grid_size_matches_built_grid():
+    assert grid_size(10) == len(weight_grid(0.1)) == 286
+    assert grid_size(20) == len(weight_grid(0.05))
+
+
+@pytest.mark.parametrize("step", [0.01, 0.001, 1e-9])
+def test_oversized_grid_is_rejected_before_it_is_built(step):
+    start = time.perf_counter()
+    with pytest.raises(ValueError, match="at most"):
+        weight_grid(step)
+    assert time.perf_counter() - start < 0.1
+
+
+@pytest.mark.parametrize("step", [0, -0.1, 2.0])
+def test_invalid_grid_step_is_rejected(step):
+    with pytest.raises(ValueError):
+        weight_grid(step)
+
+
+def test_random_count_is_bounded():
+    assert len(random_weights(MAX_SCENARIOS, seed=1)) == MAX_SCENARIOS
+    for count in (MAX_SCENARIOS + 1, 10**9, -1):
+        with pytest.raises(ValueError):
+            random_weights(count)
+
+
+def test_top_k_is_bounded():
+    engine = ScenarioEngine(metric_frame())
+    assert len(engine.run([[1, 1, 1, 1]], k=MAX_TOP_K)["scenarios"][0]["top"]) == len(engine)
+    with pytest.raises(ValueError):
+        engine.run([[1, 1, 1, 1]], k=MAX_TOP_K + 1)
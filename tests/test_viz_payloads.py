@@ -0,0 +1,64 @@
+"""
+The visualization data version must follow the listings and the stored market
+statistics, not the database file.
+"""
+
+import pandas as pd
+
+from modules.analytics.market_stats import StatsStore, compute_stats
+from modules.analytics.metric_registry import MetricState, compute_metrics, default_registry
+from modules.analytics.viz_payloads import data_version
+from modules.datastore.master_store import MasterStore
+
+from test_metric_registry import master_frame
+
+
+def test_data_version_ignores_side_table_writes(tmp_path):
+    store = MasterStore(str(tmp_path / "master.db"), str(tmp_path / "master.csv"))
+    store.replace_frame(master_frame().reset_index(drop=True))
+    version = data_version(store)
+    assert version is not None
+
+    # Metric state and store bookkeeping live in side tables of master.db
+    compute_metrics(master_frame(), default_registry(), MetricState(store.db_path))
+    store.export_csv()
+    assert data_version(store) == version
+
+    # Matching no rows writes nothing
+    assert store.upsert_columns(pd.DataFrame({'Land Area (AC)': [9.0]}, index=[999])) == (0, 0)
+    assert data_version(store) == version
+
+
+def test_data_version_changes_with_listing_writes(tmp_path):
+    store = MasterStore(str(tmp_path / "master.db"), str(tmp_path / "master.csv"))
+    store.replace_frame(master_frame().reset_index(drop=True))
+    versions = [data_version(store)]
+
+    store.upsert_columns(pd.DataFrame({'Land Area (AC)': [9.0]}, index=[1]))
+    versions.append(data_version(store))
+    store.append_rows(master_frame().head(1))
+    versions.append(data_version(store))
+    store.replace_frame(master_frame().reset_index(drop=True))
+    versions.append(data_version(store))
+
+    assert len(set(versions)) == len(versions)
+
+
+def test_data_version_changes_when_stats_are_saved(tmp_path):
+    store = MasterStore(str(tmp_path / "master.db"), str(tmp_path / "master.csv"))
+    frame = master_frame().reset_index(drop=True)
+    store.replace_frame(frame)
+    without_stats = data_version(store)
+
+    # Analytics writes the listings first and saves the statistics afterwards
+    stats_store = StatsStore(store.db_path)
+    stats_store.save(compute_stats(frame))
+    with_stats = data_version(store)
+    assert with_stats != without_stats
+
+    # Saving the same statistics again keeps the version
+    stats_store.save(compute_stats(frame))
+    assert data_version(store) == with_stats
+
+    stats_store.save(compute_stats(frame.assign(**{'Land Area (AC)': frame['Land Area (AC)'] * 2})))
+    assert data_version(store) not in (without_stats, with_stats)
@@ -0,0 +1,207 @@
+"""
+Tests of the batched Distance Matrix requests against a mock Distance Matrix server.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import pytest
+
+from modules.googledistance import walmart_distance
+from modules.googledistance.api_cache import ApiResponseCache
+from modules.googledistance.walmart_distance import (
+    MAX_MATRIX_ORIGINS, get_travel_details_batch, resolve_travel_times
+)
+
+# Store every route is requested to
+STORE = (40.0, -75.0)
+
+
+def route_metres(origin):
+    """Route length the mock server reports for an origin "lat,lng" (unique per origin)."""
+    lat, lng = (float(part) for part in origin.split(","))
+    return round((lat - 39) * 100000) + round(-lng * 10)
+
+
+class FakeDistanceMatrix:
+    """
+    Mock Distance Matrix endpoint.
+
+    Rows follow the order of the `origins` parameter, as in the real API.
+    Origins listed in `element_status` get that element status instead of a
+    route, `status` replaces the top-level status, and `drop_rows` truncates
+    the rows of the response.
+    """
+
+    def __init__(self):
+        self.element_status = {}
+        self.status = "OK"
+        self.drop_rows = 0
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/maps/api"
+
+    def respond(self, query):
+        origins = query["origins"].split("|")
+        if self.status != "OK":
+            return {"status": self.status, "rows": []}
+        if len(origins) > MAX_MATRIX_ORIGINS:
+            return {"status": "MAX_DIMENSIONS_EXCEEDED", "rows": []}
+
+        rows = []
+        for origin in origins:
+            status = self.element_status.get(origin, "OK")
+            if status != "OK":
+                rows.append({"elements": [{"status": status}]})
+                continue
+            metres = route_metres(origin)
+            rows.append({"elements": [{
+                "status": "OK",
+                "distance": {"text": f"{metres / 1609.34:.1f} mi", "value": metres},
+                "duration": {"text": f"{metres // 1200} mins", "value": metres // 20},
+            }]})
+        return {"status": "OK", "rows": rows[:len(rows) - self.drop_rows]}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = dict(parse_qsl(url.query))
+                with server._lock:
+                    server.requests.append(query)
+                if url.path.endswith(walmart_distance.DISTANCE_API_PATH):
+                    status, body = 200, server.respond(query)
+                else:
+                    status, body = 404, {"status": "NOT_FOUND"}
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def matrix(monkeypatch):
+    """A running mock server, with the module's cache, limiter and budget disabled."""
+    for name in ("API_CACHE", "SESSION", "RATE_LIMITER", "REQUEST_BUDGET"):
+        monkeypatch.setattr(walmart_distance, name, None)
+    monkeypatch.setattr(walmart_distance, "backoff_delay", lambda attempt, base=1.0, cap=30.0: 0)
+    server = FakeDistanceMatrix()
+    yield server
+    server.stop()
+
+
+def make_origins(count):
+    """Distinct origins north of STORE, each with its own route length."""
+    return [(round(39.5 + i * 0.01, 4), round(-75.0 - i * 0.01, 4)) for i in range(count)]
+
+
+def origin_key(origin):
+    return f"{origin[0]},{origin[1]}"
+
+
+def test_batch_maps_25_rows_to_their_origins(matrix):
+    origins = make_origins(MAX_MATRIX_ORIGINS)
+
+    results = get_travel_details_batch(origins, STORE, "key", base_url=matrix.base_url)
+
+    assert len(matrix.requests) == 1
+    request = matrix.requests[0]
+    assert request["origins"] == "|".join(origin_key(origin) for origin in origins)
+    assert request["destinations"] == "40.0,-75.0"
+    assert [result["distance_value"] for result in results] == [route_metres(origin_key(o)) for o in origins]
+    assert results[3]["duration_value"] == route_metres(origin_key(origins[3])) // 20
+
+
+def test_failed_elements_only_drop_their_origins(matrix):
+    origins = make_origins(MAX_MATRIX_ORIGINS)
+    matrix.element_status = {origin_key(origins[0]): "NOT_FOUND", origin_key(origins[12]): "ZERO_RESULTS"}
+    matrix.drop_rows = 1
+
+    results = get_travel_details_batch(origins, STORE, "key", base_url=matrix.base_url)
+
+    failed = [i for i, result in enumerate(results) if result is None]
+    assert failed == [0, 12, MAX_MATRIX_ORIGINS - 1]
+    assert results[1]["distance_value"] == route_metres(origin_key(origins[1]))
+    assert results[13]["distance_value"] == route_metres(origin_key(origins[13]))
+
+
+@pytest.mark.parametrize("status", ["INVALID_REQUEST", "REQUEST_DENIED", "MAX_ELEMENTS_EXCEEDED"])
+def test_non_ok_status_fails_the_whole_batch(matrix, status):
+    matrix.status = status
+
+    results = get_travel_details_batch(make_origins(5), STORE, "key", base_url=matrix.base_url)
+
+    assert results == [None] * 5
+    # Only OVER_QUERY_LIMIT is retried
+    assert len(matrix.requests) == 1
+
+
+def test_too_many_origins_are_rejected(matrix):
+    with pytest.raises(ValueError):
+        get_travel_details_batch(make_origins(MAX_MATRIX_ORIGINS + 1), STORE, "key", base_url=matrix.base_url)
+    assert matrix.requests == []
+
+
+def test_resolve_travel_times_chunks_listings_per_store(matrix):
+    origins = make_origins(60)
+    walmart = {"place_id": "store-1", "lat": STORE[0], "lng": STORE[1]}
+    listings = [(1000 + i, lat, lng, walmart) for i, (lat, lng) in enumerate(origins)]
+    matrix.element_status = {origin_key(origins[30]): "NOT_FOUND"}
+    resolved = {}
+
+    travel = resolve_travel_times(listings, "key", base_url=matrix.base_url, workers=3,
+                                  on_result=lambda row, details: resolved.setdefault(row, details))
+
+    assert sorted(len(request["origins"].split("|")) for request in matrix.requests) == [10, 25, 25]
+    assert 1030 not in travel
+    assert len(travel) == 59
+    for i, origin in enumerate(origins):
+        if i != 30:
+            assert travel[1000 + i]["distance_value"] == route_metres(origin_key(origin))
+    assert resolved == travel
+
+
+def test_rerun_sends_only_origins_missing_from_the_cache(matrix, tmp_path, monkeypatch):
+    monkeypatch.setattr(walmart_distance, "API_CACHE", ApiResponseCache(str(tmp_path / "cache.db")))
+    origins = make_origins(MAX_MATRIX_ORIGINS)
+    # The last three rows are lost and one route does not exist (a final answer)
+    matrix.drop_rows = 3
+    matrix.element_status = {origin_key(origins[5]): "ZERO_RESULTS"}
+    first = get_travel_details_batch(origins, STORE, "key", base_url=matrix.base_url)
+    assert [i for i, result in enumerate(first) if result is None] == [5, 22, 23, 24]
+
+    # The re-run groups the failed listings with new ones into a different chunk
+    matrix.drop_rows = 0
+    matrix.requests.clear()
+    rerun = origins[20:] + make_origins(MAX_MATRIX_ORIGINS + 5)[MAX_MATRIX_ORIGINS:]
+    results = get_travel_details_batch(rerun, STORE, "other-key", base_url=matrix.base_url)
+
+    assert len(matrix.requests) == 1
+    sent = matrix.requests[0]["origins"].split("|")
+    assert sent == [origin_key(origin) for origin in origins[22:]] + [origin_key(o) for o in rerun[5:]]
+    assert [result["distance_value"] for result in results] == [route_metres(origin_key(o)) for o in rerun]
+
+    # Everything is cached now, including the ZERO_RESULTS element
+    matrix.requests.clear()
+    assert get_travel_details_batch(origins[:10], STORE, "key", base_url=matrix.base_url)[5] is None
+    assert matrix.requests == []